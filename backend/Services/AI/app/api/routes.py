@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from functools import lru_cache
 from typing import Annotated
 import logging
 
@@ -6,41 +7,93 @@ from app.schemas import (
     GenerateQuestionsRequest,
     GenerateQuestionsResponse,
     GenerateSingleQuestionRequest,
+    GenerateTemplateRequest,
+    GenerateVariantsRequest,
+    InstantiateTemplateRequest,
     Question,
+    QuestionTemplateResponse,
+    QuestionVariantsResponse,
+    RegenerateQuestionRequest,
+    ShuffleFormsRequest,
+    ShuffleFormsResponse,
     TutorChatRequest,
     TutorChatResponse,
     HealthResponse,
+    LivenessResponse,
+    ReadinessResponse,
     ExplainQuestionRequest,
     ExplainQuestionResponse,
     GradeEssayRequest,
     GradeEssayResponse,
     SocraticHintsRequest,
     SocraticHintsResponse,
+    WarmSubscriptionCacheRequest,
+    WarmSubscriptionCacheResponse,
+    QuestionRepairMetricsResponse,
+)
+from app.services import (
+    GeminiService,
+    SubscriptionClient,
+    get_shared_gemini_service,
+    get_subscription_client,
 )
-from app.services import GeminiService
 from app.config import get_settings, Settings
-from app.auth import TokenUser, get_current_user, get_subscribed_user
+from app.auth import TokenUser, get_current_user, get_subscribed_user, requires
+from app.concurrency import ConcurrencyLimiter
+from app.health import HealthMonitor, get_health_monitor
+from app.internal_auth import InternalCaller, get_internal_caller
+from app.serialization import MSGPACK_RESPONSE_DOC, model_response
+from app.services.exam_forms import shuffle_forms
+from app.services.question_rules import get_repair_metrics
+from app.services.question_templates import TemplateError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["AI"])
 
-def get_gemini_service(
-    settings: Annotated[Settings, Depends(get_settings)]
-) -> GeminiService:
-    """Dependency to get GeminiService instance."""
-    return GeminiService(settings)
+# Route requirements: the role check runs on JWT claims before any subscription lookup
+TEACHER_ROLES = ("teacher", "admin")
+
+get_question_author = requires(
+    roles=TEACHER_ROLES,
+    subscription=True,
+    role_detail="Only teachers can generate exam questions",
+)
+get_hints_author = requires(
+    roles=TEACHER_ROLES,
+    subscription=True,
+    role_detail="Only teachers can generate Socratic hints",
+)
+
+@lru_cache()
+def get_internal_grading_limiter() -> ConcurrencyLimiter:
+    """Concurrency limiter isolating internal grading from end-user traffic."""
+    settings = get_settings()
+    return ConcurrencyLimiter(
+        "internal grading",
+        max_concurrency=settings.internal_grading_max_concurrency,
+        queue_timeout=settings.internal_grading_queue_timeout_seconds,
+    )
+
+
+def get_gemini_service() -> GeminiService:
+    """Dependency to get the shared GeminiService instance."""
+    return get_shared_gemini_service()
 
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
-    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    monitor: Annotated[HealthMonitor, Depends(get_health_monitor)],
     settings: Annotated[Settings, Depends(get_settings)]
 ):
     """
-    Health check endpoint to verify service and Gemini API connectivity.
+    Health check endpoint reporting service status and Gemini API connectivity.
+    
+    Gemini connectivity is the cached result of the background probe; this
+    endpoint never calls Gemini itself.
     """
-    gemini_connected = service.health_check()
+    monitor.refresh_if_stale()
+    gemini_connected = monitor.gemini_connected
     
     return HealthResponse(
         status="healthy" if gemini_connected else "degraded",
@@ -49,21 +102,60 @@ async def health_check(
     )
 
 
+@router.get("/health/live", response_model=LivenessResponse)
+async def liveness_check(settings: Annotated[Settings, Depends(get_settings)]):
+    """
+    Liveness probe: the process is up and serving requests.
+    
+    Purely local; no dependency is checked.
+    """
+    return LivenessResponse(service_name=settings.app_name)
+
+
+@router.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse}}
+)
+async def readiness_check(
+    response: Response,
+    monitor: Annotated[HealthMonitor, Depends(get_health_monitor)]
+):
+    """
+    Readiness probe built from cached dependency checks.
+    
+    **Returns:**
+    - Gemini status from the last background probe and its circuit breaker state
+    - JWKS key set freshness
+    - Cache backend reachability
+    - 503 if the instance cannot serve traffic (no JWKS keys loaded)
+    """
+    readiness = await monitor.readiness()
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness
+
+
 @router.post(
     "/questions/generate",
     response_model=GenerateQuestionsResponse,
-    status_code=status.HTTP_201_CREATED
+    status_code=status.HTTP_201_CREATED,
+    responses={201: MSGPACK_RESPONSE_DOC}
 )
 async def generate_questions(
     request: GenerateQuestionsRequest,
+    http_request: Request,
+    response: Response,
     service: Annotated[GeminiService, Depends(get_gemini_service)],
-    user: Annotated[TokenUser, Depends(get_subscribed_user)]
+    user: Annotated[TokenUser, Depends(get_question_author)]
 ):
     """
     Generate multiple questions based on an exam matrix.
     
     This endpoint takes a matrix configuration specifying topics, cognitive levels,
-    and quantities to generate a set of exam questions.
+    and quantities to generate a set of exam questions. Questions are served from
+    the question pool first (never one this teacher was already given); only the
+    shortfall is generated.
     
     **Requirements:**
     - Teacher role with active Pro subscription
@@ -72,24 +164,16 @@ async def generate_questions(
     **Returns:**
     - List of generated questions with answers
     - Total count of questions
+    - Per-topic fulfilment (requested vs generated counts)
+    - MessagePack instead of JSON when requested with `Accept: application/msgpack`
     """
-    # Verify user has Teacher role
-    if user.role and user.role.lower() not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers can generate exam questions"
-        )
-    
     try:
-        logger.info(f"User {user.sub} generating questions with plan: {user.subscription.plan}")
-        questions = await service.generate_questions(request)
+        logger.info("User %s generating questions with plan: %s", user.sub, user.subscription.plan)
+        result = await service.generate_questions(request, teacher_id=user.sub)
         
-        return GenerateQuestionsResponse(
-            questions=questions,
-            total_count=len(questions)
-        )
+        return model_response(http_request, result, status_code=status.HTTP_201_CREATED, response=response)
     except Exception as e:
-        logger.error(f"Failed to generate questions: {str(e)}")
+        logger.error("Failed to generate questions: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate questions: {str(e)}"
@@ -99,12 +183,15 @@ async def generate_questions(
 @router.post(
     "/questions/generate-single",
     response_model=Question,
-    status_code=status.HTTP_201_CREATED
+    status_code=status.HTTP_201_CREATED,
+    responses={201: MSGPACK_RESPONSE_DOC}
 )
 async def generate_single_question(
     request: GenerateSingleQuestionRequest,
+    http_request: Request,
+    response: Response,
     service: Annotated[GeminiService, Depends(get_gemini_service)],
-    user: Annotated[TokenUser, Depends(get_subscribed_user)]
+    user: Annotated[TokenUser, Depends(get_question_author)]
 ):
     """
     Generate a single question with specified parameters.
@@ -115,31 +202,214 @@ async def generate_single_question(
     **Returns:**
     - A single generated question with answers
     """
-    logger.info("🎯 generate_single_question endpoint hit!")
-    logger.info(f"   Request: topic_name={request.topic_name}, cognitive_level={request.cognitive_level}") # type: ignore
-    logger.info(f"   User: {user.sub}, role={user.role}, plan={user.subscription.plan if user.subscription else 'None'}")
+    try:
+        logger.info(
+            "User %s generating single question: topic_name=%s, cognitive_level=%s",
+            user.sub, request.topic_name, request.cognitive_level.value
+        )
+        question = await service.generate_single_question(request, teacher_id=user.sub)
+        return model_response(http_request, question, status_code=status.HTTP_201_CREATED, response=response)
+    except Exception as e:
+        logger.error("Failed to generate single question: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate question: {str(e)}"
+        )
+
+
+@router.post(
+    "/questions/regenerate",
+    response_model=Question,
+    status_code=status.HTTP_201_CREATED,
+    responses={201: MSGPACK_RESPONSE_DOC}
+)
+async def regenerate_question(
+    request: RegenerateQuestionRequest,
+    http_request: Request,
+    response: Response,
+    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    user: Annotated[TokenUser, Depends(get_question_author)]
+):
+    """
+    Replace one rejected question of a generated set.
+    
+    The replacement has the rejected question's topic, cognitive level and
+    type, and avoids the rejected question and the `siblings` (the rest of
+    the set, sent as text or short prefixes). It comes from the question
+    pool when possible, else from one short model call.
     
-    # Verify user has Teacher role
-    if user.role and user.role.lower() not in ["teacher", "admin"]:
-        logger.warning(f"❌ User {user.sub} with role {user.role} attempted to generate question (forbidden)")
+    **Requirements:**
+    - Teacher role with active Pro subscription
+    
+    **Returns:**
+    - The replacement question with answers
+    """
+    try:
+        logger.info(
+            "User %s regenerating a question: topic_name=%s, question_type=%s, siblings=%d",
+            user.sub, request.topic_name, request.rejected.question_type.value, len(request.siblings)
+        )
+        question = await service.regenerate_question(request, teacher_id=user.sub)
+        return model_response(http_request, question, status_code=status.HTTP_201_CREATED, response=response)
+    except Exception as e:
+        logger.error("Failed to regenerate question: %s", e, exc_info=True)
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers can generate exam questions"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to regenerate question: {str(e)}"
         )
+
+
+@router.post(
+    "/questions/generate-variants",
+    response_model=QuestionVariantsResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={201: MSGPACK_RESPONSE_DOC}
+)
+async def generate_question_variants(
+    request: GenerateVariantsRequest,
+    http_request: Request,
+    response: Response,
+    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    user: Annotated[TokenUser, Depends(get_question_author)]
+):
+    """
+    Generate parallel versions of one question for A/B exam forms.
+    
+    All variants come from one model call (plus a top-up call if some were
+    invalid or near-duplicates). `shuffled_forms` extra forms are derived
+    locally by shuffling answer order.
+    
+    **Requirements:**
+    - Teacher role with active Pro subscription
     
+    **Returns:**
+    - Distinct variants at the same topic, cognitive level and type
+    - The shuffled forms, if requested
+    """
     try:
-        logger.info(f"✅ User {user.sub} authorized, generating single question with plan: {user.subscription.plan}")
-        question = await service.generate_single_question(request)
-        logger.info(f"✅ Successfully generated question for user {user.sub}")
-        return question
+        logger.info(
+            "User %s generating %d question variants: topic_name=%s, question_type=%s",
+            user.sub, request.variant_count, request.topic_name, request.question_type.value
+        )
+        result = await service.generate_variants(request, teacher_id=user.sub)
+        return model_response(http_request, result, status_code=status.HTTP_201_CREATED, response=response)
     except Exception as e:
-        logger.error(f"❌ Failed to generate single question: {str(e)}", exc_info=True)
+        logger.error("Failed to generate question variants: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate question: {str(e)}"
+            detail=f"Failed to generate question variants: {str(e)}"
         )
 
 
+@router.post(
+    "/questions/shuffle-forms",
+    response_model=ShuffleFormsResponse,
+    responses={200: MSGPACK_RESPONSE_DOC}
+)
+async def shuffle_exam_forms(
+    request: ShuffleFormsRequest,
+    http_request: Request,
+    response: Response,
+    user: Annotated[TokenUser, Depends(get_question_author)]
+):
+    """
+    Derive exam forms from a set of questions by shuffling answer order.
+    
+    Questions keep their order; options of select and multiple-choice
+    questions are reordered, using an order not used by another form while
+    one is left. Gemini is not called. Pass `seed` for reproducible forms.
+    
+    **Requirements:**
+    - Teacher role with active Pro subscription
+    
+    **Returns:**
+    - Per form, the questions with shuffled answers
+    """
+    forms = shuffle_forms(request.questions, request.forms, request.seed)
+    logger.info("User %s derived %d forms of %d questions", user.sub, len(forms), len(request.questions))
+    return model_response(http_request, ShuffleFormsResponse(forms=forms), response=response)
+
+
+@router.post(
+    "/questions/templates",
+    response_model=QuestionTemplateResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={201: MSGPACK_RESPONSE_DOC}
+)
+async def generate_question_template(
+    request: GenerateTemplateRequest,
+    http_request: Request,
+    response: Response,
+    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    user: Annotated[TokenUser, Depends(get_question_author)]
+):
+    """
+    Generate a parametric question template.
+    
+    The template is question text with typed variables, constraints and
+    formulas for the correct answer and distractors. Store it and call
+    `/questions/templates/instantiate` for as many distinct variants as
+    needed, without further model calls.
+    
+    **Requirements:**
+    - Teacher role with active Pro subscription
+    - `select` or `fill_in_blank` question type
+    
+    **Returns:**
+    - The template
+    - `variant_count` instantiated variants
+    """
+    try:
+        logger.info(
+            "User %s generating question template: topic_name=%s, question_type=%s",
+            user.sub, request.topic_name, request.question_type.value
+        )
+        result = await service.generate_template(request)
+        return model_response(http_request, result, status_code=status.HTTP_201_CREATED, response=response)
+    except TemplateError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to generate question template: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate question template: {str(e)}"
+        )
+
+
+@router.post(
+    "/questions/templates/instantiate",
+    response_model=GenerateQuestionsResponse,
+    responses={200: MSGPACK_RESPONSE_DOC}
+)
+async def instantiate_question_template(
+    request: InstantiateTemplateRequest,
+    http_request: Request,
+    response: Response,
+    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    user: Annotated[TokenUser, Depends(get_question_author)]
+):
+    """
+    Instantiate distinct variants of a question template locally.
+    
+    Variables are sampled, constraints checked and the answer and
+    distractors computed from the template's formulas; Gemini is not called.
+    Fewer than `count` variants are returned if the template's ranges do not
+    allow that many. Pass `seed` for reproducible variants.
+    
+    **Requirements:**
+    - Teacher role with active Pro subscription
+    
+    **Returns:**
+    - The variants with computed answers
+    """
+    try:
+        result = await service.instantiate_template(request)
+    except TemplateError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    logger.info("User %s instantiated %d template variants", user.sub, result.total_count)
+    return model_response(http_request, result, response=response)
+
+
 @router.post("/tutor/chat", response_model=TutorChatResponse)
 async def tutor_chat(
     request: TutorChatRequest,
@@ -160,7 +430,7 @@ async def tutor_chat(
     - Optional follow-up suggestions
     """
     try:
-        logger.info(f"User {user.sub} using tutor chat with plan: {user.subscription.plan}")
+        logger.info("User %s using tutor chat with plan: %s", user.sub, user.subscription.plan)
         response_message = await service.tutor_chat( # type: ignore
             message=request.message,
             subject=request.subject,
@@ -174,7 +444,7 @@ async def tutor_chat(
             suggestions=None  # Can be enhanced to generate suggestions
         )
     except Exception as e:
-        logger.error(f"Failed in tutor chat: {str(e)}")
+        logger.error("Failed in tutor chat: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process chat: {str(e)}"
@@ -194,26 +464,33 @@ async def explain_question(
     answer is correct. Can be triggered by the student after reviewing their
     exam results.
 
+    Send the question's stored `answers` (generated with `student_explanations`)
+    and the chosen `student_answer_index` to get the stored explanation without
+    a model call; free-text answers matching no option are explained by the model.
+
     **Requirements:**
     - Active subscription (Teacher or Student role)
 
     **Returns:**
     - Simple, encouraging explanation suitable for the student's grade level
+    - Whether it was stored with the question or generated
     """
     try:
-        logger.info(f"User {user.sub} requesting explanation for grade {request.grade} {request.subject}")
-        explanation = await service.explain_question(
+        logger.info("User %s requesting explanation for grade %s %s", user.sub, request.grade, request.subject)
+        result = await service.explain_question(
             question_content=request.question_content,
             correct_answer=request.correct_answer,
             grade=request.grade,
             subject=request.subject,
             student_answer=request.student_answer,
             language=request.language,
+            answers=request.answers,
+            student_answer_index=request.student_answer_index,
         )
 
-        return ExplainQuestionResponse(explanation=explanation)
+        return result
     except Exception as e:
-        logger.error(f"Failed to generate explanation: {str(e)}")
+        logger.error("Failed to generate explanation: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate explanation: {str(e)}"
@@ -232,8 +509,8 @@ async def grade_essay(
     Evaluates the free-text answer against the question's grading rubric and
     returns a score (0..max_points) and constructive feedback.
 
-    This endpoint is called server-to-server by the Class service when a student
-    submits an exam attempt that contains essay questions.
+    Server-to-server callers such as the Class service should use
+    `/internal/essay/grade`, which skips end-user authentication.
 
     **Requirements:**
     - Active subscription (Teacher or Student role)
@@ -243,23 +520,117 @@ async def grade_essay(
     """
     try:
         logger.info(
-            f"User {user.sub} requesting essay grading for grade {request.grade} {request.subject}"
+            "User %s requesting essay grading for grade %s %s", user.sub, request.grade, request.subject
         )
         result = await service.grade_essay(request)
         return result
     except Exception as e:
-        logger.error(f"Failed to grade essay: {str(e)}")
+        logger.error("Failed to grade essay: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to grade essay: {str(e)}"
         )
 
 
+@router.post(
+    "/internal/essay/grade",
+    response_model=GradeEssayResponse,
+    responses={200: MSGPACK_RESPONSE_DOC},
+    tags=["Internal"]
+)
+async def grade_essay_internal(
+    request: GradeEssayRequest,
+    http_request: Request,
+    response: Response,
+    service: Annotated[GeminiService, Depends(get_gemini_service)],
+    caller: Annotated[InternalCaller, Depends(get_internal_caller)],
+    limiter: Annotated[ConcurrencyLimiter, Depends(get_internal_grading_limiter)]
+):
+    """
+    Grade a student's essay answer for a trusted internal service.
+
+    Same grading as `/essay/grade`, but authenticated with a locally verified
+    service credential (`X-Internal-Credential`) instead of an end-user JWT,
+    so no JWKS or Subscription service lookup is made. Runs under its own
+    concurrency limit so grading bursts do not starve end-user traffic.
+
+    **Requirements:**
+    - Valid internal service credential
+
+    **Returns:**
+    - AI-assigned score and feedback string
+    """
+    async with limiter.slot():
+        try:
+            logger.info(
+                "Internal caller %s requesting essay grading for grade %s %s",
+                caller.name, request.grade, request.subject
+            )
+            result = await service.grade_essay(request)
+            return model_response(http_request, result, response=response)
+        except Exception as e:
+            logger.error("Failed to grade essay: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to grade essay: {str(e)}"
+            )
+
+
+@router.post(
+    "/internal/subscriptions/warm",
+    response_model=WarmSubscriptionCacheResponse,
+    tags=["Internal"]
+)
+async def warm_subscription_cache(
+    request: WarmSubscriptionCacheRequest,
+    caller: Annotated[InternalCaller, Depends(get_internal_caller)],
+    client: Annotated[SubscriptionClient, Depends(get_subscription_client)]
+):
+    """
+    Pre-warm subscription claims for a list of users.
+
+    Intended to be called by a trusted service ahead of a scheduled exam so
+    that class-wide features do not trigger one Subscription lookup per student.
+
+    **Requirements:**
+    - Valid internal service credential
+
+    **Returns:**
+    - Number of users whose claims are now cached
+    """
+    logger.info("Internal caller %s warming subscription claims for %d users", caller.name, len(request.user_ids))
+    warmed_count = await client.warm_cache(request.user_ids)
+    return WarmSubscriptionCacheResponse(warmed_count=warmed_count)
+
+
+@router.get(
+    "/internal/metrics/question-repairs",
+    response_model=QuestionRepairMetricsResponse,
+    tags=["Internal"]
+)
+async def question_repair_metrics(
+    caller: Annotated[InternalCaller, Depends(get_internal_caller)]
+):
+    """
+    Rule-check outcomes for generated questions, per question type and model.
+
+    Counts are kept per instance since it started.
+
+    **Requirements:**
+    - Valid internal service credential
+
+    **Returns:**
+    - Checked, auto-fixed and regenerated question counts with rates
+    - Violations per rule
+    """
+    return QuestionRepairMetricsResponse(stats=get_repair_metrics().snapshot())
+
+
 @router.post("/socratic-hints", response_model=SocraticHintsResponse)
 async def generate_socratic_hints(
     request: SocraticHintsRequest,
     service: Annotated[GeminiService, Depends(get_gemini_service)],
-    user: Annotated[TokenUser, Depends(get_subscribed_user)]
+    user: Annotated[TokenUser, Depends(get_hints_author)]
 ):
     """
     Generate Socratic method guiding questions for a teacher.
@@ -275,15 +646,9 @@ async def generate_socratic_hints(
     - List of Socratic guiding questions
     - A brief teaching note on the pedagogical approach
     """
-    if user.role and user.role.lower() not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers can generate Socratic hints"
-        )
-
     try:
         logger.info(
-            f"User {user.sub} requesting Socratic hints for grade {request.grade} {request.subject}"
+            "User %s requesting Socratic hints for grade %s %s", user.sub, request.grade, request.subject
         )
         result = await service.generate_socratic_hints(
             question_content=request.question_content,
@@ -298,7 +663,7 @@ async def generate_socratic_hints(
             teaching_note=result.get("teaching_note", ""),
         )
     except Exception as e:
-        logger.error(f"Failed to generate Socratic hints: {str(e)}")
+        logger.error("Failed to generate Socratic hints: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate Socratic hints: {str(e)}"
@@ -9,15 +9,16 @@ claims (which don't exist for subscription info).
 
 import logging
 from datetime import datetime, timezone
-from typing import Annotated, Any
+from typing import Annotated, Any, Awaitable, Callable, Iterable
 
-import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, jwk, JWTError
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
+from app.cache import CacheBackend, get_cache_backend
 from app.config import get_settings, Settings
+from app.enrichment import ENRICHMENT_TOKEN_HEADER, get_enrichment_signer
+from app.http_client import http_client
 from app.services.subscription_client import (
     SubscriptionClient,
     SubscriptionClaimsResponse,
@@ -40,6 +41,7 @@ class SubscriptionClaims(BaseModel):
 class TokenUser(BaseModel):
     """User information extracted from JWT token."""
     sub: str = Field(description="Cognito user ID")
+    user_id: str = Field(default="", description="Database user ID used for subscription lookup")
     email: str | None = Field(default=None)
     role: str | None = Field(default=None)
     subscription: SubscriptionClaims = Field(default_factory=SubscriptionClaims)
@@ -58,12 +60,22 @@ class TokenUser(BaseModel):
 
 
 class JWKSCache:
-    """Cache for Cognito JWKS (JSON Web Key Set)."""
+    """
+    Cache for Cognito JWKS (JSON Web Key Set).
+    
+    Keys are held in-process and mirrored to the shared cache backend, so a
+    fresh container can pick up keys fetched by another instance instead of
+    calling Cognito itself.
+    """
+    
+    _CACHE_PREFIX = "jwks:"
     
-    def __init__(self) -> None:
+    def __init__(self, cache: CacheBackend | None = None) -> None:
         self._keys: dict[str, dict[str, Any]] = {}
+        self._public_keys: dict[str, Any] = {}
         self._last_fetched: datetime | None = None
         self._cache_duration_seconds: int = 3600  # 1 hour
+        self._shared_cache = cache
     
     async def get_key(self, kid: str, jwks_url: str) -> dict[str, Any] | None:
         """Get a key from the JWKS cache, refreshing if needed."""
@@ -73,6 +85,49 @@ class JWKSCache:
         
         return self._keys.get(kid)
     
+    async def get_public_key(self, kid: str, jwks_url: str) -> Any | None:
+        """Get the constructed public key for a key ID, building it once per refresh."""
+        key_data = await self.get_key(kid, jwks_url)
+        if key_data is None:
+            return None
+        
+        public_key = self._public_keys.get(kid)
+        if public_key is None:
+            from jose import jwk
+            public_key = jwk.construct(key_data)
+            self._public_keys[kid] = public_key
+        return public_key
+    
+    async def prefetch(self, jwks_url: str) -> int:
+        """
+        Fetch the key set and construct every public key ahead of the first request.
+        
+        Returns:
+            Number of keys ready for verification
+        """
+        if self._should_refresh():
+            await self._refresh_keys(jwks_url)
+        for kid in list(self._keys):
+            await self.get_public_key(kid, jwks_url)
+        return len(self._public_keys)
+    
+    @property
+    def key_count(self) -> int:
+        """Number of keys currently held."""
+        return len(self._keys)
+    
+    @property
+    def age_seconds(self) -> float | None:
+        """Seconds since the key set was last loaded, or None if never loaded."""
+        if not self._last_fetched:
+            return None
+        return (datetime.now(timezone.utc) - self._last_fetched).total_seconds()
+    
+    @property
+    def max_age_seconds(self) -> int:
+        """Age after which the key set is refreshed."""
+        return self._cache_duration_seconds
+    
     def _should_refresh(self) -> bool:
         """Check if the cache should be refreshed."""
         if not self._last_fetched:
@@ -81,19 +136,33 @@ class JWKSCache:
         return elapsed > self._cache_duration_seconds
     
     async def _refresh_keys(self, jwks_url: str) -> None:
-        """Refresh the JWKS cache from Cognito."""
+        """Refresh the JWKS cache from the shared cache, falling back to Cognito."""
+        shared_cache = self._shared_cache or get_cache_backend()
+        cache_key = self._CACHE_PREFIX + jwks_url
+        
+        shared_keys = await shared_cache.get_json(cache_key)
+        if shared_keys:
+            self._keys = shared_keys
+            self._public_keys = {}
+            self._last_fetched = datetime.now(timezone.utc)
+            logger.info("Loaded %d JWKS keys from shared cache", len(self._keys))
+            return
+        
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_client() as client:
                 response = await client.get(jwks_url, timeout=10.0)
                 response.raise_for_status()
                 jwks: dict[str, Any] = response.json()
                 
                 keys_list: list[dict[str, Any]] = jwks.get("keys", [])
                 self._keys = {key["kid"]: key for key in keys_list if "kid" in key}
+                self._public_keys = {}
                 self._last_fetched = datetime.now(timezone.utc)
-                logger.info(f"Refreshed JWKS cache with {len(self._keys)} keys")
+                logger.info("Refreshed JWKS cache with %d keys", len(self._keys))
+            
+            await shared_cache.set_json(cache_key, self._keys, self._cache_duration_seconds)
         except Exception as e:
-            logger.error(f"Failed to refresh JWKS cache: {e}")
+            logger.error("Failed to refresh JWKS cache: %s", e)
             # Keep existing keys if refresh fails
 
 
@@ -101,58 +170,54 @@ class JWKSCache:
 _jwks_cache = JWKSCache()
 
 
-async def validate_token(
-    token: str,
-    settings: Settings,
-    subscription_client: SubscriptionClient | None = None
-) -> TokenUser:
+def get_jwks_cache() -> JWKSCache:
+    """Get the global JWKS cache instance."""
+    return _jwks_cache
+
+
+async def authenticate_token(token: str, settings: Settings) -> TokenUser:
     """
-    Validate a JWT token from Cognito and fetch subscription claims from Subscription service.
+    Validate a JWT token from Cognito without any remote enrichment.
     
-    This implements Backend Token Enrichment:
-    1. Validate the JWT token using Cognito JWKS
-    2. Extract user info (sub, email, role) from the token
-    3. Fetch subscription claims from the Subscription microservice using the user ID
+    Only the claims carried by the token itself (sub, email, role) are
+    populated; the subscription is left at its free-plan default. Use
+    `enrich_subscription` to fetch subscription claims when a route needs them.
     
     Args:
         token: The JWT token to validate
         settings: Application settings
-        subscription_client: Optional subscription client (uses singleton if not provided)
         
     Returns:
-        TokenUser with extracted claims and enriched subscription data
+        TokenUser with JWT-only claims
         
     Raises:
         HTTPException: If token is invalid
     """
-    logger.info("🔐 validate_token called")
+    # Deferred so python-jose and its crypto backend load on the first authenticated request
+    from jose import jwt, JWTError
+    
     try:
         # Decode header to get key ID
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
-        logger.info(f"   Token kid: {kid}")
         
         if not kid:
-            logger.error("❌ Token missing key ID")
+            logger.warning("Token missing key ID")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token missing key ID"
             )
         
-        # Get the signing key from JWKS
-        key_data = await _jwks_cache.get_key(kid, settings.cognito_jwks_url)
-        logger.info(f"   Key data found: {key_data is not None}")
+        # Get the constructed signing key from JWKS
+        public_key = await _jwks_cache.get_public_key(kid, settings.cognito_jwks_url)
         
-        if not key_data:
-            logger.error("❌ Unable to find signing key")
+        if public_key is None:
+            logger.warning("Unable to find signing key for kid %s", kid)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Unable to find signing key"
             )
         
-        # Convert JWK to public key
-        public_key = jwk.construct(key_data)
-        
         # Decode and validate the token
         payload = jwt.decode(
             token,
@@ -167,53 +232,139 @@ async def validate_token(
             }
         )
         
-        # Get user ID for subscription lookup
         # Try custom:user_id first (database user ID), then fall back to sub (Cognito ID)
-        user_id = payload.get("custom:user_id", payload.get("sub", ""))
         cognito_sub = payload.get("sub", "")
-        
-        # Fetch subscription claims from Subscription service (Backend Token Enrichment)
-        # Pass the original JWT token for service-to-service authentication
-        client = subscription_client or get_subscription_client()
-        subscription_response = await client.get_subscription_claims(user_id, auth_token=token)
-        
-        subscription = SubscriptionClaims(
-            plan=subscription_response.plan,
-            expires_at=subscription_response.expiresAt,
-            has_active_subscription=subscription_response.hasActiveSubscription
-        )
-        
-        logger.info(
-            f"   Subscription enriched from service: plan={subscription.plan}, "
-            f"active={subscription.has_active_subscription}"
-        )
-        
         user = TokenUser(
             sub=cognito_sub,
+            user_id=payload.get("custom:user_id", cognito_sub),
             email=payload.get("email"),
             role=payload.get("custom:role"),
-            subscription=subscription
         )
-        logger.info(f"✅ Token validated for user: {user.sub}, role: {user.role}, plan: {user.subscription.plan}")
+        logger.debug("Token validated for user %s, role %s", user.sub, user.role)
         return user
         
+    except HTTPException:
+        raise
     except JWTError as e:
-        logger.error(f"❌ JWT validation failed: {e}")
+        logger.warning("JWT validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid token: {str(e)}"
         )
     except Exception as e:
-        logger.error(f"Unexpected error validating token: {e}")
+        logger.error("Unexpected error validating token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token validation failed"
         )
 
 
+async def enrich_subscription(
+    user: TokenUser,
+    token: str,
+    subscription_client: SubscriptionClient | None = None
+) -> TokenUser:
+    """
+    Fetch subscription claims from the Subscription service (Backend Token Enrichment).
+    
+    Args:
+        user: A user returned by `authenticate_token`
+        token: The original JWT, passed on for service-to-service authentication
+        subscription_client: Optional subscription client (uses singleton if not provided)
+        
+    Returns:
+        The same user with its subscription populated
+    """
+    client = subscription_client or get_subscription_client()
+    subscription_response = await client.get_subscription_claims(
+        user.user_id or user.sub, auth_token=token
+    )
+    
+    user.subscription = SubscriptionClaims(
+        plan=subscription_response.plan,
+        expires_at=subscription_response.expiresAt,
+        has_active_subscription=subscription_response.hasActiveSubscription
+    )
+    
+    logger.debug(
+        "Subscription enriched from service: plan=%s, active=%s",
+        user.subscription.plan, user.subscription.has_active_subscription
+    )
+    return user
+
+
+async def resolve_subscription(
+    user: TokenUser,
+    token: str,
+    enrichment_token: str | None = None,
+    response: Response | None = None
+) -> TokenUser:
+    """
+    Populate subscription claims, preferring a client-echoed enrichment token.
+    
+    A valid enrichment token is verified locally and no remote call is made.
+    Otherwise the claims are fetched from the Subscription service and a fresh
+    enrichment token is returned to the client in the response headers.
+    
+    Args:
+        user: A user returned by `authenticate_token`
+        token: The original JWT
+        enrichment_token: The `X-Enrichment-Token` header value, if any
+        response: Response to attach a freshly issued enrichment token to
+        
+    Returns:
+        The same user with its subscription populated
+    """
+    signer = get_enrichment_signer()
+    if enrichment_token and signer.enabled:
+        claims = signer.verify(enrichment_token, user.sub)
+        if claims is not None:
+            user.subscription = SubscriptionClaims(**claims)
+            logger.debug("Subscription restored from enrichment token: plan=%s", user.subscription.plan)
+            return user
+    
+    await enrich_subscription(user, token)
+    
+    if response is not None:
+        issued = signer.issue(user.sub, user.subscription.model_dump())
+        if issued:
+            response.headers[ENRICHMENT_TOKEN_HEADER] = issued
+    return user
+
+
+async def validate_token(
+    token: str,
+    settings: Settings,
+    subscription_client: SubscriptionClient | None = None
+) -> TokenUser:
+    """
+    Validate a JWT token from Cognito and fetch subscription claims from Subscription service.
+    
+    This implements Backend Token Enrichment:
+    1. Validate the JWT token using Cognito JWKS
+    2. Extract user info (sub, email, role) from the token
+    3. Fetch subscription claims from the Subscription microservice using the user ID
+    
+    Args:
+        token: The JWT token to validate
+        settings: Application settings
+        subscription_client: Optional subscription client (uses singleton if not provided)
+        
+    Returns:
+        TokenUser with extracted claims and enriched subscription data
+        
+    Raises:
+        HTTPException: If token is invalid
+    """
+    user = await authenticate_token(token, settings)
+    return await enrich_subscription(user, token, subscription_client)
+
+
 async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
-    settings: Annotated[Settings, Depends(get_settings)]
+    settings: Annotated[Settings, Depends(get_settings)],
+    response: Response,
+    enrichment_token: Annotated[str | None, Header(alias=ENRICHMENT_TOKEN_HEADER)] = None
 ) -> TokenUser:
     """
     FastAPI dependency to get the current authenticated user.
@@ -221,6 +372,8 @@ async def get_current_user(
     Args:
         credentials: Bearer token credentials
         settings: Application settings
+        response: Response used to return a fresh enrichment token
+        enrichment_token: Previously issued enrichment token echoed by the client
         
     Returns:
         TokenUser with validated claims
@@ -228,17 +381,16 @@ async def get_current_user(
     Raises:
         HTTPException: If not authenticated or token is invalid
     """
-    logger.info("🔍 get_current_user called")
     if not credentials:
-        logger.error("❌ No credentials provided")
+        logger.debug("No credentials provided")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    logger.info("   Credentials present, validating token...")
-    return await validate_token(credentials.credentials, settings)
+    user = await authenticate_token(credentials.credentials, settings)
+    return await resolve_subscription(user, credentials.credentials, enrichment_token, response)
 
 
 async def get_optional_user(
@@ -277,14 +429,12 @@ def require_subscription(user: TokenUser) -> TokenUser:
     Raises:
         HTTPException: If user doesn't have an active subscription
     """
-    logger.info(f"   Checking subscription: has_pro={user.has_pro_subscription}")
     if not user.has_pro_subscription:
-        logger.warning(f"❌ User {user.sub} does not have active Pro subscription")
+        logger.info("User %s does not have active Pro subscription", user.sub)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Active Pro subscription required to access this feature"
         )
-    logger.info(f"✅ User {user.sub} has valid Pro subscription")
     return user
 
 
@@ -303,6 +453,86 @@ async def get_subscribed_user(
     Raises:
         HTTPException: If not subscribed
     """
-    logger.info(f"🎫 get_subscribed_user called for user: {user.sub}")
-    logger.info(f"   Subscription: plan={user.subscription.plan}, active={user.subscription.has_active_subscription}")
     return require_subscription(user)
+
+
+class RouteRequirements(BaseModel):
+    """
+    Declarative access requirements for a route.
+    
+    Requirements are evaluated cheapest first: JWT-only claims (role) are
+    checked before the Subscription service is contacted, so a request that
+    fails the role check never costs a remote lookup.
+    """
+    model_config = ConfigDict(frozen=True)
+    
+    roles: frozenset[str] = Field(default_factory=frozenset)
+    role_detail: str = Field(default="Insufficient role to access this feature")
+    subscription: bool = Field(default=False)
+    
+    def check_claims(self, user: TokenUser) -> None:
+        """
+        Check requirements that only need claims carried by the JWT.
+        
+        Users without a role claim are let through, matching the behaviour
+        of the previous inline route checks.
+        
+        Raises:
+            HTTPException: If the user's role is not allowed
+        """
+        if self.roles and user.role and user.role.lower() not in self.roles:
+            logger.info("User %s with role %s rejected by role requirement", user.sub, user.role)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=self.role_detail
+            )
+
+
+def requires(
+    *,
+    roles: Iterable[str] = (),
+    subscription: bool = False,
+    role_detail: str | None = None
+) -> Callable[..., Awaitable[TokenUser]]:
+    """
+    Build a FastAPI dependency enforcing the given route requirements.
+    
+    Args:
+        roles: Allowed roles (case-insensitive); empty allows any role
+        subscription: Whether an active Pro subscription is required
+        role_detail: Error detail returned when the role check fails
+        
+    Returns:
+        A dependency resolving to the authenticated TokenUser. Subscription
+        claims are only populated when `subscription` is True.
+    """
+    requirements = RouteRequirements(
+        roles=frozenset(role.lower() for role in roles),
+        subscription=subscription,
+        **({"role_detail": role_detail} if role_detail else {})
+    )
+    
+    async def dependency(
+        credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
+        settings: Annotated[Settings, Depends(get_settings)],
+        response: Response,
+        enrichment_token: Annotated[str | None, Header(alias=ENRICHMENT_TOKEN_HEADER)] = None
+    ) -> TokenUser:
+        if not credentials:
+            logger.debug("No credentials provided")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        user = await authenticate_token(credentials.credentials, settings)
+        requirements.check_claims(user)
+        
+        if requirements.subscription:
+            await resolve_subscription(user, credentials.credentials, enrichment_token, response)
+            require_subscription(user)
+        return user
+    
+    dependency.requirements = requirements  # type: ignore[attr-defined]
+    return dependency
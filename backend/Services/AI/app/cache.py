@@ -0,0 +1,216 @@
+"""
+Pluggable cache backends shared by the auth and response caches.
+
+The in-memory backend is per-process. The Redis backend speaks the Redis
+protocol (Redis, Valkey, ElastiCache, ...) so hot entries such as JWKS keys
+and subscription claims are shared across Lambda containers and uvicorn
+workers. The backend is selected with `CACHE_BACKEND` ("memory" or "redis").
+"""
+
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+from app.config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Async key/value cache with per-entry TTL."""
+    
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        """Return the cached value, or None if missing or expired."""
+    
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        """Store a value for `ttl_seconds`."""
+    
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove a single key."""
+    
+    @abstractmethod
+    async def clear(self, prefix: str = "") -> None:
+        """Remove every key starting with `prefix`."""
+    
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        """Return cached values for several keys, in order."""
+        return [await self.get(key) for key in keys]
+    
+    async def set_many(self, items: dict[str, str], ttl_seconds: float) -> None:
+        """Store several values, all for `ttl_seconds`."""
+        for key, value in items.items():
+            await self.set(key, value, ttl_seconds)
+    
+    async def ping(self) -> bool:
+        """Check that the backend is reachable."""
+        return True
+    
+    async def close(self) -> None:
+        """Release any connections held by the backend."""
+    
+    async def get_json(self, key: str) -> Any | None:
+        """Return a cached JSON value, or None."""
+        raw = await self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            logger.warning(f"Discarding undecodable cache entry {key}")
+            return None
+    
+    async def set_json(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Store a JSON-serializable value."""
+        await self.set(key, json.dumps(value, separators=(",", ":")), ttl_seconds)
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process cache backed by a dict."""
+    
+    def __init__(self, max_entries: int = 10000) -> None:
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._max_entries = max_entries
+    
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._entries.pop(key, None)
+            return None
+        return value
+    
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        if len(self._entries) >= self._max_entries and key not in self._entries:
+            self._evict()
+        self._entries[key] = (value, time.monotonic() + ttl_seconds)
+    
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+    
+    async def clear(self, prefix: str = "") -> None:
+        if not prefix:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+    
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest inserted entry if still full."""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if now >= expires_at]:
+            del self._entries[key]
+        if len(self._entries) >= self._max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared cache over the Redis protocol.
+    
+    Connection or command failures are logged and treated as cache misses,
+    so an unavailable cache degrades to the uncached code path instead of
+    failing requests.
+    """
+    
+    def __init__(self, url: str, key_prefix: str = "") -> None:
+        # Imported lazily so the in-memory mode does not require the redis package
+        from redis import asyncio as redis_asyncio
+        
+        self._client = redis_asyncio.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0,
+        )
+        self._prefix = key_prefix
+    
+    async def get(self, key: str) -> str | None:
+        try:
+            return await self._client.get(self._prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+    
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        if not keys:
+            return []
+        try:
+            return await self._client.mget([self._prefix + key for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache mget failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def set_many(self, items: dict[str, str], ttl_seconds: float) -> None:
+        if not items:
+            return
+        try:
+            ttl_ms = max(1, int(ttl_seconds * 1000))
+            async with self._client.pipeline(transaction=False) as pipeline:
+                for key, value in items.items():
+                    pipeline.set(self._prefix + key, value, px=ttl_ms)
+                await pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Cache mset failed for {len(items)} keys: {e}")
+    
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        try:
+            await self._client.set(self._prefix + key, value, px=max(1, int(ttl_seconds * 1000)))
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {e}")
+    
+    async def delete(self, key: str) -> None:
+        try:
+            await self._client.delete(self._prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed for {key}: {e}")
+    
+    async def clear(self, prefix: str = "") -> None:
+        try:
+            keys = [key async for key in self._client.scan_iter(match=f"{self._prefix}{prefix}*")]
+            if keys:
+                await self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache clear failed for prefix {prefix}: {e}")
+    
+    async def ping(self) -> bool:
+        try:
+            return bool(await self._client.ping())
+        except Exception as e:
+            logger.warning(f"Cache ping failed: {e}")
+            return False
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_cache_backend(settings: Settings) -> CacheBackend:
+    """Create the cache backend selected in settings."""
+    backend = settings.cache_backend.lower()
+    if backend == "redis":
+        if not settings.cache_redis_url:
+            logger.error("CACHE_BACKEND=redis but CACHE_REDIS_URL is empty, using in-memory cache")
+            return InMemoryCacheBackend()
+        logger.info("Using Redis cache backend")
+        return RedisCacheBackend(settings.cache_redis_url, key_prefix=settings.cache_key_prefix)
+    if backend != "memory":
+        logger.error(f"Unknown cache backend '{settings.cache_backend}', using in-memory cache")
+    return InMemoryCacheBackend()
+
+
+# Global singleton instance
+_cache_backend: CacheBackend | None = None
+
+
+def get_cache_backend() -> CacheBackend:
+    """Get the cache backend singleton instance."""
+    global _cache_backend
+    if _cache_backend is None:
+        _cache_backend = create_cache_backend(get_settings())
+    return _cache_backend
@@ -0,0 +1,68 @@
+"""Circuit breaker tracking the health of an upstream dependency."""
+
+import logging
+import time
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker states."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures.
+    
+    A single failed call does not open the circuit, so a momentary upstream
+    blip is not reported as an outage. Once open, the circuit moves to
+    half-open after `reset_timeout` seconds; the next success closes it and
+    the next failure opens it again.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+    
+    @property
+    def state(self) -> CircuitState:
+        """Current state, moving from open to half-open once the reset timeout has passed."""
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+    
+    @property
+    def consecutive_failures(self) -> int:
+        """Number of failures since the last success."""
+        return self._consecutive_failures
+    
+    def allow_request(self) -> bool:
+        """Whether a call to the upstream should be attempted."""
+        return self.state != CircuitState.OPEN
+    
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        if self._opened_at is not None:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._consecutive_failures = 0
+        self._opened_at = None
+    
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit at the threshold."""
+        self._consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN or (
+            self._opened_at is None and self._consecutive_failures >= self._failure_threshold
+        ):
+            logger.warning(
+                f"Circuit '{self.name}' opened after {self._consecutive_failures} consecutive failures"
+            )
+            self._opened_at = time.monotonic()
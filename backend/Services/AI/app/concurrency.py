@@ -0,0 +1,57 @@
+"""Concurrency limits used to isolate traffic classes from each other."""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of in-flight operations for one traffic class.
+    
+    Callers wait up to `queue_timeout` seconds for a free slot and are then
+    rejected with 503, so a burst in one class (e.g. class-wide essay grading)
+    cannot exhaust the capacity available to end-user requests.
+    """
+    
+    def __init__(self, name: str, max_concurrency: int, queue_timeout: float) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of operations currently holding a slot."""
+        return self._in_flight
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of the block.
+        
+        Raises:
+            HTTPException: 503 if no slot frees up within the queue timeout
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self._queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Concurrency limit reached for {self.name} ({self.max_concurrency} in flight)")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Too many concurrent {self.name} requests, retry later",
+                headers={"Retry-After": "1"}
+            )
+        
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
@@ -12,6 +12,53 @@ class Settings(BaseSettings):
     app_name: str = "FrogEdu AI Service"
     debug: bool = False
     
+    # Logging Configuration
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "text"
+    log_async: bool = True  # format and write logs on a background thread
+    log_queue_size: int = 10000
+    # Fraction of successful requests that get an access log line, per route path;
+    # errors and slow requests are always logged
+    log_sample_rate: float = 1.0
+    log_sample_rates: dict[str, float] = {}
+    log_slow_request_ms: float = 5000.0
+    
+    # Pre-warm clients, keys and schemas during Lambda init / ASGI startup
+    prewarm_on_init: bool = True
+    prewarm_timeout_seconds: float = 5.0
+    
+    # Ask Gemini for the compact question wire format (app/services/wire_format.py)
+    compact_output_schema: bool = True
+    
+    # Question generation: expected output tokens per Gemini call; larger topic
+    # quantities are split into parallel chunks and small rows of one question
+    # type share calls of at least min_call_tokens (app/services/chunking.py)
+    generation_output_token_budget: int = 3000
+    generation_max_concurrency: int = 4
+    generation_min_call_tokens: int = 800
+    # Follow-up calls for rows still short of their quantity after truncation or failures
+    generation_topup_rounds: int = 1
+    # Regeneration attempts for a question that breaks its type's rules (app/services/question_rules.py)
+    question_repair_attempts: int = 1
+    # Estimated Jaccard similarity at which a question counts as a near-duplicate
+    # of one already in the matrix or the teacher's history (app/services/near_duplicates.py)
+    near_duplicate_threshold: float = 0.85
+    
+    # Question pool: past generations in a local SQLite file, served before calling Gemini
+    # (app/services/question_pool.py). A background refiller (server mode) tops up
+    # topics that ran short to target_per_topic questions.
+    question_pool_enabled: bool = True
+    question_pool_path: str = "/tmp/frogedu_question_pool.sqlite3"
+    question_pool_target_per_topic: int = 30
+    question_pool_refill_interval_seconds: float = 300.0
+    
+    # Response compression: gzip bodies of at least this many bytes (level 1-9)
+    response_compression_min_bytes: int = 4096
+    response_compression_level: int = 5
+    
+    # Server mode: outbound connection pool size per worker
+    http_max_connections: int = 100
+    
     # CORS Configuration
     cors_origins: list[str] = ["*"]
     
@@ -24,6 +71,35 @@ class Settings(BaseSettings):
     
     # Subscription Service Configuration (for Backend Token Enrichment)
     subscription_service_url: str = "http://localhost:5003/api/subscriptions"
+    subscription_batch_size: int = 100
+    subscription_batch_concurrency: int = 10
+    
+    # Enrichment Token Configuration (signed, client-echoed subscription claims)
+    # Keys are a JSON object of key ID -> HMAC secret, e.g. {"2026-10": "..."}.
+    # Leave empty to disable enrichment tokens.
+    enrichment_token_keys: dict[str, str] = {}
+    enrichment_token_active_kid: str = ""
+    enrichment_token_ttl_seconds: int = 300
+    
+    # Cache Configuration ("memory" is per-process, "redis" is shared across instances)
+    cache_backend: str = "memory"
+    cache_redis_url: str = ""
+    cache_key_prefix: str = "frogedu:ai:"
+    
+    # Internal Service-to-Service Configuration
+    # JSON object of caller name -> accepted HMAC secrets (list allows key rotation),
+    # e.g. {"class-service": ["new-secret", "old-secret"]}
+    internal_service_keys: dict[str, list[str]] = {}
+    internal_credential_max_age_seconds: int = 300
+    internal_grading_max_concurrency: int = 8
+    internal_grading_queue_timeout_seconds: float = 10.0
+    
+    # Health Checks: the Gemini probe runs in the background, never per request
+    health_probe_interval_seconds: float = 60.0
+    health_probe_timeout_seconds: float = 5.0
+    # Consecutive failed probes before the upstream circuit opens
+    health_failure_threshold: int = 3
+    health_circuit_reset_seconds: float = 30.0
     
     @property
     def cognito_issuer(self) -> str:
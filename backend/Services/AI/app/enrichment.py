@@ -0,0 +1,128 @@
+"""
+Signed enrichment tokens for subscription claims.
+
+After a subscription lookup, the AI service issues a short-lived HMAC-signed
+token carrying the user's subscription claims. Clients echo it back in the
+`X-Enrichment-Token` header, so any container - including a cold one with an
+empty `SubscriptionClient` cache - can verify it locally and skip the
+Subscription service call.
+
+Key rotation: every token carries the key ID (`kid`) it was signed with.
+To rotate, add the new key to `ENRICHMENT_TOKEN_KEYS`, switch
+`ENRICHMENT_TOKEN_ACTIVE_KID` to it, and remove the old key once the token
+TTL has elapsed. Tokens signed with an unknown key are ignored and the
+claims are fetched from the Subscription service as usual.
+"""
+
+import logging
+import time
+from typing import Any
+
+from app.config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+ENRICHMENT_TOKEN_HEADER = "X-Enrichment-Token"
+
+_ISSUER = "frogedu-ai-enrichment"
+_ALGORITHM = "HS256"
+_CLAIM_FIELDS = ("plan", "expires_at", "has_active_subscription")
+
+
+class EnrichmentTokenSigner:
+    """Issues and verifies signed enrichment tokens."""
+    
+    def __init__(self, settings: Settings) -> None:
+        self._keys = dict(settings.enrichment_token_keys)
+        self._active_kid = settings.enrichment_token_active_kid or next(iter(self._keys), "")
+        self._ttl_seconds = settings.enrichment_token_ttl_seconds
+        
+        if self._active_kid and self._active_kid not in self._keys:
+            logger.error(
+                f"Enrichment token active kid '{self._active_kid}' has no key, "
+                f"enrichment tokens will not be issued"
+            )
+            self._active_kid = ""
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether tokens can be issued."""
+        return bool(self._active_kid) and self._ttl_seconds > 0
+    
+    def issue(self, subject: str, claims: dict[str, Any]) -> str | None:
+        """
+        Sign subscription claims for a user.
+        
+        Args:
+            subject: The Cognito user ID the token is bound to
+            claims: Subscription claims (plan, expires_at, has_active_subscription)
+            
+        Returns:
+            The signed token, or None if issuing is disabled
+        """
+        if not self.enabled:
+            return None
+        
+        from jose import jwt
+        
+        now = int(time.time())
+        payload: dict[str, Any] = {
+            "iss": _ISSUER,
+            "sub": subject,
+            "iat": now,
+            "exp": now + self._ttl_seconds,
+        }
+        payload.update({field: claims[field] for field in _CLAIM_FIELDS if field in claims})
+        return jwt.encode(
+            payload,
+            self._keys[self._active_kid],
+            algorithm=_ALGORITHM,
+            headers={"kid": self._active_kid},
+        )
+    
+    def verify(self, token: str, subject: str) -> dict[str, Any] | None:
+        """
+        Verify a token and return its subscription claims.
+        
+        Args:
+            token: The token echoed back by the client
+            subject: The Cognito user ID of the authenticated caller
+            
+        Returns:
+            The subscription claims, or None if the token is invalid, expired,
+            signed with an unknown key or issued for another user
+        """
+        from jose import jwt, JWTError
+        
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self._keys.get(kid or "")
+            if not key:
+                logger.info("Enrichment token signed with unknown key: %s", kid)
+                return None
+            
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=[_ALGORITHM],
+                issuer=_ISSUER,
+                subject=subject,
+                options={"verify_aud": False},
+            )
+        except JWTError as e:
+            logger.info("Rejected enrichment token: %s", e)
+            return None
+        
+        return {field: payload[field] for field in _CLAIM_FIELDS if field in payload}
+
+
+# Global singleton instance
+_enrichment_signer: EnrichmentTokenSigner | None = None
+
+
+def get_enrichment_signer() -> EnrichmentTokenSigner:
+    """Get the enrichment token signer singleton instance."""
+    global _enrichment_signer
+    if _enrichment_signer is None:
+        _enrichment_signer = EnrichmentTokenSigner(get_settings())
+    return _enrichment_signer
@@ -0,0 +1,199 @@
+"""
+Cached health checks for liveness and readiness probes.
+
+Probe endpoints never call an upstream themselves. A background check
+probes Gemini (a metadata lookup, no generation quota) and keeps the JWKS
+key set fresh every `health_probe_interval_seconds`; the probes report the
+cached outcome together with the Gemini circuit breaker state. In server
+mode the check runs on a timer started by the ASGI lifespan. On Lambda,
+where background work is frozen between invocations, a stale result
+schedules a refresh instead, and the probe answers from the previous result.
+"""
+
+import asyncio
+import logging
+import time
+
+from app.auth import JWKSCache, get_jwks_cache
+from app.cache import CacheBackend, get_cache_backend
+from app.circuit_breaker import CircuitBreaker, CircuitState
+from app.config import get_settings, Settings
+from app.schemas import ComponentHealth, ReadinessResponse
+from app.services import get_shared_gemini_service
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the readiness cache ping, which runs inline
+_CACHE_PING_TIMEOUT_SECONDS = 0.5
+
+
+class HealthMonitor:
+    """Runs upstream checks in the background and serves their cached results."""
+    
+    def __init__(
+        self,
+        settings: Settings,
+        jwks_cache: JWKSCache | None = None,
+        cache: CacheBackend | None = None
+    ) -> None:
+        self._settings = settings
+        self._jwks_cache = jwks_cache or get_jwks_cache()
+        self._cache = cache or get_cache_backend()
+        self._interval = settings.health_probe_interval_seconds
+        self._timeout = settings.health_probe_timeout_seconds
+        self.breaker = CircuitBreaker(
+            "gemini",
+            failure_threshold=settings.health_failure_threshold,
+            reset_timeout=settings.health_circuit_reset_seconds,
+        )
+        self._gemini_ok: bool | None = None
+        self._gemini_error: str | None = None
+        self._checked_at: float | None = None
+        self._check_task: asyncio.Task | None = None
+        self._loop_task: asyncio.Task | None = None
+    
+    @property
+    def gemini_connected(self) -> bool:
+        """Whether the last Gemini probe succeeded."""
+        return bool(self._gemini_ok)
+    
+    def is_stale(self) -> bool:
+        """Whether the cached result is older than the probe interval."""
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self._interval
+    
+    async def run_checks(self) -> None:
+        """Probe Gemini and refresh the JWKS key set if it is due."""
+        await asyncio.gather(self._probe_gemini(), self._refresh_jwks())
+        self._checked_at = time.monotonic()
+    
+    def refresh_if_stale(self) -> None:
+        """Schedule `run_checks` in the background if the cached result is stale."""
+        if not self.is_stale() or (self._check_task and not self._check_task.done()):
+            return
+        self._check_task = asyncio.create_task(self.run_checks())
+    
+    def start(self) -> None:
+        """Start the periodic background check (server mode)."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run_periodically())
+    
+    async def stop(self) -> None:
+        """Stop the periodic background check."""
+        for task in (self._loop_task, self._check_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop_task = None
+        self._check_task = None
+    
+    async def readiness(self) -> ReadinessResponse:
+        """
+        Build the readiness report from cached results.
+        
+        Only the cache backend is checked inline (a bounded ping). The
+        instance is not ready while it has no JWKS keys, since it cannot
+        authenticate any request; Gemini or cache problems only degrade it,
+        as replacing the instance would not fix them.
+        """
+        self.refresh_if_stale()
+        components = {
+            "gemini": self._gemini_health(),
+            "jwks": self._jwks_health(),
+            "cache": await self._cache_health(),
+        }
+        
+        ready = components["jwks"].status != "down"
+        if not ready:
+            overall = "not_ready"
+        elif all(c.status in ("ok", "unconfigured") for c in components.values()):
+            overall = "ready"
+        else:
+            overall = "degraded"
+        
+        return ReadinessResponse(
+            status=overall,
+            ready=ready,
+            service_name=self._settings.app_name,
+            components=components,
+        )
+    
+    async def _run_periodically(self) -> None:
+        while True:
+            try:
+                await self.run_checks()
+            except Exception as e:
+                logger.error(f"Background health check failed: {e}")
+            await asyncio.sleep(self._interval)
+    
+    async def _probe_gemini(self) -> None:
+        if not self.breaker.allow_request():
+            # Circuit open: wait for the reset timeout before probing again
+            return
+        
+        try:
+            ok = await asyncio.wait_for(get_shared_gemini_service().health_check(), timeout=self._timeout)
+            error = None if ok else "Gemini API probe failed"
+        except asyncio.TimeoutError:
+            ok, error = False, f"Gemini API probe timed out after {self._timeout}s"
+        
+        self._gemini_ok, self._gemini_error = ok, error
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+    
+    async def _refresh_jwks(self) -> None:
+        if not self._settings.cognito_user_pool_id:
+            return
+        await self._jwks_cache.prefetch(self._settings.cognito_jwks_url)
+    
+    def _gemini_health(self) -> ComponentHealth:
+        age = None if self._checked_at is None else round(time.monotonic() - self._checked_at, 1)
+        state = self.breaker.state
+        detail = f"circuit {state.value}, {self.breaker.consecutive_failures} consecutive failures"
+        if self._gemini_error:
+            detail = f"{detail}; {self._gemini_error}"
+        
+        if self._gemini_ok is None:
+            return ComponentHealth(status="unknown", detail="not probed yet", age_seconds=age)
+        if state == CircuitState.OPEN:
+            return ComponentHealth(status="down", detail=detail, age_seconds=age)
+        return ComponentHealth(status="ok" if self._gemini_ok else "degraded", detail=detail, age_seconds=age)
+    
+    def _jwks_health(self) -> ComponentHealth:
+        if not self._settings.cognito_user_pool_id:
+            return ComponentHealth(status="unconfigured", detail="COGNITO_USER_POOL_ID is not set")
+        
+        age = self._jwks_cache.age_seconds
+        if age is None or self._jwks_cache.key_count == 0:
+            return ComponentHealth(status="down", detail="no signing keys loaded")
+        
+        detail = f"{self._jwks_cache.key_count} keys"
+        if age > self._jwks_cache.max_age_seconds:
+            return ComponentHealth(status="degraded", detail=f"{detail}, refresh overdue", age_seconds=round(age, 1))
+        return ComponentHealth(status="ok", detail=detail, age_seconds=round(age, 1))
+    
+    async def _cache_health(self) -> ComponentHealth:
+        backend = type(self._cache).__name__
+        try:
+            reachable = await asyncio.wait_for(self._cache.ping(), timeout=_CACHE_PING_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            reachable = False
+        if reachable:
+            return ComponentHealth(status="ok", detail=backend, age_seconds=0.0)
+        return ComponentHealth(status="degraded", detail=f"{backend} unreachable, serving uncached", age_seconds=0.0)
+
+
+# Global singleton instance
+_health_monitor: HealthMonitor | None = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get the health monitor singleton instance."""
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(get_settings())
+    return _health_monitor
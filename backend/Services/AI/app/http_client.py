@@ -0,0 +1,53 @@
+"""
+Shared outbound HTTP connection pool.
+
+In server mode the application lifespan opens one `httpx.AsyncClient` per
+worker so connections (and TLS sessions) to Cognito and the Subscription
+service are reused across requests. In Lambda mode no lifespan runs and
+`http_client()` falls back to a short-lived client per call.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+_shared_client: "httpx.AsyncClient | None" = None
+
+
+async def open_shared_client(max_connections: int = 100) -> None:
+    """Open the shared connection pool (called from the application lifespan)."""
+    global _shared_client
+    import httpx
+    
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        logger.info(f"Opened shared HTTP client (max {max_connections} connections)")
+
+
+async def close_shared_client() -> None:
+    """Close the shared connection pool."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+        logger.info("Closed shared HTTP client")
+
+
+@asynccontextmanager
+async def http_client() -> AsyncIterator["httpx.AsyncClient"]:
+    """Yield the shared client if one is open, otherwise a temporary client."""
+    if _shared_client is not None and not _shared_client.is_closed:
+        yield _shared_client
+        return
+    
+    import httpx
+    
+    async with httpx.AsyncClient() as client:
+        yield client
@@ -0,0 +1,123 @@
+"""
+Authentication for trusted internal callers (service-to-service).
+
+Internal callers such as the Class service's `AIServiceClient` authenticate
+with a locally verifiable HMAC credential instead of an end-user Cognito JWT.
+No JWKS fetch and no Subscription service lookup is made on this path.
+
+Credential format (sent in the `X-Internal-Credential` header):
+
+    v1.<caller>.<unix_timestamp>.<hex HMAC-SHA256(secret, "<caller>.<unix_timestamp>")>
+
+Each caller may have several accepted secrets, which allows rotating keys
+without downtime.
+"""
+
+import hashlib
+import hmac
+import logging
+import time
+from typing import Annotated
+
+from fastapi import Depends, Header, HTTPException, status
+from pydantic import BaseModel, Field
+
+from app.config import get_settings, Settings
+
+logger = logging.getLogger(__name__)
+
+INTERNAL_CREDENTIAL_HEADER = "X-Internal-Credential"
+
+_CREDENTIAL_VERSION = "v1"
+
+
+class InternalCaller(BaseModel):
+    """A trusted service authenticated with an internal credential."""
+    name: str = Field(description="Name of the calling service")
+    issued_at: int = Field(description="Unix timestamp the credential was signed at")
+
+
+def sign_internal_credential(caller: str, secret: str, issued_at: int | None = None) -> str:
+    """
+    Build an internal credential for a caller.
+    
+    Args:
+        caller: Name of the calling service (must not contain '.')
+        secret: Shared secret configured for the caller
+        issued_at: Unix timestamp to sign (defaults to now)
+        
+    Returns:
+        The credential header value
+    """
+    timestamp = int(time.time()) if issued_at is None else issued_at
+    message = f"{caller}.{timestamp}".encode()
+    signature = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"{_CREDENTIAL_VERSION}.{caller}.{timestamp}.{signature}"
+
+
+def verify_internal_credential(credential: str, settings: Settings) -> InternalCaller:
+    """
+    Verify an internal credential locally.
+    
+    Args:
+        credential: The `X-Internal-Credential` header value
+        settings: Application settings
+        
+    Returns:
+        The authenticated InternalCaller
+        
+    Raises:
+        HTTPException: If the credential is malformed, expired or has a bad signature
+    """
+    parts = credential.split(".")
+    if len(parts) != 4 or parts[0] != _CREDENTIAL_VERSION:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Malformed internal credential"
+        )
+    
+    _, caller, timestamp_str, signature = parts
+    secrets = settings.internal_service_keys.get(caller)
+    if not secrets or not (timestamp_str.isascii() and timestamp_str.isdigit()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unknown internal caller"
+        )
+    
+    issued_at = int(timestamp_str)
+    if abs(time.time() - issued_at) > settings.internal_credential_max_age_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Internal credential expired"
+        )
+    
+    # Compared as bytes: compare_digest rejects non-ASCII str, and header values may hold any latin-1 character
+    signature_bytes = signature.encode("utf-8", "surrogateescape")
+    for secret in secrets:
+        expected = sign_internal_credential(caller, secret, issued_at)
+        if hmac.compare_digest(expected.rsplit(".", 1)[1].encode(), signature_bytes):
+            return InternalCaller(name=caller, issued_at=issued_at)
+    
+    logger.warning("Invalid internal credential signature for caller %s", caller)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid internal credential"
+    )
+
+
+async def get_internal_caller(
+    settings: Annotated[Settings, Depends(get_settings)],
+    credential: Annotated[str | None, Header(alias=INTERNAL_CREDENTIAL_HEADER)] = None
+) -> InternalCaller:
+    """
+    FastAPI dependency to authenticate a trusted internal caller.
+    
+    Raises:
+        HTTPException: If the credential is missing or invalid
+    """
+    if not credential:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Internal credential required"
+        )
+    return verify_internal_credential(credential, settings)
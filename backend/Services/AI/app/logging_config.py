@@ -0,0 +1,148 @@
+"""
+Structured, non-blocking logging.
+
+Log records are pushed onto an in-memory queue by the request path and
+formatted and written to stdout by a background listener thread, so neither
+message formatting nor the stdout write is paid by the request. Records are
+emitted as one JSON object per line (or plain text with LOG_FORMAT=text),
+which CloudWatch Logs Insights can query directly.
+
+Messages should use lazy %-style arguments (`logger.debug("x=%s", x)`) so
+records filtered out by level are never formatted at all.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from app.config import Settings
+
+# Headers whose values must never reach the logs
+REDACTED_HEADERS = frozenset({
+    "authorization",
+    "cookie",
+    "set-cookie",
+    "x-api-key",
+    "x-enrichment-token",
+    "x-internal-credential",
+})
+
+# Attributes present on every LogRecord; anything else was passed via `extra=`
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+_queue: "queue.Queue[logging.LogRecord] | None" = None
+_handlers: tuple[QueueHandler, logging.Handler] | None = None
+
+
+def redact_headers(headers: list[tuple[bytes, bytes]]) -> dict[str, str]:
+    """Decode raw ASGI headers, masking credentials."""
+    redacted: dict[str, str] = {}
+    for raw_name, raw_value in headers:
+        name = raw_name.decode("latin-1").lower()
+        redacted[name] = "[REDACTED]" if name in REDACTED_HEADERS else raw_value.decode("latin-1")
+    return redacted
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as a single-line JSON object, including `extra=` fields."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record as-is.
+    
+    The stock handler formats the message on the calling thread before
+    enqueueing; here formatting is left to the listener thread.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Drop rather than block the request path when the writer falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging(settings: Settings) -> None:
+    """Install the root handlers according to the logging settings."""
+    global _handlers
+    stop_logging()
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.log_format.lower() == "json":
+        formatter: logging.Formatter = JsonFormatter()
+        formatter.converter = time.gmtime
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    stream_handler.setFormatter(formatter)
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(settings.log_level.upper())
+    
+    if settings.log_async:
+        queue_handler = _DeferredQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        root.addHandler(queue_handler)
+        _handlers = (queue_handler, stream_handler)
+        _start_listener(queue_handler, stream_handler)
+    else:
+        _handlers = None
+        root.addHandler(stream_handler)
+
+
+def _restart_after_fork() -> None:
+    """Threads do not survive fork (gunicorn preload): give each worker its own listener."""
+    if _handlers is not None:
+        _start_listener(*_handlers)
+
+
+def _start_listener(queue_handler: QueueHandler, stream_handler: logging.Handler) -> None:
+    """Attach a fresh queue to the handler and start a listener thread draining it."""
+    global _listener, _queue
+    _queue = queue.Queue(maxsize=queue_handler.queue.maxsize)  # type: ignore[attr-defined]
+    queue_handler.queue = _queue
+    _listener = QueueListener(_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logs() -> None:
+    """Block until every queued record has been written (e.g. before Lambda freezes)."""
+    if _queue is not None and _listener is not None:
+        _queue.join()
+
+
+def stop_logging() -> None:
+    """Drain the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
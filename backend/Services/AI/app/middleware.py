@@ -1,9 +1,39 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+"""
+Pure-ASGI middlewares.
 
+These wrap the ASGI callable directly instead of using `BaseHTTPMiddleware`
+or `@app.middleware("http")`, which build a `Request`, spawn a task and
+re-stream the response body for every request. Here only `scope` is read
+or rewritten (and `send` observed for the status code), so the per-request
+cost is a couple of dict lookups and streaming responses pass through untouched.
+"""
 
-class PathPrefixMiddleware(BaseHTTPMiddleware):
+import logging
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logging_config import redact_headers
+
+logger = logging.getLogger(__name__)
+
+
+class PathNormalizeMiddleware:
+    """Fix paths that come from API Gateway without leading slashes."""
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            path = scope.get("path", "")
+            if not path.startswith("/"):
+                scope["path"] = "/" + path
+        await self.app(scope, receive, send)
+
+
+class PathPrefixMiddleware:
     """
     Middleware to ensure all requests have the /api/ai/ prefix.
     
@@ -11,24 +41,86 @@ class PathPrefixMiddleware(BaseHTTPMiddleware):
     when routing to Lambda, but FastAPI expects the full path.
     """
     
-    def __init__(self, app: ASGIApp, prefix: str = "/api/ai"):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, prefix: str = "/api/ai") -> None:
+        self.app = app
         self.prefix = prefix
     
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        
-        # If path doesn't start with the prefix and doesn't start with /api/ai/
-        if not path.startswith(self.prefix):
-            # Ensure path starts with /
-            if not path.startswith("/"):
-                path = "/" + path
-            
-            # Prepend the prefix
-            path = self.prefix + path
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            path = scope.get("path", "")
             
-            # Modify the request scope to use the new path
-            request.scope["path"] = path
+            # If path doesn't start with the prefix, ensure it starts with / and prepend the prefix
+            if not path.startswith(self.prefix):
+                if not path.startswith("/"):
+                    path = "/" + path
+                scope["path"] = self.prefix + path
+        
+        await self.app(scope, receive, send)
+
+
+class RequestLoggingMiddleware:
+    """
+    Emit one structured access log line per HTTP request.
+    
+    Successful requests are sampled per route path (`sample_rates`, falling
+    back to `sample_rate`); server errors and slow requests are always
+    logged. Headers are only logged at DEBUG level, with credentials redacted.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = 1.0,
+        sample_rates: dict[str, float] | None = None,
+        slow_request_ms: float = 5000.0
+    ) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+        self.slow_request_ms = slow_request_ms
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            logger.exception(
+                "Unhandled exception in %s %s", scope["method"], scope["path"],
+                extra={"method": scope["method"], "path": scope["path"]}
+            )
+            raise
+        
+        duration_ms = (time.perf_counter() - start) * 1000
+        path = scope["path"]
+        rate = self.sample_rates.get(path, self.sample_rate)
+        if status_code < 500 and duration_ms < self.slow_request_ms and rate < 1.0 and random.random() >= rate:
+            return
         
-        response = await call_next(request)
-        return response
+        logger.log(
+            logging.WARNING if status_code >= 500 else logging.INFO,
+            "%s %s %s %.1fms", scope["method"], path, status_code, duration_ms,
+            extra={
+                "method": scope["method"],
+                "path": path,
+                "status": status_code,
+                "duration_ms": round(duration_ms, 1),
+                "sample_rate": rate,
+            }
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Request headers for %s %s", scope["method"], path,
+                extra={"headers": redact_headers(scope["headers"]), "query": scope.get("query_string", b"").decode("latin-1")}
+            )
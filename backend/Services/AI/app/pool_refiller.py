@@ -0,0 +1,102 @@
+"""
+Background top-up of the question pool.
+
+Topics that could not be served from the pool alone are recorded as demand
+by the generation endpoints. Every `question_pool_refill_interval_seconds`
+the refiller generates questions for those topics until each holds
+`question_pool_target_per_topic`, so the next teacher asking for the same
+topic is served from the pool. Runs on a timer started by the ASGI lifespan
+(server mode); on Lambda, background work is frozen between invocations and
+the pool fills from regular generations only.
+"""
+
+import asyncio
+import logging
+
+from app.config import get_settings, Settings
+from app.schemas import GenerateQuestionsRequest, MatrixTopicConfig
+from app.services import get_shared_gemini_service
+from app.services.question_pool import QuestionPool, get_question_pool, question_types_for
+
+logger = logging.getLogger(__name__)
+
+
+class PoolRefiller:
+    """Periodically generates questions for pool topics that ran short."""
+    
+    def __init__(self, settings: Settings, pool: QuestionPool) -> None:
+        self._pool = pool
+        self._interval = settings.question_pool_refill_interval_seconds
+        self._target = settings.question_pool_target_per_topic
+        self._task: asyncio.Task | None = None
+    
+    async def refill_once(self) -> int:
+        """
+        Top up every topic recorded as demand since the last run.
+        
+        Returns:
+            Number of questions generated
+        """
+        generated = 0
+        for demand in self._pool.drain_demand():
+            available = await self._pool.count(demand.key, question_types_for(demand.question_type))
+            missing = self._target - available
+            if missing <= 0:
+                continue
+            request = GenerateQuestionsRequest(
+                subject=demand.subject,
+                grade=demand.key.grade,
+                language=demand.key.language,
+                matrix_topics=[MatrixTopicConfig(
+                    topic_id=demand.topic_id or demand.key.topic,
+                    topic_name=demand.topic_name,
+                    cognitive_level=demand.key.cognitive_level,
+                    quantity=missing,
+                    question_type=demand.question_type,
+                )],
+            )
+            try:
+                generated += await get_shared_gemini_service().refill_pool(request)
+            except Exception as e:
+                logger.warning(f"Refilling question pool for topic {demand.topic_name} failed: {e}")
+        if generated:
+            logger.info(f"Refilled question pool with {generated} questions")
+        return generated
+    
+    def start(self) -> None:
+        """Start the periodic refill (server mode)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_periodically())
+    
+    async def stop(self) -> None:
+        """Stop the periodic refill."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+    
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.refill_once()
+            except Exception as e:
+                logger.error(f"Question pool refill failed: {e}")
+
+
+# Global singleton instance
+_pool_refiller: PoolRefiller | None = None
+
+
+def get_pool_refiller() -> PoolRefiller | None:
+    """Get the pool refiller singleton instance, or None if the question pool is disabled."""
+    global _pool_refiller
+    pool = get_question_pool()
+    if pool is None:
+        return None
+    if _pool_refiller is None:
+        _pool_refiller = PoolRefiller(get_settings(), pool)
+    return _pool_refiller
@@ -4,16 +4,34 @@ from .requests import (
     MatrixTopicConfig,
     GenerateQuestionsRequest,
     GenerateSingleQuestionRequest,
+    TopicFulfilment,
     GenerateQuestionsResponse,
+    TemplateVariable,
+    QuestionTemplate,
+    GenerateTemplateRequest,
+    QuestionTemplateResponse,
+    InstantiateTemplateRequest,
+    GenerateVariantsRequest,
+    QuestionVariantsResponse,
+    ShuffleFormsRequest,
+    ShuffleFormsResponse,
+    RegenerateQuestionRequest,
+    QuestionRepairStats,
+    QuestionRepairMetricsResponse,
     TutorChatRequest,
     TutorChatResponse,
     HealthResponse,
+    LivenessResponse,
+    ComponentHealth,
+    ReadinessResponse,
     ExplainQuestionRequest,
     ExplainQuestionResponse,
     GradeEssayRequest,
     GradeEssayResponse,
     SocraticHintsRequest,
     SocraticHintsResponse,
+    WarmSubscriptionCacheRequest,
+    WarmSubscriptionCacheResponse,
 )
 
 __all__ = [
@@ -22,14 +40,32 @@ __all__ = [
     "MatrixTopicConfig",
     "GenerateQuestionsRequest",
     "GenerateSingleQuestionRequest",
+    "TopicFulfilment",
     "GenerateQuestionsResponse",
+    "TemplateVariable",
+    "QuestionTemplate",
+    "GenerateTemplateRequest",
+    "QuestionTemplateResponse",
+    "InstantiateTemplateRequest",
+    "GenerateVariantsRequest",
+    "QuestionVariantsResponse",
+    "ShuffleFormsRequest",
+    "ShuffleFormsResponse",
+    "RegenerateQuestionRequest",
+    "QuestionRepairStats",
+    "QuestionRepairMetricsResponse",
     "TutorChatRequest",
     "TutorChatResponse",
     "HealthResponse",
+    "LivenessResponse",
+    "ComponentHealth",
+    "ReadinessResponse",
     "ExplainQuestionRequest",
     "ExplainQuestionResponse",
     "GradeEssayRequest",
     "GradeEssayResponse",
     "SocraticHintsRequest",
     "SocraticHintsResponse",
+    "WarmSubscriptionCacheRequest",
+    "WarmSubscriptionCacheResponse",
 ]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Any
+from typing import Any, Literal, Optional
 from app.models.enums import CognitiveLevel, QuestionType
 
 
@@ -8,6 +8,10 @@ class Answer(BaseModel):
     content: str = Field(..., description="The answer text")
     is_correct: bool = Field(..., description="Whether this is the correct answer")
     explanation: Optional[str] = Field(None, description="Explanation for the answer")
+    student_explanation: Optional[str] = Field(
+        None,
+        description="Grade-appropriate explanation for a student who chose this answer"
+    )
     point: float = Field(default=1.0, ge=0, description="Points awarded for this answer")
 
 
@@ -44,6 +48,10 @@ class GenerateQuestionsRequest(BaseModel):
         description="Matrix configuration defining topics and quantities"
     )
     language: str = Field(default="vi", description="Language for generated content (vi/en)")
+    student_explanations: bool = Field(
+        default=False,
+        description="Also write a student-facing explanation per answer, served by /explain without a model call"
+    )
 
 
 class GenerateSingleQuestionRequest(BaseModel):
@@ -59,12 +67,160 @@ class GenerateSingleQuestionRequest(BaseModel):
         default="", 
         description="Brief description of the topic for context"
     )
+    student_explanations: bool = Field(
+        default=False,
+        description="Also write a student-facing explanation per answer, served by /explain without a model call"
+    )
+
+
+class TopicFulfilment(BaseModel):
+    """How many of a matrix row's requested questions were generated."""
+    topic_id: str = Field(..., description="ID of the topic")
+    requested: int = Field(..., description="Quantity requested in the matrix row")
+    generated: int = Field(..., description="Questions returned for the row")
+    from_pool: int = Field(0, description="How many of them were served from the question pool")
+    fulfilled: bool = Field(..., description="Whether the requested quantity was reached")
 
 
 class GenerateQuestionsResponse(BaseModel):
     """Response containing generated questions."""
     questions: list[Question] = Field(..., description="List of generated questions")
     total_count: int = Field(..., description="Total number of questions generated")
+    fulfilment: list[TopicFulfilment] = Field(
+        default_factory=list,
+        description="Per matrix row: requested vs generated question counts"
+    )
+
+
+class TemplateVariable(BaseModel):
+    """A typed variable of a parametric question template."""
+    name: str = Field(..., pattern=r"^[A-Za-z_][A-Za-z0-9_]*$", description="Placeholder name, used as {name}")
+    kind: Literal["int", "decimal", "choice"] = Field("int", description="Value type")
+    min: Optional[float] = Field(None, description="Smallest value (int/decimal)")
+    max: Optional[float] = Field(None, description="Largest value (int/decimal)")
+    step: Optional[float] = Field(None, gt=0, description="Value step (default 1 for int, 0.1 for decimal)")
+    choices: list[int | float | str] = Field(
+        default_factory=list,
+        max_length=100,
+        description="Possible values (choice)"
+    )
+
+
+class QuestionTemplate(BaseModel):
+    """A parametrized question: text with typed variables, constraints and an answer formula."""
+    content: str = Field(..., description="Question text with {variable} placeholders")
+    question_type: QuestionType = Field(..., description="select or fill_in_blank")
+    cognitive_level: CognitiveLevel = Field(..., description="Bloom's taxonomy level")
+    language: str = Field(default="vi", description="Language of the text; sets the decimal separator")
+    variables: list[TemplateVariable] = Field(..., min_length=1, max_length=8)
+    constraints: list[str] = Field(
+        default_factory=list,
+        max_length=10,
+        description="Boolean expressions every variant must satisfy, e.g. \"a > b\""
+    )
+    answer: str = Field(..., description="Expression computing the correct answer, e.g. \"a - b\"")
+    distractors: list[str] = Field(
+        default_factory=list,
+        max_length=6,
+        description="Expressions computing plausible wrong answers (select)"
+    )
+    explanation: Optional[str] = Field(None, description="Explanation with {variable} and {answer} placeholders")
+    topic_id: Optional[str] = Field(None, description="Associated topic ID")
+
+
+class GenerateTemplateRequest(GenerateSingleQuestionRequest):
+    """Request to generate a parametric question template."""
+    variant_count: int = Field(default=0, ge=0, le=1000, description="Variants to instantiate right away")
+
+
+class QuestionTemplateResponse(BaseModel):
+    """A generated template and any variants instantiated from it."""
+    template: QuestionTemplate
+    questions: list[Question] = Field(default_factory=list, description="Instantiated variants")
+
+
+class InstantiateTemplateRequest(BaseModel):
+    """Request to instantiate question variants from a template, without a model call."""
+    template: QuestionTemplate
+    count: int = Field(..., ge=1, le=5000, description="Number of distinct variants")
+    seed: Optional[int] = Field(None, description="Random seed, for reproducible exam forms")
+
+
+class GenerateVariantsRequest(GenerateSingleQuestionRequest):
+    """Request for parallel versions of one question, e.g. for A/B exam forms."""
+    variant_count: int = Field(default=2, ge=2, le=10, description="Distinct variants to generate in one call")
+    shuffled_forms: int = Field(
+        default=0,
+        ge=0,
+        le=10,
+        description="Extra forms of the variants with answer order shuffled locally"
+    )
+    seed: Optional[int] = Field(None, description="Random seed for the answer shuffling")
+
+
+class QuestionVariantsResponse(BaseModel):
+    """Parallel versions of one question."""
+    variants: list[Question] = Field(..., description="Distinct variants at the same topic, level and type")
+    requested: int = Field(..., description="Number of variants requested")
+    forms: list[list[Question]] = Field(
+        default_factory=list,
+        description="Per shuffled form: the variants with answer order shuffled"
+    )
+
+
+class ShuffleFormsRequest(BaseModel):
+    """Request to derive exam forms by shuffling answer order, without a model call."""
+    questions: list[Question] = Field(..., min_length=1, max_length=500)
+    forms: int = Field(..., ge=1, le=20, description="Number of forms to derive")
+    seed: Optional[int] = Field(None, description="Random seed, for reproducible forms")
+
+
+class ShuffleFormsResponse(BaseModel):
+    """Exam forms derived from one set of questions."""
+    forms: list[list[Question]] = Field(
+        ...,
+        description="Per form: the questions in their original order, answer order shuffled"
+    )
+
+
+class RegenerateQuestionRequest(BaseModel):
+    """Request to replace one rejected question of a generated set."""
+    subject: str = Field(..., description="Subject name")
+    grade: int = Field(..., ge=1, le=12, description="Grade level")
+    topic_name: str = Field(..., description="Topic name")
+    topic_id: Optional[str] = Field(None, description="Topic ID to associate with the replacement")
+    language: str = Field(default="vi", description="Language (vi/en)")
+    topic_description: str = Field(default="", description="Brief description of the topic for context")
+    rejected: Question = Field(..., description="The rejected question; its type and cognitive level are kept")
+    reason: Optional[str] = Field(None, max_length=500, description="Why the teacher rejected it")
+    siblings: list[str] = Field(
+        default_factory=list,
+        max_length=100,
+        description="Other questions of the set to avoid, as text or a short prefix (first 200 characters are used)"
+    )
+    student_explanations: bool = Field(
+        default=False,
+        description="Also write a student-facing explanation per answer, served by /explain without a model call"
+    )
+
+
+class QuestionRepairStats(BaseModel):
+    """Rule-check outcomes for generated questions of one type from one model."""
+    model: str = Field(..., description="Gemini model name")
+    question_type: str = Field(..., description="Question type")
+    checked: int = Field(..., description="Questions checked against the type's rules")
+    auto_fixed: int = Field(..., description="Questions with at least one rule fixed automatically")
+    needs_repair: int = Field(..., description="Questions with a rule violation that could not be fixed")
+    repaired: int = Field(..., description="Questions regenerated successfully")
+    repair_failed: int = Field(..., description="Questions still invalid after regeneration (dropped)")
+    auto_fix_rate: float = Field(..., description="auto_fixed / checked")
+    repair_rate: float = Field(..., description="needs_repair / checked")
+    rules: dict[str, int] = Field(default_factory=dict, description="Violations per rule name")
+
+
+class QuestionRepairMetricsResponse(BaseModel):
+    """Question rule-check metrics for this instance since it started."""
+    stats: list[QuestionRepairStats] = Field(default_factory=list)
 
 
 class TutorChatRequest(BaseModel):
@@ -92,6 +248,27 @@ class HealthResponse(BaseModel):
     gemini_connected: bool = Field(..., description="Whether Gemini API is accessible")
 
 
+class LivenessResponse(BaseModel):
+    """Liveness probe response; answered without touching any dependency."""
+    status: str = Field(default="alive", description="Process status")
+    service_name: str = Field(..., description="Name of the service")
+
+
+class ComponentHealth(BaseModel):
+    """Health of a single dependency as seen by the readiness probe."""
+    status: str = Field(..., description="ok, degraded, down or unconfigured")
+    detail: Optional[str] = Field(None, description="Human-readable detail")
+    age_seconds: Optional[float] = Field(None, description="Seconds since the status was last observed")
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response built from cached dependency checks."""
+    status: str = Field(..., description="ready, degraded or not_ready")
+    ready: bool = Field(..., description="Whether the instance should receive traffic")
+    service_name: str = Field(..., description="Name of the service")
+    components: dict[str, ComponentHealth] = Field(default_factory=dict, description="Per-dependency health")
+
+
 class ExplainQuestionRequest(BaseModel):
     """Request to get a child-friendly explanation for an exam question."""
     question_content: str = Field(..., description="The question text")
@@ -100,11 +277,24 @@ class ExplainQuestionRequest(BaseModel):
     subject: str = Field(..., description="Subject name")
     student_answer: Optional[str] = Field(None, description="What the student answered (if wrong)")
     language: str = Field(default="vi", description="Language for explanation (vi/en)")
+    answers: list[Answer] = Field(
+        default_factory=list,
+        description="The question's stored answers; their student explanations are used when the answer matches"
+    )
+    student_answer_index: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Index in `answers` of the option the student chose"
+    )
 
 
 class ExplainQuestionResponse(BaseModel):
     """Response with a child-friendly explanation."""
     explanation: str = Field(..., description="Child-friendly explanation of the correct answer")
+    source: Literal["stored", "model"] = Field(
+        default="model",
+        description="Whether the explanation was stored with the question or generated now"
+    )
 
 
 class GradeEssayRequest(BaseModel):
@@ -139,3 +329,13 @@ class SocraticHintsResponse(BaseModel):
     """Response containing Socratic method guiding questions."""
     hints: list[str] = Field(..., description="List of Socratic guiding questions for the teacher")
     teaching_note: str = Field(..., description="Brief note on the pedagogical approach")
+
+
+class WarmSubscriptionCacheRequest(BaseModel):
+    """Request to pre-warm subscription claims, e.g. for a class before a scheduled exam."""
+    user_ids: list[str] = Field(..., min_length=1, max_length=5000, description="IDs of the users to warm")
+
+
+class WarmSubscriptionCacheResponse(BaseModel):
+    """Response from subscription cache warming."""
+    warmed_count: int = Field(..., description="Number of users whose claims are now cached")
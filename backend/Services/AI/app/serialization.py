@@ -0,0 +1,124 @@
+"""
+Fast JSON and MessagePack encoding for request/response payloads.
+
+Large responses (e.g. a 200-question `GenerateQuestionsResponse`) are
+serialized straight from the pydantic model by pydantic-core, bypassing
+FastAPI's `jsonable_encoder` pass. Callers that send
+`Accept: application/msgpack` (service-to-service clients) get MessagePack
+instead. Model output from Gemini is parsed with orjson.
+"""
+
+from typing import Any
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# OpenAPI `responses` entry documenting the negotiated MessagePack body
+MSGPACK_RESPONSE_DOC: dict[str, Any] = {"content": {MSGPACK_MEDIA_TYPE: {}}}
+
+
+def loads(data: str | bytes) -> Any:
+    """Parse a JSON document with orjson."""
+    return orjson.loads(data)
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to a JSON document with orjson."""
+    return orjson.dumps(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MsgPackResponse(Response):
+    """Response rendered as MessagePack."""
+    
+    media_type = MSGPACK_MEDIA_TYPE
+    
+    def render(self, content: Any) -> bytes:
+        import msgpack
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def _media_ranges(accept: str) -> dict[str, float]:
+    """Media ranges of an Accept header with their quality (q) values."""
+    ranges: dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, *params = part.split(";")
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+                if not 0.0 <= quality <= 1.0:
+                    quality = 1.0
+        ranges[media_type] = max(quality, ranges.get(media_type, 0.0))
+    return ranges
+
+
+def wants_msgpack(request: Request) -> bool:
+    """
+    Whether the client asked for a MessagePack response.
+    
+    MessagePack must be listed explicitly with a non-zero quality, at least
+    as high as JSON's (through `application/json`, `application/*` or `*/*`,
+    the most specific range winning); on a tie the explicit MessagePack wins.
+    """
+    ranges = _media_ranges(request.headers.get("accept", ""))
+    msgpack_quality = max((ranges.get(media_type, 0.0) for media_type in _MSGPACK_MEDIA_TYPES), default=0.0)
+    if msgpack_quality <= 0.0:
+        return False
+    json_quality = next(
+        (ranges[media_type] for media_type in ("application/json", "application/*", "*/*") if media_type in ranges),
+        0.0
+    )
+    return msgpack_quality >= json_quality
+
+
+def model_response(
+    request: Request,
+    model: BaseModel,
+    status_code: int = 200,
+    response: Response | None = None
+) -> Response:
+    """
+    Serialize a response model in the format negotiated with the client.
+    
+    Returning a Response from an endpoint skips FastAPI's re-validation and
+    `jsonable_encoder` pass; the model was already validated on construction.
+    FastAPI then also skips merging the headers set on the endpoint's injected
+    `Response` (e.g. the enrichment token set by the auth dependency), so
+    pass it as `response` to have them copied. Background tasks are attached
+    by FastAPI either way.
+    
+    Args:
+        request: The incoming request (its Accept header selects the format)
+        model: The validated response model
+        status_code: HTTP status code
+        response: The endpoint's injected Response, whose headers are copied
+    
+    Returns:
+        A MessagePack response if requested, otherwise JSON
+    """
+    if wants_msgpack(request):
+        result: Response = MsgPackResponse(model.model_dump(mode="json"), status_code=status_code)
+    else:
+        result = Response(model.model_dump_json(), status_code=status_code, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
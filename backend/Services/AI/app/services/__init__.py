@@ -1,4 +1,4 @@
-from .gemini_service import GeminiService
+from .gemini_service import GeminiService, get_shared_gemini_service
 from .subscription_client import (
     SubscriptionClient,
     SubscriptionClaimsResponse,
@@ -7,6 +7,7 @@ from .subscription_client import (
 
 __all__ = [
     "GeminiService",
+    "get_shared_gemini_service",
     "SubscriptionClient",
     "SubscriptionClaimsResponse",
     "get_subscription_client",
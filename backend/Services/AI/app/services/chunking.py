@@ -0,0 +1,164 @@
+"""
+Token-aware planning of matrix rows into generation calls.
+
+A topic asking for many questions is split into chunks whose expected output
+stays within a per-call output-token budget, so no single call risks
+truncation or runs past the request timeout. Small rows go the other way:
+rows of the same question type are packed into shared calls, so a matrix of
+twenty single-question rows does not send the prompt preamble twenty times.
+Expected output per question comes from `scripts/report_wire_format.py`,
+rounded up by ~1.5x for Vietnamese text and longer real-world explanations.
+"""
+
+import math
+import re
+from typing import NamedTuple, Optional, Sequence
+
+from app.models.enums import QuestionType
+from app.schemas import MatrixTopicConfig
+
+# Expected output tokens per question: (compact, verbose) wire format
+OUTPUT_TOKENS_PER_QUESTION: dict[Optional[QuestionType], tuple[int, int]] = {
+    QuestionType.SELECT: (120, 200),
+    QuestionType.MULTIPLE_CHOICE: (125, 205),
+    QuestionType.TRUE_FALSE: (60, 155),
+    QuestionType.ESSAY: (145, 185),
+    QuestionType.FILL_IN_BLANK: (70, 130),
+    # Mixed topics: every option carries its own correctness flag
+    None: (150, 205),
+}
+
+# Fixed output overhead per call (the {"questions": [...]} envelope)
+_ENVELOPE_TOKENS = 10
+
+
+def tokens_per_question(question_type: Optional[QuestionType], compact: bool) -> int:
+    """Expected output tokens for one question."""
+    compact_tokens, verbose_tokens = OUTPUT_TOKENS_PER_QUESTION[question_type]
+    return compact_tokens if compact else verbose_tokens
+
+
+def questions_per_call(question_type: Optional[QuestionType], compact: bool, token_budget: int) -> int:
+    """Largest number of questions whose expected output fits the token budget (at least 1)."""
+    return max(1, (token_budget - _ENVELOPE_TOKENS) // tokens_per_question(question_type, compact))
+
+
+def split_quantity(quantity: int, max_per_call: int) -> list[int]:
+    """
+    Split a quantity into the fewest balanced chunks of at most `max_per_call`.
+    
+    e.g. 40 with a limit of 15 becomes [14, 13, 13] rather than [15, 15, 10].
+    """
+    if quantity <= 0:
+        return []
+    chunks = math.ceil(quantity / max_per_call)
+    base, extra = divmod(quantity, chunks)
+    return [base + 1 if index < extra else base for index in range(chunks)]
+
+
+_NON_WORD = re.compile(r"\W+")
+
+
+def question_fingerprint(content: str) -> str:
+    """Normalized question text used to drop duplicates across chunks."""
+    return _NON_WORD.sub(" ", content.casefold()).strip()
+
+
+class PlannedRow(NamedTuple):
+    """One matrix row (or chunk of a row) within a call."""
+    index: int
+    topic: MatrixTopicConfig
+    part: int = 1
+    parts: int = 1
+
+
+class PlannedCall(NamedTuple):
+    """One Gemini call: rows sharing a question type and thus a response schema."""
+    question_type: Optional[QuestionType]
+    rows: tuple[PlannedRow, ...]
+    expected_tokens: int
+    
+    @property
+    def packed(self) -> bool:
+        """Whether several rows share this call (questions carry a row index)."""
+        return len(self.rows) > 1
+
+
+def plan_generation(
+    topics: Sequence[MatrixTopicConfig],
+    compact: bool,
+    token_budget: int,
+    max_concurrency: int,
+    min_call_tokens: int
+) -> list[PlannedCall]:
+    """
+    Plan matrix rows into calls.
+    
+    Rows larger than the budget are split into balanced chunks. Rows and
+    chunks of the same question type are then packed into calls, largest
+    first onto the least-loaded call (LPT), without exceeding the budget.
+    The number of calls balances preamble cost against latency: while the
+    calls run in parallel (up to `max_concurrency`), spreading work over
+    more calls shortens the slowest one, but no call is planned below
+    `min_call_tokens` of expected output just to add parallelism.
+    
+    Args:
+        topics: The matrix rows
+        compact: Whether the compact wire format is used
+        token_budget: Maximum expected output tokens per call
+        max_concurrency: Calls that run at the same time
+        min_call_tokens: Expected output below which a call is not worth its preamble
+    
+    Returns:
+        The calls, in matrix order of their first row
+    """
+    # (row, expected tokens) per question type
+    groups: dict[Optional[QuestionType], list[tuple[PlannedRow, int]]] = {}
+    for order, topic in enumerate(topics):
+        per_question = tokens_per_question(topic.question_type, compact)
+        chunk_sizes = split_quantity(topic.quantity, questions_per_call(topic.question_type, compact, token_budget))
+        for part, size in enumerate(chunk_sizes, start=1):
+            row = PlannedRow(order, topic.model_copy(update={"quantity": size}), part, len(chunk_sizes))
+            groups.setdefault(topic.question_type, []).append((row, size * per_question + _ENVELOPE_TOKENS))
+    
+    calls: list[PlannedCall] = []
+    for question_type, items in groups.items():
+        total = sum(tokens for _, tokens in items)
+        call_count = max(
+            math.ceil(total / token_budget),
+            min(max_concurrency, total // max(1, min_call_tokens), len(items)),
+            1,
+        )
+        bins: list[list[PlannedRow]] = [[] for _ in range(call_count)]
+        loads = [0] * call_count
+        for row, tokens in sorted(items, key=lambda item: item[1], reverse=True):
+            target = min(range(call_count), key=loads.__getitem__)
+            if loads[target] and loads[target] + tokens > token_budget:
+                bins.append([])
+                loads.append(0)
+                target = len(bins) - 1
+            bins[target].append(row)
+            loads[target] += tokens
+        
+        calls.extend(
+            PlannedCall(question_type, tuple(sorted(rows, key=lambda row: (row.index, row.part))), load)
+            for rows, load in zip(bins, loads)
+            if rows
+        )
+    
+    calls.sort(key=lambda call: (call.rows[0].index, call.rows[0].part))
+    return calls
+
+
+def describe_plan(calls: Sequence[PlannedCall]) -> str:
+    """Human-readable plan for debug logging."""
+    lines = [f"{len(calls)} generation calls:"]
+    for index, call in enumerate(calls, start=1):
+        rows = ", ".join(
+            f"{row.topic.topic_name} x{row.topic.quantity}"
+            + (f" (part {row.part}/{row.parts})" if row.parts > 1 else "")
+            for row in call.rows
+        )
+        question_type = call.question_type.value if call.question_type else "mixed"
+        lines.append(f"  call {index}: {question_type}, ~{call.expected_tokens} tokens: {rows}")
+    return "\n".join(lines)
@@ -0,0 +1,72 @@
+"""
+Exam forms derived locally by shuffling answer order.
+
+Given one set of questions (e.g. the variants of a question, or a whole
+exam), each extra form holds the same questions in the same order with the
+options of `select` and `multiple_choice` questions in a new order, so
+neighbouring students see different answer letters. No model call is made.
+
+True/false answers keep their fixed True/False order; essay and
+fill-in-blank answers are not shown as options, so they are left as is.
+"""
+
+import math
+import random
+from typing import Optional
+
+from app.models.enums import QuestionType
+from app.schemas import Question
+
+# Question types whose options are shown to students, so their order matters
+SHUFFLED_QUESTION_TYPES = frozenset({QuestionType.SELECT, QuestionType.MULTIPLE_CHOICE})
+
+# Random draws per question and form when looking for an answer order not used yet
+_SHUFFLE_ATTEMPTS = 10
+
+
+def shuffle_forms(
+    questions: list[Question],
+    forms: int,
+    seed: Optional[int] = None
+) -> list[list[Question]]:
+    """
+    Derive exam forms by shuffling each question's answer order.
+    
+    Each form gives a question an answer order not used by the original or
+    an earlier form, while the question has unused orders left.
+    
+    Args:
+        questions: The original form's questions
+        forms: Number of forms to derive
+        seed: Random seed for reproducible forms
+    
+    Returns:
+        Per form, copies of `questions` in the same order
+    """
+    rng = random.Random(seed)
+    used = [{tuple(range(len(question.answers)))} for question in questions]
+    result: list[list[Question]] = []
+    for _ in range(forms):
+        form: list[Question] = []
+        for question, orders in zip(questions, used):
+            if question.question_type not in SHUFFLED_QUESTION_TYPES or len(question.answers) < 2:
+                form.append(question.model_copy())
+                continue
+            order = _new_order(len(question.answers), orders, rng)
+            form.append(question.model_copy(update={"answers": [question.answers[i] for i in order]}))
+        result.append(form)
+    return result
+
+
+def _new_order(size: int, used: set[tuple[int, ...]], rng: random.Random) -> tuple[int, ...]:
+    """A random permutation of `size` options, preferring one not in `used` (which is updated)."""
+    order = list(range(size))
+    if len(used) >= math.factorial(size):
+        rng.shuffle(order)
+        return tuple(order)
+    for _ in range(_SHUFFLE_ATTEMPTS):
+        rng.shuffle(order)
+        if tuple(order) not in used:
+            break
+    used.add(tuple(order))
+    return tuple(order)
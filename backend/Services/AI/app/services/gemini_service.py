@@ -1,244 +1,601 @@
-from google import genai
-from google.genai import types
-from typing import Optional, Any
-import json
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Any, Sequence
 import logging
 
-from app.config import Settings
+from pydantic import TypeAdapter, ValidationError
+
+from app.config import Settings, get_settings
 from app.schemas import (
+    Answer,
     Question,
+    MatrixTopicConfig,
     GenerateQuestionsRequest,
+    GenerateQuestionsResponse,
     GenerateSingleQuestionRequest,
     GradeEssayRequest,
     GradeEssayResponse,
+    ExplainQuestionResponse,
+    GenerateTemplateRequest,
+    GenerateVariantsRequest,
+    InstantiateTemplateRequest,
+    QuestionTemplate,
+    QuestionTemplateResponse,
+    QuestionVariantsResponse,
+    RegenerateQuestionRequest,
+    TopicFulfilment,
 )
 from app.models.enums import QuestionType
+from app.serialization import loads
+from app.services.chunking import PlannedCall, PlannedRow, describe_plan, plan_generation
+from app.services.generation_registry import (
+    EssayGradingOutput,
+    SocraticHintsOutput,
+    get_generation_registry,
+)
 from app.services.prompts import (
+    get_language_fragments,
     build_matrix_prompt,
     build_single_question_prompt,
+    build_regenerate_prompt,
+    build_template_prompt,
+    build_variants_prompt,
     build_tutor_system_instruction,
     build_socratic_hints_prompt,
 )
+from app.services.exam_forms import shuffle_forms
+from app.services.output_parsing import parse_questions
+from app.services.question_pool import PoolDemand, PoolKey, get_question_pool, question_types_for
+from app.services.question_rules import RuleResult, apply_rules, get_repair_metrics
+from app.services.question_templates import TEMPLATE_QUESTION_TYPES, CompiledTemplate, TemplateError
+from app.services.stored_explanations import stored_explanation
+from app.services.wire_format import expand_question
+
+if TYPE_CHECKING:
+    from google import genai
+    from app.services.near_duplicates import NearDuplicateIndex
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _question_list_adapter() -> TypeAdapter[list[Question]]:
+    """Compiled validator for a whole list of questions, built once per process."""
+    return TypeAdapter(list[Question])
+
+
+def build_questions(questions_data: list[dict]) -> list[Question]:
+    """
+    Turn repaired question dicts into Question models in one pass.
+    
+    The whole list is validated by a single compiled adapter call instead of
+    one `Question(**data)` per item.
+    
+    Raises:
+        pydantic.ValidationError: If any question does not validate
+    """
+    return _question_list_adapter().validate_python(questions_data)
+
+
 class GeminiService:
-    """Service for interacting with Google Gemini API."""
+    """Service for interacting with Google Gemini API.
+    
+    The `google.genai` SDK is imported and the client created on first use,
+    keeping the SDK off the Lambda cold-start path for requests that never
+    call Gemini.
+    """
     
     def __init__(self, settings: Settings):
-        """Initialize Gemini client with settings."""
+        """Initialize the service; the Gemini client is created lazily."""
         self.settings = settings
-        self.client = genai.Client(api_key=settings.gemini_api_key)
+        self._client: "genai.Client | None" = None
         self.model_name = "gemini-2.5-flash"
-        logger.info(f"Initialized GeminiService with model: {self.model_name}")
-            
-    def _create_question_schema(self, question_type: Optional[QuestionType] = None) -> dict[str, Any]:
-        """
-        Create JSON schema for question generation.
-        Schema adapts based on question type for better AI output.
-        """
-        # Base answer schema
-        answer_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "content": {"type": "STRING"},
-                "is_correct": {"type": "BOOLEAN"},
-                "explanation": {"type": "STRING"},
-                "point": {"type": "NUMBER"},
-            },
-            "required": ["content", "is_correct"]
-        }
-        
-        # Question type enum values
-        question_type_enum = ["select", "multiple_choice", "true_false", "essay", "fill_in_blank"]
-        
-        return {
-            "type": "OBJECT",
-            "properties": {
-                "questions": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "content": {"type": "STRING"},
-                            "question_type": {
-                                "type": "STRING",
-                                "enum": question_type_enum
-                            },
-                            "cognitive_level": {
-                                "type": "STRING",
-                                "enum": ["remember", "understand", "apply", "analyze"]
-                            },
-                            "point": {"type": "NUMBER"},
-                            "media_url": {"type": "STRING"},
-                            "answers": {
-                                "type": "ARRAY",
-                                "items": answer_schema
-                            }
-                        },
-                        "required": ["content", "question_type", "cognitive_level", "answers"]
-                    }
-                }
-            },
-            "required": ["questions"]
-        }
     
-    def _validate_question(self, question_data: dict, expected_type: Optional[QuestionType] = None) -> dict:
-        """
-        Validate and fix question data based on question type rules.
-        """
-        question_type_str = question_data.get("question_type", "select")
-        answers = question_data.get("answers", [])
-        
-        # Ensure question_type is set correctly
-        if expected_type:
-            question_data["question_type"] = expected_type.value
-            question_type_str = expected_type.value
-        
-        # Validate based on question type
-        if question_type_str == "true_false":
-            # True/False must have exactly 2 answers: True and False
-            if len(answers) != 2:
-                question_data["answers"] = [
-                    {"content": "True", "is_correct": answers[0].get("is_correct", False) if answers else False, "explanation": answers[0].get("explanation", "") if answers else ""},
-                    {"content": "False", "is_correct": not (answers[0].get("is_correct", False) if answers else False), "explanation": answers[1].get("explanation", "") if len(answers) > 1 else ""}
-                ]
-            else:
-                # Ensure content is exactly "True" and "False"
-                question_data["answers"][0]["content"] = "True"
-                question_data["answers"][1]["content"] = "False"
-        
-        elif question_type_str == "select":
-            # Select must have exactly one correct answer
-            correct_count = sum(1 for a in answers if a.get("is_correct", False))
-            if correct_count != 1 and answers:
-                # Set only the first correct one as correct
-                found_correct = False
-                for answer in question_data["answers"]:
-                    if answer.get("is_correct", False) and not found_correct:
-                        found_correct = True
-                    else:
-                        answer["is_correct"] = False
-                if not found_correct and question_data["answers"]:
-                    question_data["answers"][0]["is_correct"] = True
-        
-        elif question_type_str == "essay":
-            # Essay should have 0 or 1 answer (grading rubric)
-            if len(answers) > 1:
-                question_data["answers"] = [answers[0]]
-            if question_data["answers"]:
-                question_data["answers"][0]["is_correct"] = True
-        
-        elif question_type_str == "fill_in_blank":
-            # Fill in blank - all answers are correct (acceptable answers)
-            for answer in question_data.get("answers", []):
-                answer["is_correct"] = True
-        
-        return question_data
+    @property
+    def client(self) -> "genai.Client":
+        """The Gemini client, created on first access."""
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.settings.gemini_api_key)
+            logger.info(f"Initialized Gemini client with model: {self.model_name}")
+        return self._client
     
+    def warm_up(self) -> None:
+        """Create the Gemini client, build the request configs and open the question pool ahead of the first call."""
+        _ = self.client
+        _question_list_adapter()
+        get_generation_registry()
+        get_question_pool(self.settings)
+        self._near_duplicate_index()
+            
     async def generate_questions(
         self, 
-        request: GenerateQuestionsRequest
-    ) -> list[Question]:
+        request: GenerateQuestionsRequest,
+        teacher_id: Optional[str] = None
+    ) -> GenerateQuestionsResponse:
         """Generate questions based on exam matrix.
         
         Generates questions for each matrix topic configuration and associates
-        the topic_id with each generated question.
+        the topic_id with each generated question. Matrix rows are planned into
+        calls within the per-call output-token budget: large rows are split into
+        chunks and small rows of the same question type share a call. All calls
+        run concurrently (up to `generation_max_concurrency`) and are merged back
+        in matrix order with duplicate questions dropped.
+        
+        Complete questions are kept from truncated responses. Rows still short
+        of their quantity (truncation, a failed call, duplicates or a model that
+        under-delivered) get up to `generation_topup_rounds` follow-up calls for
+        just the missing count, and the response reports per-row fulfilment.
+        
+        With the question pool enabled, rows are served from the pool first
+        (skipping questions already given to `teacher_id`) and only the
+        shortfall is generated; generated questions are added to the pool.
+        Requests for student explanations are not served from the pool.
+        
+        Near-duplicates of a question already in the matrix or recently given
+        to `teacher_id` are rejected, and replaced by the top-up round.
         """
         try:
-            all_validated_questions: list[Question] = []
+            topics = request.matrix_topics
+            kept: list[list[dict]] = [[] for _ in topics]
+            seen = self._near_duplicate_index()
+            from_pool = [0] * len(topics)
             
-            # Process each matrix topic separately to maintain topic_id association
-            for topic_config in request.matrix_topics:
-                # Build a single-topic request for this batch
-                single_topic_request = GenerateQuestionsRequest(
-                    subject=request.subject,
-                    grade=request.grade,
-                    matrix_topics=[topic_config],
-                    language=request.language
+            pool = get_question_pool(self.settings)
+            keys = [
+                PoolKey.build(
+                    request.subject, request.grade, request.language,
+                    topic.topic_id, topic.topic_name, topic.cognitive_level
                 )
-                
-                # Build the prompt for this topic
-                prompt = build_matrix_prompt(single_topic_request)
-                
-                # Configure with JSON schema - constrain to specific type if provided
-                config = types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=self._create_question_schema(topic_config.question_type),
-                    temperature=0.7,
-                )
-                
-                # Generate content
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt,
-                    config=config,
+                for topic in topics
+            ]
+            # Pooled questions may lack the student explanations asked for, so those requests are generated
+            if pool is not None and not request.student_explanations:
+                try:
+                    if teacher_id:
+                        seen.extend(await pool.served_contents(teacher_id, keys))
+                    pooled = await pool.take(
+                        [
+                            (key, question_types_for(topic.question_type), topic.quantity)
+                            for key, topic in zip(keys, topics)
+                        ],
+                        teacher_id,
+                    )
+                except Exception as e:
+                    logger.warning(f"Question pool lookup failed: {str(e)}")
+                    pooled = [[] for _ in topics]
+                for index, (topic, row_questions) in enumerate(zip(topics, pooled)):
+                    for q in row_questions:
+                        if not seen.add(str(q.get("content", ""))):
+                            continue
+                        q["topic_id"] = topic.topic_id
+                        kept[index].append(q)
+                    from_pool[index] = len(kept[index])
+                    if from_pool[index] < topic.quantity:
+                        pool.note_demand(PoolDemand(
+                            keys[index], topic.question_type, request.subject, topic.topic_id, topic.topic_name
+                        ))
+                logger.info(f"Served {sum(from_pool)} questions from the question pool")
+            
+            await self._fill_rows(request, kept, seen)
+            
+            if pool is not None:
+                generated = [
+                    (keys[index], q)
+                    for index, row_questions in enumerate(kept)
+                    for q in row_questions[from_pool[index]:]
+                ]
+                try:
+                    await pool.add(generated, teacher_id)
+                except Exception as e:
+                    logger.warning(f"Adding questions to the question pool failed: {str(e)}")
+            
+            fulfilment = [
+                TopicFulfilment(
+                    topic_id=topic.topic_id,
+                    requested=topic.quantity,
+                    generated=len(row_questions),
+                    from_pool=pooled_count,
+                    fulfilled=len(row_questions) >= topic.quantity,
                 )
-                
-                # Parse response
-                if response.text is None:
-                    logger.warning(f"No response for topic {topic_config.topic_name}, skipping")
-                    continue
-                    
-                result = json.loads(response.text)
-                
-                # Validate and fix each question, attaching the topic_id
-                for q in result.get("questions", []):
-                    validated_q = self._validate_question(q, topic_config.question_type)
-                    # Attach the topic_id from the matrix configuration
-                    validated_q["topic_id"] = topic_config.topic_id
-                    all_validated_questions.append(Question(**validated_q))
-                
-                logger.info(f"Generated {len(result.get('questions', []))} questions for topic {topic_config.topic_name}")
+                for topic, row_questions, pooled_count in zip(topics, kept, from_pool)
+            ]
+            for topic, row in zip(topics, fulfilment):
+                if not row.fulfilled:
+                    logger.warning(f"Topic {topic.topic_name}: generated {row.generated} of {row.requested} questions")
             
+            # Validate all topics' questions in one adapter call
+            all_validated_questions = build_questions([q for row_questions in kept for q in row_questions])
             logger.info(f"Generated {len(all_validated_questions)} total questions successfully")
-            return all_validated_questions
+            return GenerateQuestionsResponse(
+                questions=all_validated_questions,
+                total_count=len(all_validated_questions),
+                fulfilment=fulfilment,
+            )
             
         except Exception as e:
             logger.error(f"Error generating questions: {str(e)}")
             raise
     
-    async def generate_single_question(
+    async def refill_pool(self, request: GenerateQuestionsRequest) -> int:
+        """
+        Generate a matrix straight into the question pool, serving no one.
+        
+        Returns:
+            Number of questions generated (some may already have been pooled)
+        """
+        pool = get_question_pool(self.settings)
+        if pool is None:
+            return 0
+        kept: list[list[dict]] = [[] for _ in request.matrix_topics]
+        await self._fill_rows(request, kept, self._near_duplicate_index())
+        await pool.add([
+            (
+                PoolKey.build(
+                    request.subject, request.grade, request.language,
+                    topic.topic_id, topic.topic_name, topic.cognitive_level
+                ),
+                q,
+            )
+            for topic, row_questions in zip(request.matrix_topics, kept)
+            for q in row_questions
+        ])
+        return sum(len(row_questions) for row_questions in kept)
+    
+    def _near_duplicate_index(self) -> "NearDuplicateIndex":
+        """A fresh near-duplicate index; NumPy is imported on first use."""
+        from app.services.near_duplicates import NearDuplicateIndex
+        return NearDuplicateIndex(self.settings.near_duplicate_threshold)
+    
+    async def _fill_rows(
         self,
-        request: GenerateSingleQuestionRequest
-    ) -> Question:
-        """Generate a single question with type-specific validation.
+        request: GenerateQuestionsRequest,
+        kept: list[list[dict]],
+        seen: "NearDuplicateIndex"
+    ) -> None:
+        """
+        Generate questions until each matrix row holds its quantity or the top-up rounds run out.
         
-        If topic_id is provided in the request, it will be associated with
-        the generated question.
+        Args:
+            request: The matrix request
+            kept: Per row, questions kept so far (extended in place)
+            seen: Near-duplicate index of the kept questions and any history (extended in place)
         """
-        try:
-            prompt = build_single_question_prompt(request)
+        compact = self.settings.compact_output_schema
+        semaphore = asyncio.Semaphore(self.settings.generation_max_concurrency)
+        topics = request.matrix_topics
+        rejected_before = seen.rejected
+        
+        for attempt in range(1 + self.settings.generation_topup_rounds):
+            # Rows still short of their quantity (every row not served from the pool on the first pass)
+            short_rows = [index for index, topic in enumerate(topics) if len(kept[index]) < topic.quantity]
+            if not short_rows:
+                break
+            pending = [
+                topics[index].model_copy(update={"quantity": topics[index].quantity - len(kept[index])})
+                for index in short_rows
+            ]
+            exclude = [[str(q.get("content", "")) for q in kept[index]] for index in short_rows]
+            if attempt:
+                logger.info(
+                    f"Top-up round {attempt}: {sum(topic.quantity for topic in pending)} missing questions "
+                    f"across {len(pending)} topics"
+                )
             
-            config = types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=self._create_question_schema(request.question_type),
-                temperature=0.7,
-            )
+            generated = await self._generate_rows(request, pending, exclude, compact, semaphore)
             
-            response = self.client.models.generate_content(
+            # Merge in matrix order, dropping near-duplicates and any surplus
+            for index, row_questions in zip(short_rows, generated):
+                for q in row_questions:
+                    if len(kept[index]) >= topics[index].quantity:
+                        break
+                    if seen.add(str(q.get("content", ""))):
+                        kept[index].append(q)
+        
+        if seen.rejected > rejected_before:
+            logger.info(f"Rejected {seen.rejected - rejected_before} near-duplicate questions")
+    
+    async def _generate_rows(
+        self,
+        request: GenerateQuestionsRequest,
+        topics: list[MatrixTopicConfig],
+        exclude: list[list[str]],
+        compact: bool,
+        semaphore: asyncio.Semaphore
+    ) -> list[list[dict]]:
+        """
+        Plan and run the calls for a set of matrix rows.
+        
+        Args:
+            request: The original request (subject, grade, language)
+            topics: The rows to generate, with the quantity still needed
+            exclude: Per row, questions already kept that must not be repeated
+            compact: Whether to use the compact wire format
+            semaphore: Limits concurrent Gemini calls
+        
+        Returns:
+            Repaired question dicts per row, in call order
+        
+        Raises:
+            Exception: The first call's error, if every call failed
+        """
+        plan = plan_generation(
+            topics,
+            compact,
+            self.settings.generation_output_token_budget,
+            self.settings.generation_max_concurrency,
+            self.settings.generation_min_call_tokens,
+        )
+        logger.info(f"Planned {len(topics)} matrix rows into {len(plan)} calls")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(describe_plan(plan))
+        
+        call_results = await asyncio.gather(
+            *(
+                self._generate_call(
+                    request, call, [content for row in call.rows for content in exclude[row.index]], compact, semaphore
+                )
+                for call in plan
+            ),
+            return_exceptions=True,
+        )
+        
+        # A failed call leaves its rows short for the top-up round instead of failing the request
+        errors = [result for result in call_results if isinstance(result, BaseException)]
+        for error in errors:
+            if not isinstance(error, Exception):
+                raise error
+            logger.warning(f"Generation call failed: {error}")
+        if errors and len(errors) == len(call_results):
+            raise errors[0]
+        
+        by_row: list[list[dict]] = [[] for _ in topics]
+        for result in call_results:
+            if isinstance(result, BaseException):
+                continue
+            for row_index, q in result:
+                by_row[row_index].append(q)
+        return by_row
+    
+    async def _generate_call(
+        self,
+        request: GenerateQuestionsRequest,
+        call: PlannedCall,
+        exclude: list[str],
+        compact: bool,
+        semaphore: asyncio.Semaphore
+    ) -> list[tuple[int, dict]]:
+        """Generate the questions for one planned call, returning (row, repaired question) pairs."""
+        # Build a request holding just this call's rows
+        call_request = GenerateQuestionsRequest(
+            subject=request.subject,
+            grade=request.grade,
+            matrix_topics=[row.topic for row in call.rows],
+            language=request.language,
+            student_explanations=request.student_explanations,
+        )
+        
+        prompt = build_matrix_prompt(
+            call_request,
+            compact=compact,
+            row_parts=[(row.part, row.parts) for row in call.rows],
+            row_index=call.packed,
+            exclude=exclude,
+        )
+        
+        # Configure with JSON schema - constrained to the call's type, with a row index if packed
+        config = get_generation_registry().question_config(call.question_type, compact, call.packed)
+        
+        # Generate content
+        async with semaphore:
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=config,
             )
+        
+        row_names = ", ".join(row.topic.topic_name for row in call.rows)
+        if response.text is None:
+            logger.warning(f"No response for topics {row_names}, skipping")
+            return []
+        
+        items, complete = parse_questions(response.text)
+        if not complete:
+            logger.warning(f"Truncated response for topics {row_names}, salvaged {len(items)} complete questions")
+        
+        # Check each question against its type's rules, attaching the topic_id of its row
+        metrics = get_repair_metrics()
+        remaining = [row.topic.quantity for row in call.rows]
+        repaired: list[tuple[int, dict]] = []
+        to_repair: list[PlannedRow] = []
+        for q in items:
+            index = self._row_for_question(q, remaining) if call.packed else 0
+            remaining[index] -= 1
+            row = call.rows[index]
+            topic_config = row.topic
+            if compact:
+                q = expand_question(q, topic_config.question_type, topic_config.cognitive_level)
+            result = apply_rules(q, topic_config.question_type)
+            metrics.record_check(self.model_name, result)
+            if result.needs_repair:
+                logger.info(
+                    f"Question for topic {topic_config.topic_name} violates {', '.join(result.violations)}, "
+                    f"regenerating it"
+                )
+                to_repair.append(row)
+                continue
+            # Attach the topic_id from the matrix configuration
+            result.question["topic_id"] = topic_config.topic_id
+            repaired.append((row.index, result.question))
+        
+        # Regenerate only the questions that could not be fixed
+        if to_repair:
+            replacements = await asyncio.gather(
+                *(self._repair_question(request, row.topic, compact, semaphore) for row in to_repair)
+            )
+            repaired.extend(
+                (row.index, question)
+                for row, question in zip(to_repair, replacements)
+                if question is not None
+            )
+        
+        logger.info(f"Generated {len(repaired)} questions for topics {row_names}")
+        return repaired
+    
+    async def _repair_question(
+        self,
+        request: GenerateQuestionsRequest,
+        topic_config: MatrixTopicConfig,
+        compact: bool,
+        semaphore: asyncio.Semaphore
+    ) -> Optional[dict]:
+        """
+        Regenerate one question that violated its type's rules.
+        
+        Mixed-type topics are repaired as `select` questions. Returns None if
+        every attempt also failed; the row is then left short for the top-up round.
+        """
+        question_type = topic_config.question_type or QuestionType.SELECT
+        single_request = GenerateSingleQuestionRequest(
+            subject=request.subject,
+            grade=request.grade,
+            topic_name=topic_config.topic_name,
+            topic_id=topic_config.topic_id,
+            cognitive_level=topic_config.cognitive_level,
+            question_type=question_type,
+            language=request.language,
+            student_explanations=request.student_explanations,
+        )
+        
+        for _ in range(self.settings.question_repair_attempts):
+            try:
+                async with semaphore:
+                    result = await self._generate_single_item(single_request, compact)
+            except Exception as e:
+                logger.warning(f"Repair call for topic {topic_config.topic_name} failed: {str(e)}")
+                continue
+            if not result.needs_repair:
+                get_repair_metrics().record_repair(self.model_name, question_type.value, True)
+                return result.question
+        get_repair_metrics().record_repair(self.model_name, question_type.value, False)
+        return None
+    
+    async def _generate_single_item(
+        self,
+        request: GenerateSingleQuestionRequest,
+        compact: bool,
+        prompt: Optional[str] = None
+    ) -> RuleResult:
+        """
+        Generate one question and check it against its type's rules.
+        
+        `prompt` replaces the default single-question prompt for `request`.
+        
+        Raises:
+            ValueError: If Gemini returned no question
+        """
+        prompt = prompt or build_single_question_prompt(request, compact=compact)
+        config = get_generation_registry().question_config(request.question_type, compact)
+        
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        )
+        
+        if response.text is None:
+            raise ValueError("No response text received from Gemini API")
+        items, _ = parse_questions(response.text)
+        if not items:
+            raise ValueError("No question generated")
+        
+        question_data = items[0]
+        if compact:
+            question_data = expand_question(question_data, request.question_type, request.cognitive_level)
+        
+        result = apply_rules(question_data, request.question_type)
+        
+        # Attach the topic_id if provided in the request
+        if request.topic_id:
+            result.question["topic_id"] = request.topic_id
+        return result
+    
+    @staticmethod
+    def _row_for_question(question: dict, remaining: list[int]) -> int:
+        """
+        Index of the call row a packed question belongs to.
+        
+        Uses the model's 1-based row number "i"; if it is missing or out of
+        range, falls back to the first row still short of its quantity.
+        """
+        row = question.pop("i", None)
+        if isinstance(row, int) and not isinstance(row, bool) and 1 <= row <= len(remaining):
+            return row - 1
+        return next((index for index, count in enumerate(remaining) if count > 0), len(remaining) - 1)
+    
+    async def generate_single_question(
+        self,
+        request: GenerateSingleQuestionRequest,
+        teacher_id: Optional[str] = None
+    ) -> Question:
+        """Generate a single question with type-specific validation.
+        
+        A question that violates its type's rules in a way that cannot be fixed
+        safely is regenerated, up to `question_repair_attempts` times.
+        If topic_id is provided in the request, it will be associated with
+        the generated question. With the question pool enabled, a pooled
+        question not yet given to `teacher_id` is served instead of calling Gemini,
+        unless student explanations are requested.
+        
+        Raises:
+            ValueError: If no valid question could be generated
+        """
+        try:
+            pool = get_question_pool(self.settings)
+            key = PoolKey.build(
+                request.subject, request.grade, request.language,
+                request.topic_id, request.topic_name, request.cognitive_level
+            )
+            if pool is not None and not request.student_explanations:
+                try:
+                    (pooled,) = await pool.take([(key, (request.question_type.value,), 1)], teacher_id)
+                except Exception as e:
+                    logger.warning(f"Question pool lookup failed: {str(e)}")
+                    pooled = []
+                if pooled:
+                    question_data = pooled[0]
+                    if request.topic_id:
+                        question_data["topic_id"] = request.topic_id
+                    logger.info(f"Served single {request.question_type.value} question from the question pool")
+                    return Question(**question_data)
+                pool.note_demand(PoolDemand(
+                    key, request.question_type, request.subject, request.topic_id, request.topic_name
+                ))
             
-            if response.text is None:
-                raise ValueError("No response text received from Gemini API")
-            result = json.loads(response.text)
-            questions = result.get("questions", [])
-            
-            if not questions:
-                raise ValueError("No question generated")
+            compact = self.settings.compact_output_schema
+            metrics = get_repair_metrics()
             
-            # Validate and fix the question based on expected type
-            validated_q = self._validate_question(questions[0], request.question_type)
+            result = await self._generate_single_item(request, compact)
+            metrics.record_check(self.model_name, result)
+            needed_repair = result.needs_repair
+            for _ in range(self.settings.question_repair_attempts):
+                if not result.needs_repair:
+                    break
+                logger.info(f"Question violates {', '.join(result.violations)}, regenerating it")
+                result = await self._generate_single_item(request, compact)
+            # One outcome per question, however many attempts it took
+            if needed_repair:
+                metrics.record_repair(self.model_name, request.question_type.value, not result.needs_repair)
             
-            # Attach the topic_id if provided in the request
-            if request.topic_id:
-                validated_q["topic_id"] = request.topic_id
+            if result.needs_repair:
+                raise ValueError(f"Generated question violates rules: {', '.join(result.violations)}")
             
-            question = Question(**validated_q)
+            question = Question(**result.question)
+            if pool is not None:
+                try:
+                    await pool.add([(key, result.question)], teacher_id)
+                except Exception as e:
+                    logger.warning(f"Adding the question to the question pool failed: {str(e)}")
             logger.info(f"Generated single {request.question_type.value} question successfully")
             return question
             
@@ -246,6 +603,250 @@ class GeminiService:
             logger.error(f"Error generating single question: {str(e)}")
             raise
     
+    async def regenerate_question(
+        self,
+        request: RegenerateQuestionRequest,
+        teacher_id: Optional[str] = None
+    ) -> Question:
+        """Replace one rejected question of a set with a question unlike it and its siblings.
+        
+        The replacement keeps the rejected question's topic, cognitive level and
+        type. A pooled question not yet given to `teacher_id` is tried first,
+        unless student explanations are requested; otherwise one short call in
+        the compact wire format is made, retried up to `question_repair_attempts`
+        times if the result violates its type's rules or is a near-duplicate of
+        the rejected question or a sibling.
+        
+        Raises:
+            ValueError: If no acceptable replacement could be generated
+        """
+        rejected = request.rejected
+        single_request = GenerateSingleQuestionRequest(
+            subject=request.subject,
+            grade=request.grade,
+            topic_name=request.topic_name,
+            topic_id=request.topic_id,
+            cognitive_level=rejected.cognitive_level,
+            question_type=rejected.question_type,
+            language=request.language,
+            topic_description=request.topic_description,
+            student_explanations=request.student_explanations,
+        )
+        seen = self._near_duplicate_index()
+        seen.extend([rejected.content, *request.siblings])
+        
+        pool = get_question_pool(self.settings)
+        key = PoolKey.build(
+            request.subject, request.grade, request.language,
+            request.topic_id, request.topic_name, rejected.cognitive_level
+        )
+        if pool is not None and not request.student_explanations:
+            try:
+                (pooled,) = await pool.take([(key, (rejected.question_type.value,), 1)], teacher_id)
+            except Exception as e:
+                logger.warning(f"Question pool lookup failed: {str(e)}")
+                pooled = []
+            if pooled and seen.add(str(pooled[0].get("content", ""))):
+                question_data = pooled[0]
+                if request.topic_id:
+                    question_data["topic_id"] = request.topic_id
+                logger.info(f"Served replacement {rejected.question_type.value} question from the question pool")
+                return Question(**question_data)
+        
+        compact = self.settings.compact_output_schema
+        prompt = build_regenerate_prompt(request, compact)
+        metrics = get_repair_metrics()
+        problem = ""
+        for _ in range(1 + self.settings.question_repair_attempts):
+            result = await self._generate_single_item(single_request, compact, prompt)
+            metrics.record_check(self.model_name, result)
+            if result.needs_repair:
+                problem = f"violates {', '.join(result.violations)}"
+            elif not seen.add(str(result.question.get("content", ""))):
+                problem = "repeats the rejected question or a sibling"
+            else:
+                question = Question(**result.question)
+                if pool is not None:
+                    try:
+                        await pool.add([(key, result.question)], teacher_id)
+                    except Exception as e:
+                        logger.warning(f"Adding the replacement to the question pool failed: {str(e)}")
+                logger.info(f"Generated replacement {rejected.question_type.value} question")
+                return question
+            logger.info(f"Replacement question {problem}, regenerating it")
+        
+        raise ValueError(f"No acceptable replacement generated: last attempt {problem}")
+    
+    async def generate_variants(
+        self,
+        request: GenerateVariantsRequest,
+        teacher_id: Optional[str] = None
+    ) -> QuestionVariantsResponse:
+        """Generate parallel versions of one question in one call.
+        
+        Variants that violate their type's rules or are near-duplicates of
+        another variant are dropped; up to `generation_topup_rounds` follow-up
+        calls ask for just the missing ones. `request.shuffled_forms` extra
+        forms are then derived locally by shuffling answer order. With the
+        question pool enabled, the variants are added to the pool.
+        
+        Raises:
+            ValueError: If no valid variant could be generated
+        """
+        compact = self.settings.compact_output_schema
+        metrics = get_repair_metrics()
+        seen = self._near_duplicate_index()
+        kept: list[dict] = []
+        
+        for attempt in range(1 + self.settings.generation_topup_rounds):
+            missing = request.variant_count - len(kept)
+            if missing <= 0:
+                break
+            if attempt:
+                logger.info(f"Top-up round {attempt}: {missing} missing variants")
+            try:
+                results = await self._generate_variant_items(
+                    request, missing, compact, [str(q.get("content", "")) for q in kept]
+                )
+            except Exception as e:
+                logger.warning(f"Variant generation call failed: {str(e)}")
+                continue
+            for result in results:
+                metrics.record_check(self.model_name, result)
+                if result.needs_repair or len(kept) >= request.variant_count:
+                    continue
+                if seen.add(str(result.question.get("content", ""))):
+                    kept.append(result.question)
+        
+        if not kept:
+            raise ValueError("No valid variant generated")
+        if len(kept) < request.variant_count:
+            logger.warning(f"Generated {len(kept)} of {request.variant_count} variants")
+        
+        pool = get_question_pool(self.settings)
+        if pool is not None:
+            key = PoolKey.build(
+                request.subject, request.grade, request.language,
+                request.topic_id, request.topic_name, request.cognitive_level
+            )
+            try:
+                await pool.add([(key, q) for q in kept], teacher_id)
+            except Exception as e:
+                logger.warning(f"Adding variants to the question pool failed: {str(e)}")
+        
+        variants = build_questions(kept)
+        logger.info(f"Generated {len(variants)} {request.question_type.value} variants")
+        return QuestionVariantsResponse(
+            variants=variants,
+            requested=request.variant_count,
+            forms=shuffle_forms(variants, request.shuffled_forms, request.seed) if request.shuffled_forms else [],
+        )
+    
+    async def _generate_variant_items(
+        self,
+        request: GenerateVariantsRequest,
+        count: int,
+        compact: bool,
+        exclude: list[str]
+    ) -> list[RuleResult]:
+        """
+        Generate `count` variants in one call and check each against its type's rules.
+        
+        Raises:
+            ValueError: If Gemini returned no response text
+        """
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=build_variants_prompt(request, count, compact, exclude),
+            config=get_generation_registry().question_config(request.question_type, compact),
+        )
+        if response.text is None:
+            raise ValueError("No response text received from Gemini API")
+        
+        items, complete = parse_questions(response.text)
+        if not complete:
+            logger.warning(f"Truncated variants response, salvaged {len(items)} complete questions")
+        
+        results = []
+        for question_data in items:
+            if compact:
+                question_data = expand_question(question_data, request.question_type, request.cognitive_level)
+            result = apply_rules(question_data, request.question_type)
+            if request.topic_id:
+                result.question["topic_id"] = request.topic_id
+            results.append(result)
+        return results
+    
+    async def generate_template(self, request: GenerateTemplateRequest) -> QuestionTemplateResponse:
+        """Generate a parametric question template, and optionally variants of it.
+        
+        The model is asked once for the template; `request.variant_count`
+        variants are then instantiated locally. A template that does not
+        compile or yields no variant is regenerated, up to
+        `question_repair_attempts` times.
+        
+        Raises:
+            ValueError: If the question type cannot be templated or no usable template was generated
+        """
+        if request.question_type not in TEMPLATE_QUESTION_TYPES:
+            raise TemplateError(f"Templates cannot produce {request.question_type.value} questions")
+        
+        error: Exception | None = None
+        for _ in range(1 + self.settings.question_repair_attempts):
+            try:
+                template = await self._generate_template_item(request)
+                variants = await asyncio.to_thread(
+                    CompiledTemplate(template).instantiate, max(request.variant_count, 1)
+                )
+            except (ValueError, ValidationError) as e:
+                logger.warning(f"Discarding unusable template for topic {request.topic_name}: {str(e)}")
+                error = e
+                continue
+            
+            logger.info(f"Generated {request.question_type.value} template for topic {request.topic_name}")
+            questions = build_questions(variants) if request.variant_count else []
+            return QuestionTemplateResponse(template=template, questions=questions)
+        
+        raise ValueError(f"No usable template generated: {str(error)}")
+    
+    async def _generate_template_item(self, request: GenerateTemplateRequest) -> QuestionTemplate:
+        """
+        One template from Gemini, with the request's metadata attached.
+        
+        Raises:
+            ValueError: If Gemini returned no template
+            pydantic.ValidationError: If the template does not validate
+        """
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=build_template_prompt(request),
+            config=get_generation_registry().template_config,
+        )
+        if response.text is None:
+            raise ValueError("No response text received from Gemini API")
+        template_data = loads(response.text)
+        if not isinstance(template_data, dict):
+            raise ValueError("Template response is not a JSON object")
+        
+        return QuestionTemplate(**{
+            **template_data,
+            "question_type": request.question_type,
+            "cognitive_level": request.cognitive_level,
+            "language": request.language,
+            "topic_id": request.topic_id,
+        })
+    
+    async def instantiate_template(self, request: InstantiateTemplateRequest) -> GenerateQuestionsResponse:
+        """Instantiate variants of a template locally, without calling Gemini.
+        
+        Raises:
+            TemplateError: If the template does not compile or no variant satisfies its constraints
+        """
+        compiled = CompiledTemplate(request.template)
+        variants = await asyncio.to_thread(compiled.instantiate, request.count, request.seed)
+        questions = build_questions(variants)
+        return GenerateQuestionsResponse(questions=questions, total_count=len(questions))
+    
     async def tutor_chat(
         self,
         message: str,
@@ -263,15 +864,12 @@ class GeminiService:
                 topic=topic
             )
             
-            config = types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.8,
-            )
+            config = get_generation_registry().tutor_config(system_instruction)
             
             # For now, use simple generation (can be extended to chat sessions)
             prompt = f"Student asks: {message}"
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=config,
@@ -287,14 +885,16 @@ class GeminiService:
             logger.error(f"Error in tutor chat: {str(e)}")
             raise
     
-    def health_check(self) -> bool:
-        """Check if Gemini API is accessible."""
+    async def health_check(self) -> bool:
+        """
+        Check if Gemini API is accessible.
+        
+        Looks up the model's metadata instead of generating content, so the
+        probe uses no generation quota.
+        """
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents="Say 'OK' if you can read this.",
-            )
-            return bool(response.text)
+            model = await self.client.aio.models.get(model=self.model_name)
+            return bool(model.name)
         except Exception as e:
             logger.error(f"Health check failed: {str(e)}")
             return False
@@ -307,12 +907,22 @@ class GeminiService:
         subject: str,
         student_answer: Optional[str] = None,
         language: str = "vi",
-    ) -> str:
+        answers: Sequence[Answer] = (),
+        student_answer_index: Optional[int] = None,
+    ) -> ExplainQuestionResponse:
         """Generate a child-friendly explanation for a question and its correct answer.
 
         Designed for primary school students (grades 1-5) who want to understand
-        why their answer was wrong and what the correct answer means.
+        why their answer was wrong and what the correct answer means. If the
+        question's stored `answers` hold a student explanation for the student's
+        answer (by `student_answer_index` or matching text), it is returned
+        without calling Gemini.
         """
+        explanation = stored_explanation(answers, student_answer, student_answer_index, correct_answer)
+        if explanation:
+            logger.info(f"Served stored explanation for grade {grade} {subject} question")
+            return ExplainQuestionResponse(explanation=explanation, source="stored")
+
         try:
             if student_answer:
                 context = (
@@ -330,7 +940,7 @@ class GeminiService:
 
             prompt = (
                 f"You are a {subject} teacher explaining a question to a grade {grade} primary school student.\n"
-                f"Respond in {'Vietnamese' if language == 'vi' else 'English'}.\n"
+                f"Respond in {get_language_fragments(language).name}.\n"
                 f"Be direct and educational. Do NOT compliment the student or add encouragement — "
                 f"focus only on the factual explanation. Use simple words a grade {grade} student can understand. "
                 f"Keep it to 2-4 sentences.\n\n"
@@ -338,11 +948,9 @@ class GeminiService:
                 f"{context}"
             )
 
-            config = types.GenerateContentConfig(
-                temperature=0.3,
-            )
+            config = get_generation_registry().explain_config
 
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=config,
@@ -352,7 +960,7 @@ class GeminiService:
                 raise ValueError("No response text received from Gemini API")
 
             logger.info(f"Explanation generated for grade {grade} {subject} question")
-            return response.text
+            return ExplainQuestionResponse(explanation=response.text)
 
         except Exception as e:
             logger.error(f"Error generating explanation: {str(e)}")
@@ -365,7 +973,7 @@ class GeminiService:
         returns a score (0..max_points) plus constructive feedback.
         """
         try:
-            lang = "Vietnamese" if request.language == "vi" else "English"
+            lang = get_language_fragments(request.language).name
             prompt = (
                 f"You are a strict but fair {request.subject} teacher grading a "
                 f"grade {request.grade} student's essay answer.\n"
@@ -383,22 +991,9 @@ class GeminiService:
                 f'{{"score": <number>, "feedback": "<string>"}}'
             )
 
-            grading_schema = {
-                "type": "OBJECT",
-                "properties": {
-                    "score": {"type": "NUMBER"},
-                    "feedback": {"type": "STRING"},
-                },
-                "required": ["score", "feedback"],
-            }
-
-            config = types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=grading_schema,
-                temperature=0.2,
-            )
+            config = get_generation_registry().grading_config
 
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=config,
@@ -407,10 +1002,9 @@ class GeminiService:
             if response.text is None:
                 raise ValueError("No response text received from Gemini API")
 
-            result = json.loads(response.text)
-            raw_score = float(result.get("score", 0))
+            result = EssayGradingOutput.model_validate_json(response.text)
             # Clamp to valid range
-            score = max(0.0, min(raw_score, request.max_points))
+            score = max(0.0, min(result.score, request.max_points))
             percentage = round((score / request.max_points) * 100, 2) if request.max_points > 0 else 0.0
 
             logger.info(
@@ -419,7 +1013,7 @@ class GeminiService:
             )
             return GradeEssayResponse(
                 score=score,
-                feedback=result.get("feedback", ""),
+                feedback=result.feedback,
                 score_percentage=percentage,
             )
 
@@ -447,25 +1041,9 @@ class GeminiService:
                 language=language,
             )
 
-            hints_schema = {
-                "type": "OBJECT",
-                "properties": {
-                    "hints": {
-                        "type": "ARRAY",
-                        "items": {"type": "STRING"},
-                    },
-                    "teaching_note": {"type": "STRING"},
-                },
-                "required": ["hints", "teaching_note"],
-            }
-
-            config = types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=hints_schema,
-                temperature=0.6,
-            )
+            config = get_generation_registry().hints_config
 
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
                 config=config,
@@ -474,13 +1052,25 @@ class GeminiService:
             if response.text is None:
                 raise ValueError("No response text received from Gemini API")
 
-            result = json.loads(response.text)
+            result = SocraticHintsOutput.model_validate_json(response.text)
             logger.info(
-                f"Generated {len(result.get('hints', []))} Socratic hints "
+                f"Generated {len(result.hints)} Socratic hints "
                 f"for grade {grade} {subject}"
             )
-            return result
+            return result.model_dump()
 
         except Exception as e:
             logger.error(f"Error generating Socratic hints: {str(e)}")
             raise
+
+
+# Global singleton instance (one Gemini client per process)
+_gemini_service: GeminiService | None = None
+
+
+def get_shared_gemini_service() -> GeminiService:
+    """Get the GeminiService singleton instance."""
+    global _gemini_service
+    if _gemini_service is None:
+        _gemini_service = GeminiService(get_settings())
+    return _gemini_service
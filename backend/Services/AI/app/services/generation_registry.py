@@ -0,0 +1,222 @@
+"""
+Prebuilt response schemas and request configs for Gemini calls.
+
+Everything here is static per process: the JSON response schemas, their
+SDK-native `types.Schema` form, and one `GenerateContentConfig` per endpoint
+and question type (verbose or compact wire format, with or without a row
+index for packed calls). They are built once, instead of being re-created (and
+re-validated by the SDK's pydantic models) on every request. The dict
+schemas are module constants; the SDK objects are built by
+`get_generation_registry()` on first use or during pre-warm, so importing
+this module does not import the Gemini SDK.
+
+Model output for grading and hints is parsed into the typed models below.
+"""
+
+import copy
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+from pydantic import BaseModel, Field
+
+from app.models.enums import QuestionType
+from app.services.wire_format import COMPACT_QUESTION_SCHEMAS
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+# Sampling temperature per endpoint
+_QUESTION_TEMPERATURE = 0.7
+_TUTOR_TEMPERATURE = 0.8
+_EXPLAIN_TEMPERATURE = 0.3
+_GRADING_TEMPERATURE = 0.2
+_HINTS_TEMPERATURE = 0.6
+_TEMPLATE_TEMPERATURE = 0.5
+
+_ANSWER_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "content": {"type": "STRING"},
+        "is_correct": {"type": "BOOLEAN"},
+        "explanation": {"type": "STRING"},
+        "student_explanation": {"type": "STRING"},
+        "point": {"type": "NUMBER"},
+    },
+    "required": ["content", "is_correct"]
+}
+
+
+def _question_schema(question_type: Optional[QuestionType]) -> dict[str, Any]:
+    """JSON schema for question generation, constrained to one type when given."""
+    question_type_enum = [question_type.value] if question_type else [qt.value for qt in QuestionType]
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "questions": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "content": {"type": "STRING"},
+                        "question_type": {
+                            "type": "STRING",
+                            "enum": question_type_enum
+                        },
+                        "cognitive_level": {
+                            "type": "STRING",
+                            "enum": ["remember", "understand", "apply", "analyze"]
+                        },
+                        "point": {"type": "NUMBER"},
+                        "media_url": {"type": "STRING"},
+                        "answers": {
+                            "type": "ARRAY",
+                            "items": _ANSWER_SCHEMA
+                        }
+                    },
+                    "required": ["content", "question_type", "cognitive_level", "answers"]
+                }
+            }
+        },
+        "required": ["questions"]
+    }
+
+
+# Question schema per requested type; None is a mixed ("random") topic
+QUESTION_SCHEMAS: Mapping[Optional[QuestionType], dict[str, Any]] = MappingProxyType({
+    question_type: _question_schema(question_type) for question_type in (None, *QuestionType)
+})
+
+
+
+def with_row_index(schema: dict[str, Any]) -> dict[str, Any]:
+    """
+    Copy of a question schema whose items carry a required row index "i".
+    
+    Used when several matrix rows share one call, so each question can be
+    mapped back to the row (and topic) it was generated for.
+    """
+    packed = copy.deepcopy(schema)
+    items = packed["properties"]["questions"]["items"]
+    items["properties"] = {"i": {"type": "INTEGER"}, **items["properties"]}
+    items["required"] = ["i", *items["required"]]
+    return packed
+
+
+GRADING_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "NUMBER"},
+        "feedback": {"type": "STRING"},
+    },
+    "required": ["score", "feedback"],
+}
+
+SOCRATIC_HINTS_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "hints": {
+            "type": "ARRAY",
+            "items": {"type": "STRING"},
+        },
+        "teaching_note": {"type": "STRING"},
+    },
+    "required": ["hints", "teaching_note"],
+}
+
+
+# Parametric question template (app.schemas.QuestionTemplate, without the request metadata)
+TEMPLATE_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "content": {"type": "STRING"},
+        "variables": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "name": {"type": "STRING"},
+                    "kind": {"type": "STRING", "enum": ["int", "decimal", "choice"]},
+                    "min": {"type": "NUMBER"},
+                    "max": {"type": "NUMBER"},
+                    "step": {"type": "NUMBER"},
+                    "choices": {"type": "ARRAY", "items": {"type": "STRING"}},
+                },
+                "required": ["name", "kind"],
+            },
+        },
+        "constraints": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "answer": {"type": "STRING"},
+        "distractors": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["content", "variables", "answer"],
+}
+
+
+class EssayGradingOutput(BaseModel):
+    """Model output for essay grading (GRADING_SCHEMA)."""
+    score: float = 0.0
+    feedback: str = ""
+
+
+class SocraticHintsOutput(BaseModel):
+    """Model output for Socratic hints (SOCRATIC_HINTS_SCHEMA)."""
+    hints: list[str] = Field(default_factory=list)
+    teaching_note: str = ""
+
+
+class GenerationRegistry:
+    """
+    SDK request configs built once per process.
+    
+    The configs are shared between requests and must be treated as
+    read-only; use `tutor_config` to derive a per-request variant.
+    """
+    
+    def __init__(self) -> None:
+        from google.genai import types
+        
+        def json_config(schema: dict[str, Any], temperature: float) -> "types.GenerateContentConfig":
+            return types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=types.Schema.model_validate(schema),
+                temperature=temperature,
+            )
+        
+        self._question_configs = MappingProxyType({
+            (question_type, compact, packed): json_config(
+                with_row_index(schema) if packed else schema, _QUESTION_TEMPERATURE
+            )
+            for compact, schemas in ((False, QUESTION_SCHEMAS), (True, COMPACT_QUESTION_SCHEMAS))
+            for question_type, schema in schemas.items()
+            for packed in (False, True)
+        })
+        self.grading_config = json_config(GRADING_SCHEMA, _GRADING_TEMPERATURE)
+        self.hints_config = json_config(SOCRATIC_HINTS_SCHEMA, _HINTS_TEMPERATURE)
+        self.template_config = json_config(TEMPLATE_SCHEMA, _TEMPLATE_TEMPERATURE)
+        self.explain_config = types.GenerateContentConfig(temperature=_EXPLAIN_TEMPERATURE)
+        self._tutor_config = types.GenerateContentConfig(temperature=_TUTOR_TEMPERATURE)
+    
+    def question_config(
+        self,
+        question_type: Optional[QuestionType] = None,
+        compact: bool = False,
+        packed: bool = False
+    ) -> "types.GenerateContentConfig":
+        """
+        Config for question generation, constrained to `question_type` if given.
+        
+        With `packed`, questions carry the row index "i" of the matrix row they belong to.
+        """
+        return self._question_configs[(question_type, compact, packed)]
+    
+    def tutor_config(self, system_instruction: str) -> "types.GenerateContentConfig":
+        """Config for a tutoring turn with its per-request system instruction."""
+        return self._tutor_config.model_copy(update={"system_instruction": system_instruction})
+
+
+@lru_cache(maxsize=1)
+def get_generation_registry() -> GenerationRegistry:
+    """Get the generation registry, building it on first use."""
+    return GenerationRegistry()
@@ -0,0 +1,112 @@
+"""
+Near-duplicate detection for generated questions.
+
+Chunked, parallel and repeated generation often returns questions that
+differ only in punctuation, a word or two, or word order. Each question is
+reduced to a MinHash signature over character 5-gram shingles of its
+normalized text (character shingles need no word segmentation, which
+matters for Vietnamese). The fraction of equal signature slots estimates
+the Jaccard similarity of two questions' shingle sets.
+
+Everything is vectorized with NumPy: shingle hashes come from a sliding
+window over the text's code points, the signature is the column-wise
+minimum of all permutation hashes, and a candidate is compared with every
+signature in the index in one array comparison. At the size of one matrix
+plus a teacher's recent history (hundreds of questions) this brute-force
+comparison costs far less than a millisecond, so no LSH banding is used.
+
+The hash parameters come from a fixed seed, so signatures are comparable
+across processes.
+
+NumPy is imported with this module; import it lazily from request paths
+that may not need it.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.services.chunking import question_fingerprint
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; p is the first prime above 2**32,
+# so a * x + b stays below 2**64
+_PRIME = np.uint64(4294967311)
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(20261019)
+_A = _rng.integers(1, 2**32, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+_B = _rng.integers(0, 2**32, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+# Polynomial weights for hashing one shingle's code points
+_SHINGLE_WEIGHTS = np.array([pow(1_000_003, i, 2**32) for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+
+
+def minhash_signature(content: str) -> np.ndarray:
+    """
+    MinHash signature of a question's normalized text.
+    
+    Args:
+        content: The question text
+    
+    Returns:
+        A uint64 array of NUM_PERMUTATIONS slot minima
+    """
+    text = question_fingerprint(content)
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE_SIZE:
+        # Short text: the whole (padded) text is one shingle
+        codes = np.pad(codes, (0, SHINGLE_SIZE - len(codes)))
+    windows = sliding_window_view(codes, SHINGLE_SIZE)
+    shingles = np.unique((windows * _SHINGLE_WEIGHTS).sum(axis=1) & _MASK_32)
+    return ((_A * shingles + _B) % _PRIME).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    Signatures of questions seen so far, with a similarity threshold.
+    
+    `add` admits a question only if its estimated Jaccard similarity to every
+    indexed question is below `threshold`.
+    """
+    
+    def __init__(self, threshold: float, capacity: int = 64) -> None:
+        self._threshold = threshold
+        self._signatures = np.empty((capacity, NUM_PERMUTATIONS), dtype=np.uint64)
+        self._size = 0
+        self.rejected = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def max_similarity(self, signature: np.ndarray) -> float:
+        """Highest estimated Jaccard similarity between `signature` and an indexed question."""
+        if not self._size:
+            return 0.0
+        return float((self._signatures[:self._size] == signature).mean(axis=1).max())
+    
+    def add(self, content: str) -> bool:
+        """
+        Index a question unless it is a near-duplicate of one already indexed.
+        
+        Returns:
+            True if the question was added, False if it was rejected
+        """
+        signature = minhash_signature(content)
+        if self.max_similarity(signature) >= self._threshold:
+            self.rejected += 1
+            return False
+        self._append(signature)
+        return True
+    
+    def extend(self, contents: list[str]) -> None:
+        """Index questions without checking them (e.g. a teacher's history)."""
+        for content in contents:
+            self._append(minhash_signature(content))
+    
+    def _append(self, signature: np.ndarray) -> None:
+        if self._size == len(self._signatures):
+            grown = np.empty((2 * len(self._signatures), NUM_PERMUTATIONS), dtype=np.uint64)
+            grown[:self._size] = self._signatures[:self._size]
+            self._signatures = grown
+        self._signatures[self._size] = signature
+        self._size += 1
@@ -0,0 +1,66 @@
+"""
+Truncation-tolerant parsing of generated question lists.
+
+A response cut off by the output-token limit (or a stalled stream) is not
+valid JSON, but every question before the cut is. Rather than losing the
+whole call, `parse_questions` falls back to decoding the `questions` array
+one item at a time and keeps every complete item; the caller tops up the
+missing count with a follow-up call.
+"""
+
+import json
+import re
+from typing import Any, NamedTuple
+
+from app.serialization import loads
+
+_QUESTIONS_ARRAY = re.compile(r'"questions"\s*:\s*\[')
+_SEPARATORS = " \t\r\n,"
+_DECODER = json.JSONDecoder()
+
+
+class ParsedQuestions(NamedTuple):
+    """Question items parsed from a response, and whether the response was complete."""
+    items: list[dict[str, Any]]
+    complete: bool
+
+
+def parse_questions(text: str) -> ParsedQuestions:
+    """
+    Parse the `questions` array of a generation response.
+    
+    Args:
+        text: The raw response text, possibly truncated
+    
+    Returns:
+        The question items; `complete` is False if the response was not
+        valid JSON and the items were salvaged
+    """
+    try:
+        result = loads(text)
+    except ValueError:
+        return ParsedQuestions(_salvage_items(text), False)
+    
+    questions = result.get("questions", []) if isinstance(result, dict) else []
+    return ParsedQuestions([item for item in questions if isinstance(item, dict)], True)
+
+
+def _salvage_items(text: str) -> list[dict[str, Any]]:
+    """Decode complete objects from the start of the `questions` array, stopping at the first broken one."""
+    match = _QUESTIONS_ARRAY.search(text)
+    if match is None:
+        return []
+    
+    items: list[dict[str, Any]] = []
+    position = match.end()
+    while True:
+        while position < len(text) and text[position] in _SEPARATORS:
+            position += 1
+        if position >= len(text) or text[position] != "{":
+            break
+        try:
+            item, position = _DECODER.raw_decode(text, position)
+        except ValueError:
+            break
+        items.append(item)
+    return items
@@ -1,9 +1,39 @@
 """Prompt templates for Gemini AI service."""
-from typing import Optional
-from app.schemas import GenerateQuestionsRequest, GenerateSingleQuestionRequest
+from functools import lru_cache
+from typing import NamedTuple, Optional, Sequence
+from app.schemas import GenerateQuestionsRequest, GenerateSingleQuestionRequest, RegenerateQuestionRequest
 from app.models.enums import QuestionType
 
 
+class LanguageFragments(NamedTuple):
+    """Pre-rendered language-dependent prompt fragments."""
+    name: str
+    matrix_instruction: str
+    single_instruction: str
+    curriculum_note: str
+
+
+LANGUAGE_FRAGMENTS = {
+    "vi": LanguageFragments(
+        name="Vietnamese",
+        matrix_instruction="Generate ALL content in Vietnamese (questions, answers, and explanations).",
+        single_instruction="Generate ALL content in Vietnamese (question, answers, and explanations).",
+        curriculum_note="Follow Vietnamese curriculum standards and context.",
+    ),
+    "en": LanguageFragments(
+        name="English",
+        matrix_instruction="Generate ALL content in English (questions, answers, and explanations).",
+        single_instruction="Generate ALL content in English (question, answers, and explanations).",
+        curriculum_note="Follow international curriculum standards appropriate for this grade level.",
+    ),
+}
+
+
+def get_language_fragments(language: str) -> LanguageFragments:
+    """Get the prompt fragments for a language; anything but "vi" is English."""
+    return LANGUAGE_FRAGMENTS["vi" if language == "vi" else "en"]
+
+
 # Question type specific instructions
 QUESTION_TYPE_INSTRUCTIONS = {
     QuestionType.TRUE_FALSE: """
@@ -112,73 +142,209 @@ Example output:
 }
 
 
-def get_question_type_instruction(question_type: QuestionType) -> str:
+# Same instructions for the compact wire format (see app/services/wire_format.py)
+COMPACT_QUESTION_TYPE_INSTRUCTIONS = {
+    QuestionType.TRUE_FALSE: """
+**TRUE/FALSE Question Format:**
+- Create a clear statement that is either definitely TRUE or definitely FALSE
+- The statement should be unambiguous and fact-based
+- "k" is true if the statement is true, false otherwise
+- "e" explains why the statement is true or false
+
+Example output:
+{"q": "Water boils at 100 degrees Celsius at sea level.", "k": true, "e": "At standard atmospheric pressure (sea level), pure water boils at exactly 100°C."}
+""",
+    
+    QuestionType.SELECT: """
+**SELECT (Single Choice) Question Format:**
+- Create a question with ONE correct answer
+- Generate 4 answer options in "o"
+- "k" is the 0-based index of the ONE correct option
+- Provide an explanation "e" for each option
+
+Example output:
+{"q": "What is the capital of France?", "o": [{"c": "London", "e": "London is the capital of the United Kingdom."}, {"c": "Paris", "e": "Paris is the capital and largest city of France."}, {"c": "Berlin", "e": "Berlin is the capital of Germany."}, {"c": "Madrid", "e": "Madrid is the capital of Spain."}], "k": 1}
+""",
+
+    QuestionType.MULTIPLE_CHOICE: """
+**MULTIPLE CHOICE (Multiple Answers) Question Format:**
+- Create a question where ONE OR MORE answers can be correct
+- Generate 4-6 answer options in "o"
+- "k" lists the 0-based indices of ALL correct options
+- The question should clearly indicate multiple answers may be correct
+- Use phrases like "Select all that apply" or "Which of the following are..."
+- Provide an explanation "e" for each option
+
+Example output:
+{"q": "Which of the following are prime numbers? (Select all that apply)", "o": [{"c": "2", "e": "2 is the only even prime number."}, {"c": "4", "e": "4 is divisible by 2, so it's not prime."}, {"c": "7", "e": "7 is only divisible by 1 and itself."}, {"c": "9", "e": "9 is divisible by 3, so it's not prime."}], "k": [0, 2]}
+""",
+
+    QuestionType.ESSAY: """
+**ESSAY Question Format:**
+- Create an open-ended question that requires a detailed written response
+- There is NO correct answer - the response will be graded based on content and accuracy
+- "r" describes what a good response should include
+- "e" gives the grading guidelines/rubric weights
+
+Example output:
+{"q": "Explain the causes and effects of climate change on global ecosystems.", "r": "A comprehensive answer should include: (1) Main causes: greenhouse gas emissions, deforestation; (2) Effects: rising temperatures, sea level rise, biodiversity loss", "e": "Grading rubric: Content accuracy (40%), Logical structure (30%), Supporting examples (20%), Language clarity (10%)"}
+""",
+
+    QuestionType.FILL_IN_BLANK: """
+**FILL IN THE BLANK Question Format:**
+- Create a statement with a blank (use underscores: _____) for the missing word/phrase
+- The user must type the EXACT word/phrase to be correct
+- Put 1-3 acceptable answers in "o" (alternative correct spellings or equivalent terms)
+- Keep the expected answer as a single word or short phrase
+
+Example output:
+{"q": "The chemical symbol for water is _____.", "o": [{"c": "H2O", "e": "H2O is the standard chemical formula for water."}, {"c": "H₂O", "e": "Alternative notation with subscript."}]}
+"""
+}
+
+COMPACT_FORMAT_NOTE = """
+**Output Format (compact keys):**
+- "q": question content; "o": answer options, each {"c": content, "e": explanation}
+- Typed questions mark correct options with "k" as described in their type instructions
+- For "random" question types, also set "t" to the question type and mark every option with "k": true/false
+- Do NOT output question type, cognitive level or points for typed questions; they are already known
+"""
+
+
+def get_question_type_instruction(question_type: QuestionType, compact: bool = False) -> str:
     """Get the instruction for a specific question type."""
-    return QUESTION_TYPE_INSTRUCTIONS.get(
+    instructions = COMPACT_QUESTION_TYPE_INSTRUCTIONS if compact else QUESTION_TYPE_INSTRUCTIONS
+    return instructions.get(
         question_type,
-        QUESTION_TYPE_INSTRUCTIONS[QuestionType.SELECT]
+        instructions[QuestionType.SELECT]
+    )
+
+
+@lru_cache(maxsize=64)
+def _type_instructions_section(question_types: frozenset[QuestionType], compact: bool = False) -> str:
+    """Render the instructions for a set of explicitly requested question types, in enum order."""
+    section = COMPACT_FORMAT_NOTE if compact else ""
+    if not question_types:
+        return section
+    section += "\n**Question Type Instructions:**\n"
+    for qt in QuestionType:
+        if qt in question_types:
+            section += get_question_type_instruction(qt, compact) + "\n"
+    return section
+
+
+# Cap on already-generated questions listed in a top-up prompt, and on each one's length
+MAX_EXCLUDED_QUESTIONS = 40
+_EXCLUDED_QUESTION_CHARS = 200
+
+
+def _excluded_list(exclude: Sequence[str]) -> str:
+    """Bulleted, truncated list of the first `MAX_EXCLUDED_QUESTIONS` questions to avoid."""
+    return "\n".join(f"- {content[:_EXCLUDED_QUESTION_CHARS]}" for content in exclude[:MAX_EXCLUDED_QUESTIONS])
+
+
+def _student_explanations_section(enabled: bool, grade: int, compact: bool = False) -> str:
+    """Instruction for per-answer student explanations, or "" when they were not requested."""
+    if not enabled:
+        return ""
+    where = (
+        'in "s" on every option (for true_false, once in "s" on the question)'
+        if compact
+        else 'in "student_explanation" on every answer'
     )
+    return f"""
+**Student Explanations:** Also write, {where}, 1-3 sentences addressed to a grade {grade}
+student who chose that answer, in simple words they understand. For a wrong answer, say why it is
+wrong and what the right idea is; for a correct answer, say why it is right. Do NOT compliment
+or encourage; explain only. Essay questions need none.
+"""
 
 
-def build_matrix_prompt(request: GenerateQuestionsRequest) -> str:
-    """Build prompt for matrix-based question generation."""
+def build_matrix_prompt(
+    request: GenerateQuestionsRequest,
+    compact: bool = False,
+    row_parts: Optional[Sequence[tuple[int, int]]] = None,
+    row_index: bool = False,
+    exclude: Sequence[str] = ()
+) -> str:
+    """Build prompt for matrix-based question generation.
+    
+    With `compact`, the model is instructed to answer in the compact wire format.
+    `row_parts` gives (part, parts) per matrix row when a row is one of several
+    chunks of a topic generated in parallel; each chunk is steered to a different
+    sub-area to avoid duplicates. With `row_index`, rows are numbered and the
+    model tags each question with its row number (`i`), so a call shared by
+    several rows can be mapped back to topic IDs. `exclude` lists questions
+    already generated for these rows (when topping up a short result), which
+    the model must not repeat; only the first `MAX_EXCLUDED_QUESTIONS` are sent.
+    """
     # Build per-topic details, including question_type instruction
     matrix_lines = []
     type_instructions_used: set[QuestionType] = set()
     
-    for topic in request.matrix_topics:
+    for row, topic in enumerate(request.matrix_topics, start=1):
         if topic.question_type:
             type_label = topic.question_type.value
             type_instructions_used.add(topic.question_type)
         else:
             type_label = "random (vary across select, true_false, multiple_choice)"
         
-        matrix_lines.append(
-            f"- Topic: {topic.topic_name}, "
+        prefix = f"- Row {row}: " if row_index else "- "
+        line = (
+            f"{prefix}Topic: {topic.topic_name}, "
             f"Cognitive Level: {topic.cognitive_level.value}, "
             f"Quantity: {topic.quantity}, "
             f"Question Type: {type_label}"
         )
+        if row_parts and row_parts[row - 1][1] > 1:
+            part, parts = row_parts[row - 1]
+            line += f", Batch: {part} of {parts}"
+        matrix_lines.append(line)
     
     matrix_details = "\n".join(matrix_lines)
     
-    language_instruction = (
-        "Generate ALL content in Vietnamese (questions, answers, and explanations)."
-        if request.language == "vi"
-        else "Generate ALL content in English (questions, answers, and explanations)."
-    )
+    language = get_language_fragments(request.language)
     
     # Include specific type instructions only for types that are explicitly requested
-    type_specific_section = ""
-    if type_instructions_used:
-        type_specific_section = "\n**Question Type Instructions:**\n"
-        for qt in type_instructions_used:
-            type_specific_section += get_question_type_instruction(qt) + "\n"
+    type_specific_section = _type_instructions_section(frozenset(type_instructions_used), compact)
+    student_section = _student_explanations_section(request.student_explanations, request.grade, compact)
     
-    curriculum_note = (
-        "Follow Vietnamese curriculum standards and context."
-        if request.language == "vi"
-        else "Follow international curriculum standards appropriate for this grade level."
-    )
+    batch_section = ""
+    if row_parts and any(parts > 1 for _, parts in row_parts):
+        batch_section += """
+**Batches:** A row marked "Batch i of n" is one of n batches for the same topic generated at the
+same time. To avoid duplicates across batches, divide that topic into n distinct sub-areas (or
+angles) and cover ONLY sub-area i. Vary scenarios, numbers and wording, and never repeat a question.
+"""
+    if row_index:
+        batch_section += """
+**Row Mapping:** Set "i" on every question to the number of the row it was generated for.
+"""
+    if exclude:
+        batch_section += f"""
+**Already Generated:** These questions already exist for the rows above. Do NOT repeat them or
+ask the same thing in other words:
+{_excluded_list(exclude)}
+"""
 
     return f"""You are an expert education content creator.
 
-{language_instruction}
+{language.matrix_instruction}
 
 Generate exam questions with the following specifications:
 
 **Subject**: {request.subject}
 **Grade Level**: {request.grade}
-**Output Language**: {request.language.upper()} — YOU MUST write ALL question content, ALL answer content, and ALL explanations in {"Vietnamese" if request.language == "vi" else "English"}. Do NOT mix languages.
+**Output Language**: {request.language.upper()} — YOU MUST write ALL question content, ALL answer content, and ALL explanations in {language.name}. Do NOT mix languages.
 
 **Matrix Requirements** (generate exactly the specified quantity for each row):
 {matrix_details}
 
-{type_specific_section}
+{type_specific_section}{student_section}{batch_section}
 
 **General Rules for ALL questions:**
 1. Content must be appropriate for grade {request.grade} students
-2. {curriculum_note}
+2. {language.curriculum_note}
 3. Strictly match the specified cognitive level (Bloom's Taxonomy):
    - remember: Recall facts, definitions, basic concepts
    - understand: Explain, summarize, interpret ideas
@@ -192,24 +358,27 @@ Generate exam questions with the following specifications:
 Return ONLY the questions in the specified JSON format with no additional text."""
 
 
-def build_single_question_prompt(request: GenerateSingleQuestionRequest) -> str:
-    """Build prompt for single question generation."""
-    language_instruction = (
-        "Generate ALL content in Vietnamese (question, answers, and explanations)."
-        if request.language == "vi"
-        else "Generate ALL content in English (question, answers, and explanations)."
-    )
+def build_single_question_prompt(request: GenerateSingleQuestionRequest, compact: bool = False) -> str:
+    """Build prompt for single question generation.
+    
+    With `compact`, the model is instructed to answer in the compact wire format.
+    """
+    language = get_language_fragments(request.language)
     
     topic_context = ""
     if request.topic_description:
         topic_context = f"\n**Topic Description**: {request.topic_description}"
     
     # Get type-specific instructions
-    type_instruction = get_question_type_instruction(request.question_type)
+    if compact:
+        type_instruction = _type_instructions_section(frozenset({request.question_type}), compact=True)
+    else:
+        type_instruction = get_question_type_instruction(request.question_type)
+    student_section = _student_explanations_section(request.student_explanations, request.grade, compact)
     
     return f"""You are an expert education content creator.
 
-{language_instruction}
+{language.single_instruction}
 
 Generate ONE exam question with these specifications:
 
@@ -218,9 +387,9 @@ Generate ONE exam question with these specifications:
 **Topic**: {request.topic_name}{topic_context}
 **Cognitive Level**: {request.cognitive_level.value}
 **Question Type**: {request.question_type.value}
-**Output Language**: {request.language.upper()} — YOU MUST write ALL question content, ALL answer content, and ALL explanations in {"Vietnamese" if request.language == "vi" else "English"}. Do NOT mix languages.
+**Output Language**: {request.language.upper()} — YOU MUST write ALL question content, ALL answer content, and ALL explanations in {language.name}. Do NOT mix languages.
 
-{type_instruction}
+{type_instruction}{student_section}
 
 Requirements:
 1. Content appropriate for grade {request.grade}
@@ -236,6 +405,147 @@ Requirements:
 Return in JSON format with a "questions" array containing one question."""
 
 
+def build_variants_prompt(
+    request: GenerateSingleQuestionRequest,
+    count: int,
+    compact: bool = False,
+    exclude: Sequence[str] = ()
+) -> str:
+    """Build prompt for parallel versions of one question (exam forms).
+    
+    With `compact`, the model is instructed to answer in the compact wire format.
+    `exclude` lists variants already generated, which must not be repeated.
+    """
+    language = get_language_fragments(request.language)
+    
+    topic_context = ""
+    if request.topic_description:
+        topic_context = f"\n**Topic Description**: {request.topic_description}"
+    
+    if compact:
+        type_instruction = _type_instructions_section(frozenset({request.question_type}), compact=True)
+    else:
+        type_instruction = get_question_type_instruction(request.question_type)
+    student_section = _student_explanations_section(request.student_explanations, request.grade, compact)
+    
+    excluded_section = ""
+    if exclude:
+        excluded_section = f"""
+**Already Generated:** These variants already exist. Do NOT repeat them or ask the same thing in
+other words:
+{_excluded_list(exclude)}
+"""
+    
+    return f"""You are an expert education content creator.
+
+{language.single_instruction}
+
+Generate {count} PARALLEL VERSIONS of one exam question, for different forms of the same exam:
+
+**Subject**: {request.subject}
+**Grade Level**: {request.grade}
+**Topic**: {request.topic_name}{topic_context}
+**Cognitive Level**: {request.cognitive_level.value}
+**Question Type**: {request.question_type.value}
+**Output Language**: {request.language.upper()} — YOU MUST write ALL question content, ALL answer content, and ALL explanations in {language.name}. Do NOT mix languages.
+
+{type_instruction}{student_section}
+{excluded_section}
+Requirements:
+1. Content appropriate for grade {request.grade}
+2. Every version tests the SAME skill at the SAME difficulty and cognitive level, so the forms are equally fair
+3. Versions must differ in scenario, numbers and wording, so that knowing the answer to one does not give away another
+4. STRICTLY follow the question type format specified above
+5. Provide clear explanations for each answer
+
+Return in JSON format with a "questions" array containing exactly {count} questions."""
+
+
+def build_regenerate_prompt(request: RegenerateQuestionRequest, compact: bool = False) -> str:
+    """Build a short prompt replacing one rejected question of a set.
+    
+    The replacement keeps the rejected question's type and cognitive level and
+    must differ from it and from its siblings (the first `MAX_EXCLUDED_QUESTIONS`
+    are sent). With `compact`, the model answers in the compact wire format.
+    """
+    language = get_language_fragments(request.language)
+    rejected = request.rejected
+    
+    if compact:
+        type_instruction = _type_instructions_section(frozenset({rejected.question_type}), compact=True)
+    else:
+        type_instruction = get_question_type_instruction(rejected.question_type)
+    student_section = _student_explanations_section(request.student_explanations, request.grade, compact)
+    
+    reason = f"\n**Rejected Because**: {request.reason}" if request.reason else ""
+    topic_context = f" ({request.topic_description})" if request.topic_description else ""
+    siblings = ""
+    if request.siblings:
+        siblings = f"""
+**Other Questions In The Set:** Do NOT repeat them or ask the same thing in other words:
+{_excluded_list(request.siblings)}
+"""
+    
+    return f"""You are an expert education content creator. {language.single_instruction}
+
+A teacher rejected one question of an exam. Write ONE replacement question for grade {request.grade} {request.subject}, topic "{request.topic_name}"{topic_context}, cognitive level {rejected.cognitive_level.value}, type {rejected.question_type.value}, in {language.name}.
+
+**Rejected Question**: {rejected.content[:_EXCLUDED_QUESTION_CHARS]}{reason}
+{siblings}{type_instruction}{student_section}
+The replacement must test the topic differently from the rejected question and all other questions in the set.
+
+Return in JSON format with a "questions" array containing one question."""
+
+
+def build_template_prompt(request: GenerateSingleQuestionRequest) -> str:
+    """Build prompt for a parametric question template (see app/services/question_templates.py)."""
+    language = get_language_fragments(request.language)
+    
+    topic_context = ""
+    if request.topic_description:
+        topic_context = f"\n**Topic Description**: {request.topic_description}"
+    
+    answer_rule = (
+        '- "distractors": 3 expressions for typical mistakes (wrong operation, off-by-one, swapped operands); '
+        "they must differ from the answer for every allowed value"
+        if request.question_type == QuestionType.SELECT
+        else '- "distractors": leave empty; the student types the answer'
+    )
+
+    return f"""You are an expert education content creator.
+
+{language.single_instruction}
+
+Write ONE parametrized question TEMPLATE. The app will substitute many different values into it to create distinct variants, so all numbers must come from variables:
+
+**Subject**: {request.subject}
+**Grade Level**: {request.grade}
+**Topic**: {request.topic_name}{topic_context}
+**Cognitive Level**: {request.cognitive_level.value}
+**Question Type**: {request.question_type.value}
+**Output Language**: {request.language.upper()} — YOU MUST write the question text and explanation in {language.name}. Do NOT mix languages.
+
+Template format:
+- "content": the question text with placeholders like {{a}} for each variable
+- "variables": 1-8 variables, each with "name" (letters, digits, underscore) and "kind":
+  - "int" or "decimal" with "min", "max" and optional "step"
+  - "choice" with "choices" (numbers, or words such as names used only in the text)
+- "constraints": boolean expressions every variant must satisfy, e.g. "a > b", "a % b == 0"
+- "answer": an expression computing the correct answer from the variables, e.g. "a - b"
+{answer_rule}
+- "explanation": the worked solution, using the variable placeholders and {{answer}}
+
+Expressions may only use numbers, variable names, + - * / // % **, comparisons, and/or/not,
+"x if condition else y", and the functions abs, min, max, round, gcd, sqrt.
+
+Requirements:
+1. Values and answers appropriate for grade {request.grade} (choose min/max/step and constraints so answers are sensible, e.g. whole numbers for young students)
+2. Follow the specified cognitive level (Bloom's Taxonomy)
+3. The answer must be a single number computed by the "answer" expression
+
+Return the template as a JSON object."""
+
+
 def build_tutor_system_instruction(
     subject: str,
     grade: int,
@@ -272,7 +582,7 @@ def build_socratic_hints_prompt(
     language: str = "vi",
 ) -> str:
     """Build prompt for generating Socratic method guiding questions."""
-    lang = "Vietnamese" if language == "vi" else "English"
+    lang = get_language_fragments(language).name
     return (
         f"You are an expert {subject} pedagogy coach helping a primary school teacher.\n"
         f"Respond entirely in {lang}.\n\n"
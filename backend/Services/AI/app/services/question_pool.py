@@ -0,0 +1,255 @@
+"""
+Local pool of previously generated questions.
+
+Every generated question is stored in a SQLite file, keyed by (subject,
+grade, language, topic, cognitive level, question type). Generation
+endpoints take from the pool first and only ask Gemini for the shortfall.
+A per-teacher `served` table keeps the pool from handing the same question
+to the same teacher twice (including questions generated for them).
+
+Topics that ran short are recorded as demand; `PoolRefiller`
+(app/pool_refiller.py) tops them up in the background in server mode.
+
+SQLite calls are blocking and run in a worker thread, serialized by a lock
+on one connection (WAL mode, so readers in other processes are not blocked).
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, NamedTuple, Optional, Sequence
+
+from app.config import get_settings, Settings
+from app.models.enums import CognitiveLevel, QuestionType
+from app.serialization import dumps, loads
+from app.services.chunking import question_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Types a mixed ("random") matrix topic may be served
+MIXED_QUESTION_TYPES = (QuestionType.SELECT, QuestionType.MULTIPLE_CHOICE, QuestionType.TRUE_FALSE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    grade INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    cognitive_level TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    -- Also the lookup index: every pool query filters on this column prefix
+    UNIQUE (subject, grade, language, topic, cognitive_level, question_type, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS served (
+    teacher_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    served_at REAL NOT NULL,
+    PRIMARY KEY (teacher_id, question_id)
+) WITHOUT ROWID;
+"""
+
+_KEY_FILTER = "subject = ? AND grade = ? AND language = ? AND topic = ? AND cognitive_level = ?"
+
+
+class PoolKey(NamedTuple):
+    """A pool bucket; the question type is filtered separately so mixed topics can span types."""
+    subject: str
+    grade: int
+    language: str
+    topic: str
+    cognitive_level: str
+    
+    @classmethod
+    def build(
+        cls,
+        subject: str,
+        grade: int,
+        language: str,
+        topic_id: Optional[str],
+        topic_name: str,
+        cognitive_level: CognitiveLevel
+    ) -> "PoolKey":
+        """Normalized key; the topic is its ID when known, else its name."""
+        topic = topic_id or f"name:{question_fingerprint(topic_name)}"
+        return cls(question_fingerprint(subject), grade, language.lower(), topic, cognitive_level.value)
+
+
+class PoolDemand(NamedTuple):
+    """A topic that ran short, with what the refiller needs to generate for it."""
+    key: PoolKey
+    question_type: Optional[QuestionType]
+    subject: str
+    topic_id: Optional[str]
+    topic_name: str
+
+
+def question_types_for(question_type: Optional[QuestionType]) -> tuple[str, ...]:
+    """Stored question types that can serve a topic of `question_type` (None for mixed)."""
+    types = (question_type,) if question_type else MIXED_QUESTION_TYPES
+    return tuple(qt.value for qt in types)
+
+
+class QuestionPool:
+    """SQLite-backed question pool."""
+    
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._demand: dict[tuple[PoolKey, Optional[QuestionType]], PoolDemand] = {}
+        logger.info(f"Opened question pool at {path}")
+    
+    async def take(
+        self,
+        requests: Sequence[tuple[PoolKey, tuple[str, ...], int]],
+        teacher_id: Optional[str] = None
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Take questions for several topics in one round trip.
+        
+        Args:
+            requests: Per topic: (key, allowed question types, how many)
+            teacher_id: Skip questions already served to this teacher, and
+                record the ones returned as served
+        
+        Returns:
+            Question dicts per request (possibly fewer than asked), without topic_id
+        """
+        return await asyncio.to_thread(self._take, requests, teacher_id)
+    
+    async def add(
+        self,
+        entries: Sequence[tuple[PoolKey, dict[str, Any]]],
+        teacher_id: Optional[str] = None
+    ) -> None:
+        """
+        Store generated questions, ignoring ones already pooled.
+        
+        Args:
+            entries: (key, question dict) pairs
+            teacher_id: Record the questions as served to this teacher
+        """
+        if entries:
+            await asyncio.to_thread(self._add, entries, teacher_id)
+    
+    async def count(self, key: PoolKey, question_types: tuple[str, ...]) -> int:
+        """Number of pooled questions for a key and set of types."""
+        return await asyncio.to_thread(self._count, key, question_types)
+    
+    async def served_contents(
+        self,
+        teacher_id: str,
+        keys: Sequence[PoolKey],
+        limit: int = 200
+    ) -> list[str]:
+        """Content of the questions most recently served to a teacher under any of `keys`."""
+        return await asyncio.to_thread(self._served_contents, teacher_id, keys, limit)
+    
+    def note_demand(self, demand: PoolDemand) -> None:
+        """Record a topic that could not be served from the pool alone."""
+        self._demand[(demand.key, demand.question_type)] = demand
+    
+    def drain_demand(self) -> list[PoolDemand]:
+        """Return and clear the recorded demand."""
+        demand, self._demand = list(self._demand.values()), {}
+        return demand
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def _take(
+        self,
+        requests: Sequence[tuple[PoolKey, tuple[str, ...], int]],
+        teacher_id: Optional[str]
+    ) -> list[list[dict[str, Any]]]:
+        results: list[list[dict[str, Any]]] = []
+        now = time.time()
+        with self._lock:
+            for key, question_types, limit in requests:
+                placeholders = ", ".join("?" * len(question_types))
+                sql = f"SELECT id, payload FROM questions AS q WHERE {_KEY_FILTER} AND question_type IN ({placeholders})"
+                params: list[Any] = [*key, *question_types]
+                if teacher_id:
+                    sql += " AND NOT EXISTS (SELECT 1 FROM served AS s WHERE s.teacher_id = ? AND s.question_id = q.id)"
+                    params.append(teacher_id)
+                sql += " ORDER BY random() LIMIT ?"
+                params.append(limit)
+                rows = self._conn.execute(sql, params).fetchall()
+                if teacher_id and rows:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO served (teacher_id, question_id, served_at) VALUES (?, ?, ?)",
+                        [(teacher_id, question_id, now) for question_id, _ in rows],
+                    )
+                results.append([loads(payload) for _, payload in rows])
+        return results
+    
+    def _add(self, entries: Sequence[tuple[PoolKey, dict[str, Any]]], teacher_id: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, question in entries:
+                    payload = {name: value for name, value in question.items() if name != "topic_id"}
+                    fingerprint = question_fingerprint(str(question.get("content", "")))
+                    question_type = str(question.get("question_type"))
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO questions (subject, grade, language, topic, cognitive_level, "
+                        "question_type, fingerprint, payload, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (*key, question_type, fingerprint, dumps(payload), now),
+                    )
+                    if teacher_id:
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO served (teacher_id, question_id, served_at) "
+                            f"SELECT ?, id, ? FROM questions WHERE {_KEY_FILTER} AND question_type = ? AND fingerprint = ?",
+                            (teacher_id, now, *key, question_type, fingerprint),
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _served_contents(self, teacher_id: str, keys: Sequence[PoolKey], limit: int) -> list[str]:
+        unique_keys = list(dict.fromkeys(keys))
+        key_filter = " OR ".join(f"({_KEY_FILTER})" for _ in unique_keys)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT q.payload FROM served AS s JOIN questions AS q ON q.id = s.question_id "
+                f"WHERE s.teacher_id = ? AND ({key_filter}) ORDER BY s.served_at DESC LIMIT ?",
+                (teacher_id, *(value for key in unique_keys for value in key), limit),
+            ).fetchall()
+        return [str(loads(payload).get("content", "")) for (payload,) in rows]
+    
+    def _count(self, key: PoolKey, question_types: tuple[str, ...]) -> int:
+        placeholders = ", ".join("?" * len(question_types))
+        with self._lock:
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM questions WHERE {_KEY_FILTER} AND question_type IN ({placeholders})",
+                (*key, *question_types),
+            ).fetchone()
+        return count
+
+
+# Global singleton instance
+_question_pool: QuestionPool | None = None
+
+
+def get_question_pool(settings: Settings | None = None) -> QuestionPool | None:
+    """Get the question pool singleton instance, or None if the pool is disabled."""
+    global _question_pool
+    settings = settings or get_settings()
+    if not settings.question_pool_enabled:
+        return None
+    if _question_pool is None:
+        _question_pool = QuestionPool(settings.question_pool_path)
+    return _question_pool
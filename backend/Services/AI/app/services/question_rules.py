@@ -0,0 +1,275 @@
+"""
+Rule tables for generated questions.
+
+Each question type has a table of rules checked in order. A rule either has
+a safe automatic fix (relabel True/False answers, drop a duplicate option,
+mark every fill-in-blank answer correct) or it does not, in which case the
+question needs repair: it is regenerated on its own rather than patched
+into something the model never meant (e.g. marking the first option of a
+`select` question correct when none was).
+
+`RepairMetrics` counts checks, automatic fixes and repairs per question type
+and model, for this process.
+"""
+
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, NamedTuple, Optional
+
+from app.models.enums import QuestionType
+from app.schemas import QuestionRepairStats
+from app.services.chunking import question_fingerprint
+
+QuestionData = dict[str, Any]
+
+_TRUE_FALSE_LABELS = ("True", "False")
+
+# Normalized answer texts accepted as a True/False label
+_TRUE_FALSE_ALIASES = {"true": "True", "đúng": "True", "false": "False", "sai": "False"}
+
+
+class Rule(NamedTuple):
+    """
+    One check on a question dict.
+    
+    `check` returns True if the question satisfies the rule. `fix` repairs
+    the question in place and returns True, or returns False when this
+    instance cannot be fixed safely; rules without `fix` always need repair.
+    """
+    name: str
+    check: Callable[[QuestionData], bool]
+    fix: Optional[Callable[[QuestionData], bool]] = None
+
+
+class RuleResult(NamedTuple):
+    """Outcome of applying a rule table to one question."""
+    question: QuestionData
+    fixed: tuple[str, ...]
+    violations: tuple[str, ...]
+    
+    @property
+    def needs_repair(self) -> bool:
+        """Whether a rule was violated without a safe fix."""
+        return bool(self.violations)
+
+
+def _answers(question: QuestionData) -> list[dict[str, Any]]:
+    answers = question.get("answers")
+    return answers if isinstance(answers, list) else []
+
+
+def _correct_count(question: QuestionData) -> int:
+    return sum(1 for answer in _answers(question) if answer.get("is_correct"))
+
+
+def _has_content(question: QuestionData) -> bool:
+    return bool(str(question.get("content") or "").strip())
+
+
+def _answers_have_content(question: QuestionData) -> bool:
+    return all(str(answer.get("content") or "").strip() for answer in _answers(question))
+
+
+def _drop_empty_answers(question: QuestionData) -> bool:
+    question["answers"] = [answer for answer in _answers(question) if str(answer.get("content") or "").strip()]
+    return bool(question["answers"])
+
+
+def _option_groups(question: QuestionData) -> dict[str, list[dict[str, Any]]]:
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for answer in _answers(question):
+        groups.setdefault(question_fingerprint(str(answer.get("content") or "")), []).append(answer)
+    return groups
+
+
+def _distinct_options(question: QuestionData) -> bool:
+    return len(_option_groups(question)) == len(_answers(question))
+
+
+def _drop_duplicate_options(question: QuestionData) -> bool:
+    """Keep the first of each duplicated option; unsafe if duplicates disagree on correctness."""
+    groups = _option_groups(question)
+    if any(len({bool(answer.get("is_correct")) for answer in group}) > 1 for group in groups.values()):
+        return False
+    question["answers"] = [group[0] for group in groups.values()]
+    return True
+
+
+def _is_true_false_pair(question: QuestionData) -> bool:
+    return tuple(answer.get("content") for answer in _answers(question)) == _TRUE_FALSE_LABELS
+
+
+def _true_false_label(answer: dict[str, Any]) -> Optional[str]:
+    """The True/False label an answer's content spells (e.g. "Đúng" is "True"), or None."""
+    return _TRUE_FALSE_ALIASES.get(question_fingerprint(str(answer.get("content") or "")))
+
+
+def _relabel_true_false(question: QuestionData) -> bool:
+    """
+    Relabel a True/False pair spelled differently (e.g. "Đúng"/"Sai"), or complete a lone answer.
+    
+    Answers are matched by label, never by position: a pair in False/True
+    order or with an unrecognised or repeated label is left for repair,
+    since its `is_correct` flags may have been meant for the other order.
+    """
+    answers = _answers(question)
+    labels = [_true_false_label(answer) for answer in answers]
+    if len(answers) == 2:
+        if tuple(labels) != _TRUE_FALSE_LABELS:
+            return False
+        question["answers"] = [dict(answer, content=label) for answer, label in zip(answers, labels)]
+        return True
+    if len(answers) != 1 or labels[0] is None:
+        return False
+    answer = dict(answers[0], content=labels[0])
+    other = {"content": "False" if labels[0] == "True" else "True", "is_correct": not answer.get("is_correct")}
+    question["answers"] = [answer, other] if labels[0] == "True" else [other, answer]
+    return True
+
+
+def _keep_first_answer(question: QuestionData) -> bool:
+    question["answers"] = _answers(question)[:1]
+    return True
+
+
+def _mark_all_correct(question: QuestionData) -> bool:
+    for answer in _answers(question):
+        answer["is_correct"] = True
+    return True
+
+
+_TYPE_VALUES = frozenset(question_type.value for question_type in QuestionType)
+
+
+def _known_type(question: QuestionData) -> bool:
+    return question.get("question_type") in _TYPE_VALUES
+
+
+# Checked first, for every question type
+_COMMON_RULES = (
+    Rule("content_present", _has_content),
+    Rule("answers_present", lambda q: bool(_answers(q))),
+    Rule("answer_content_present", _answers_have_content, _drop_empty_answers),
+)
+
+_MIN_OPTIONS = Rule("min_options", lambda q: len(_answers(q)) >= 2)
+_DISTINCT_OPTIONS = Rule("distinct_options", _distinct_options, _drop_duplicate_options)
+
+# Rule table per question type
+QUESTION_RULES: Mapping[QuestionType, tuple[Rule, ...]] = MappingProxyType({
+    QuestionType.SELECT: (
+        *_COMMON_RULES,
+        _DISTINCT_OPTIONS,
+        _MIN_OPTIONS,
+        Rule("exactly_one_correct", lambda q: _correct_count(q) == 1),
+    ),
+    QuestionType.MULTIPLE_CHOICE: (
+        *_COMMON_RULES,
+        _DISTINCT_OPTIONS,
+        _MIN_OPTIONS,
+        Rule("at_least_one_correct", lambda q: _correct_count(q) >= 1),
+    ),
+    QuestionType.TRUE_FALSE: (
+        *_COMMON_RULES,
+        Rule("true_false_answers", _is_true_false_pair, _relabel_true_false),
+        Rule("exactly_one_correct", lambda q: _correct_count(q) == 1),
+    ),
+    QuestionType.ESSAY: (
+        *_COMMON_RULES,
+        Rule("single_rubric", lambda q: len(_answers(q)) == 1, _keep_first_answer),
+        Rule("rubric_correct", lambda q: _correct_count(q) == len(_answers(q)), _mark_all_correct),
+    ),
+    QuestionType.FILL_IN_BLANK: (
+        *_COMMON_RULES,
+        _DISTINCT_OPTIONS,
+        Rule("all_answers_correct", lambda q: _correct_count(q) == len(_answers(q)), _mark_all_correct),
+    ),
+})
+
+
+def apply_rules(question: QuestionData, expected_type: Optional[QuestionType] = None) -> RuleResult:
+    """
+    Check a question against its type's rule table, applying safe fixes.
+    
+    Args:
+        question: A question dict in the public shape (modified in place)
+        expected_type: The requested type, which overrides the model's; None for mixed topics
+    
+    Returns:
+        The question with the rules it fixed and the rules it still violates
+    """
+    if expected_type:
+        question["question_type"] = expected_type.value
+    if not _known_type(question):
+        return RuleResult(question, (), ("known_type",))
+    
+    fixed: list[str] = []
+    violations: list[str] = []
+    for rule in QUESTION_RULES[QuestionType(question["question_type"])]:
+        if rule.check(question):
+            continue
+        if rule.fix is not None and rule.fix(question):
+            fixed.append(rule.name)
+        else:
+            violations.append(rule.name)
+    return RuleResult(question, tuple(fixed), tuple(violations))
+
+
+class RepairMetrics:
+    """
+    Per-process counts of rule outcomes, keyed by (model, question type).
+    
+    Counters: checked, auto_fixed (at least one rule fixed), needs_repair,
+    repaired and repair_failed (outcome of regenerating the question), plus
+    one `rule:<name>` counter per violated rule.
+    """
+    
+    def __init__(self) -> None:
+        self._counts: dict[tuple[str, str], Counter[str]] = {}
+    
+    def _counter(self, model: str, question_type: Optional[str]) -> Counter[str]:
+        return self._counts.setdefault((model, question_type or "unknown"), Counter())
+    
+    def record_check(self, model: str, result: RuleResult) -> None:
+        """Count one first-pass rule check."""
+        counts = self._counter(model, result.question.get("question_type"))
+        counts["checked"] += 1
+        if result.fixed:
+            counts["auto_fixed"] += 1
+        if result.needs_repair:
+            counts["needs_repair"] += 1
+        counts.update(f"rule:{name}" for name in (*result.fixed, *result.violations))
+    
+    def record_repair(self, model: str, question_type: Optional[str], repaired: bool) -> None:
+        """Count the outcome of regenerating a question that needed repair."""
+        self._counter(model, question_type)["repaired" if repaired else "repair_failed"] += 1
+    
+    def snapshot(self) -> list[QuestionRepairStats]:
+        """Current counts with auto-fix and repair rates."""
+        stats = []
+        for (model, question_type), counts in sorted(self._counts.items()):
+            checked = counts["checked"]
+            stats.append(QuestionRepairStats(
+                model=model,
+                question_type=question_type,
+                checked=checked,
+                auto_fixed=counts["auto_fixed"],
+                needs_repair=counts["needs_repair"],
+                repaired=counts["repaired"],
+                repair_failed=counts["repair_failed"],
+                auto_fix_rate=counts["auto_fixed"] / checked if checked else 0.0,
+                repair_rate=counts["needs_repair"] / checked if checked else 0.0,
+                rules={
+                    name.removeprefix("rule:"): count
+                    for name, count in sorted(counts.items())
+                    if name.startswith("rule:")
+                },
+            ))
+        return stats
+
+
+@lru_cache(maxsize=1)
+def get_repair_metrics() -> RepairMetrics:
+    """Get the process-wide repair metrics."""
+    return RepairMetrics()
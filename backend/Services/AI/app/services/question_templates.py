@@ -0,0 +1,384 @@
+"""
+Local instantiation of parametric question templates.
+
+A template (see `QuestionTemplate`) is generated by the model once. After
+that, any number of variants are produced here with no model call: typed
+variables are sampled, constraints are checked, and the correct answer and
+distractors are computed from their formulas.
+
+Formulas and constraints are a small arithmetic language parsed with `ast`
+and compiled into closures once per template. Only numbers, template
+variables, arithmetic and comparison operators, `and`/`or`/`not`,
+conditional expressions and a few functions (abs, min, max, round, gcd,
+sqrt) are accepted; anything else is rejected, so model output is never
+passed to `eval`.
+
+Templates also arrive from clients (`/questions/templates/instantiate`), so
+evaluation is bounded: expressions are limited in length and nesting depth,
+arithmetic only accepts numbers, and every intermediate result larger than
+`MAX_MAGNITUDE` (or not a finite real number) discards the sample. Each
+operation therefore works on bounded operands, and the number of samples
+per request is capped.
+"""
+
+import ast
+import math
+import operator
+import random
+import re
+from typing import Any, Callable, Mapping, Optional
+
+from app.models.enums import QuestionType
+from app.schemas import QuestionTemplate, TemplateVariable
+
+Expression = Callable[[Mapping[str, Any]], Any]
+
+# Question types a template can produce
+TEMPLATE_QUESTION_TYPES = (QuestionType.SELECT, QuestionType.FILL_IN_BLANK)
+
+# Largest absolute value of a variable, constant or intermediate result
+MAX_MAGNITUDE = 10**15
+_MAX_EXPRESSION_LENGTH = 200
+_MAX_EXPRESSION_DEPTH = 10
+_MAX_EXPONENT = 12
+# Sampling attempts per requested variant before giving up on more distinct ones, and per request
+_ATTEMPTS_PER_VARIANT = 50
+_MAX_ATTEMPTS = 50_000
+_SELECT_OPTIONS = 4
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class TemplateError(ValueError):
+    """A template that cannot be compiled or instantiated."""
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _bounded(value: Any) -> Any:
+    """`value` if it is a finite real number within MAX_MAGNITUDE; raises ArithmeticError otherwise."""
+    if not _is_number(value):
+        raise ArithmeticError(f"non-numeric result {type(value).__name__}")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ArithmeticError("non-finite result")
+    if abs(value) > MAX_MAGNITUDE:
+        raise ArithmeticError("result too large")
+    return value
+
+
+def _power(base: Any, exponent: Any) -> Any:
+    if abs(exponent) > _MAX_EXPONENT:
+        raise ArithmeticError("exponent too large")
+    return base ** exponent
+
+
+def _numeric(function: Callable[..., Any]) -> Callable[..., Any]:
+    """`function` restricted to numeric arguments, with its result bounded."""
+    def apply(*arguments: Any) -> Any:
+        if not all(_is_number(argument) for argument in arguments):
+            raise TypeError("arithmetic on a non-numeric value")
+        return _bounded(function(*arguments))
+    return apply
+
+
+_BINARY_OPERATORS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+_UNARY_OPERATORS: dict[type, Callable[[Any], Any]] = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+_COMPARISONS: dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "gcd": math.gcd,
+    "sqrt": math.sqrt,
+}
+
+
+def compile_expression(source: str, names: frozenset[str]) -> Expression:
+    """
+    Compile a template formula or constraint into a function of the variables.
+    
+    Args:
+        source: The expression, e.g. "a * b - c"
+        names: The template's variable names
+    
+    Returns:
+        A function evaluating the expression for a mapping of variable values
+    
+    Raises:
+        TemplateError: If the expression is too long, malformed or uses anything not allowed
+    """
+    if len(source) > _MAX_EXPRESSION_LENGTH:
+        raise TemplateError(f"Expression too long: {source[:40]}...")
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise TemplateError(f"Invalid expression {source!r}: {e.msg}") from e
+    return _compile_node(tree.body, names, 1)
+
+
+def _compile_node(node: ast.AST, names: frozenset[str], depth: int) -> Expression:
+    if depth > _MAX_EXPRESSION_DEPTH:
+        raise TemplateError(f"Expression nested deeper than {_MAX_EXPRESSION_DEPTH} levels")
+    
+    def compile_child(child: ast.AST) -> Expression:
+        return _compile_node(child, names, depth + 1)
+    
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        try:
+            value = _bounded(node.value)
+        except ArithmeticError as e:
+            raise TemplateError(f"Constant out of range: {ast.unparse(node)[:40]}") from e
+        return lambda env: value
+    
+    if isinstance(node, ast.Name):
+        if node.id not in names:
+            raise TemplateError(f"Unknown variable {node.id!r}")
+        name = node.id
+        return lambda env: env[name]
+    
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        binary = _numeric(_BINARY_OPERATORS[type(node.op)])
+        left, right = compile_child(node.left), compile_child(node.right)
+        return lambda env: binary(left(env), right(env))
+    
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        unary = _UNARY_OPERATORS[type(node.op)]
+        if not isinstance(node.op, ast.Not):
+            unary = _numeric(unary)
+        operand = compile_child(node.operand)
+        return lambda env: unary(operand(env))
+    
+    if isinstance(node, ast.BoolOp):
+        values = [compile_child(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda env: all(value(env) for value in values)
+        return lambda env: any(value(env) for value in values)
+    
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        operands = [compile_child(node.left), *(compile_child(c) for c in node.comparators)]
+        comparisons = [_COMPARISONS[type(op)] for op in node.ops]
+        
+        def compare(env: Mapping[str, Any]) -> bool:
+            values = [operand(env) for operand in operands]
+            return all(compare_op(a, b) for compare_op, a, b in zip(comparisons, values, values[1:]))
+        return compare
+    
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (compile_child(part) for part in (node.test, node.body, node.orelse))
+        return lambda env: body(env) if test(env) else orelse(env)
+    
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _FUNCTIONS
+        and not node.keywords
+    ):
+        function = _numeric(_FUNCTIONS[node.func.id])
+        arguments = [compile_child(argument) for argument in node.args]
+        return lambda env: function(*(argument(env) for argument in arguments))
+    
+    raise TemplateError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+class CompiledTemplate:
+    """A template with its formulas compiled, ready to instantiate variants."""
+    
+    def __init__(self, template: QuestionTemplate) -> None:
+        if template.question_type not in TEMPLATE_QUESTION_TYPES:
+            raise TemplateError(f"Templates cannot produce {template.question_type.value} questions")
+        names = frozenset(variable.name for variable in template.variables)
+        if len(names) != len(template.variables):
+            raise TemplateError("Duplicate variable names")
+        missing = names - set(_PLACEHOLDER.findall(template.content))
+        if missing:
+            raise TemplateError(f"Variables not used in the question text: {', '.join(sorted(missing))}")
+        for variable in template.variables:
+            _check_variable(variable)
+        self._samplers = [(variable.name, _sampler(variable)) for variable in template.variables]
+        
+        self.template = template
+        self._constraints = [compile_expression(source, names) for source in template.constraints]
+        self._answer = compile_expression(template.answer, names)
+        self._distractors = [compile_expression(source, names) for source in template.distractors]
+        self._decimal_separator = "," if template.language == "vi" else "."
+    
+    def instantiate(self, count: int, seed: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        Sample up to `count` distinct variants.
+        
+        Fewer are returned if the variables' ranges and constraints do not
+        allow `count` distinct variants within the sampling budget.
+        
+        Args:
+            count: Number of variants wanted
+            seed: Random seed for reproducible variants
+        
+        Returns:
+            Question dicts in the public question shape
+        
+        Raises:
+            TemplateError: If no variant satisfies the constraints
+        """
+        rng = random.Random(seed)
+        variants: list[dict[str, Any]] = []
+        seen: set[tuple[Any, ...]] = set()
+        for _ in range(min(count * _ATTEMPTS_PER_VARIANT, _MAX_ATTEMPTS)):
+            if len(variants) >= count:
+                break
+            values = {name: sample(rng) for name, sample in self._samplers}
+            signature = tuple(values.values())
+            if signature in seen:
+                continue
+            seen.add(signature)
+            question = self._build(values, rng)
+            if question is not None:
+                variants.append(question)
+        
+        if not variants:
+            raise TemplateError("No variant satisfies the template's constraints")
+        return variants
+    
+    def _build(self, values: dict[str, Any], rng: random.Random) -> Optional[dict[str, Any]]:
+        """One variant for sampled values, or None if they break a constraint or a formula."""
+        try:
+            if not all(constraint(values) for constraint in self._constraints):
+                return None
+            answer_value = self._answer(values)
+            answer = self._format(answer_value)
+            wrong = [self._format(distractor(values)) for distractor in self._distractors]
+            text = {**{name: self._format(value) for name, value in values.items()}, "answer": answer}
+        except (ArithmeticError, TypeError, ValueError):
+            return None
+        
+        explanation = _fill(self.template.explanation, text) if self.template.explanation else None
+        
+        if self.template.question_type == QuestionType.FILL_IN_BLANK:
+            answers = [{"content": answer, "is_correct": True, "explanation": explanation}]
+        else:
+            options = _distinct_distractors(answer, wrong, answer_value, self._format)
+            if len(options) < _SELECT_OPTIONS - 1:
+                return None
+            answers = [{"content": answer, "is_correct": True, "explanation": explanation}] + [
+                {"content": option, "is_correct": False, "explanation": None}
+                for option in options[:_SELECT_OPTIONS - 1]
+            ]
+            rng.shuffle(answers)
+        
+        question: dict[str, Any] = {
+            "content": _fill(self.template.content, text),
+            "question_type": self.template.question_type.value,
+            "cognitive_level": self.template.cognitive_level.value,
+            "answers": answers,
+        }
+        if self.template.topic_id:
+            question["topic_id"] = self.template.topic_id
+        return question
+    
+    def _format(self, value: Any) -> str:
+        """Render a value: integral numbers without decimals, others to at most 4 places."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                raise ArithmeticError("non-finite value")
+            if value.is_integer():
+                value = int(value)
+        if isinstance(value, int):
+            return str(value)
+        return f"{value:.4f}".rstrip("0").rstrip(".").replace(".", self._decimal_separator)
+
+
+def _check_variable(variable: TemplateVariable) -> None:
+    if variable.kind == "choice":
+        if not variable.choices:
+            raise TemplateError(f"Variable {variable.name!r} has no choices")
+        for choice in map(_choice_value, variable.choices):
+            if _is_number(choice) and not isinstance(choice, bool):
+                try:
+                    _bounded(choice)
+                except ArithmeticError:
+                    raise TemplateError(
+                        f"Variable {variable.name!r} choice {choice!r} is not a finite number within {MAX_MAGNITUDE:g}"
+                    ) from None
+    elif variable.min is None or variable.max is None or variable.min > variable.max:
+        raise TemplateError(f"Variable {variable.name!r} needs a valid min/max range")
+    elif max(abs(variable.min), abs(variable.max)) > MAX_MAGNITUDE:
+        raise TemplateError(f"Variable {variable.name!r} range exceeds {MAX_MAGNITUDE:g}")
+    if variable.kind == "decimal" and variable.step and (variable.max - variable.min) / variable.step > MAX_MAGNITUDE:
+        raise TemplateError(f"Variable {variable.name!r} step is too small for its range")
+
+
+def _sampler(variable: TemplateVariable) -> Callable[[random.Random], Any]:
+    """A function drawing one value of `variable`."""
+    if variable.kind == "choice":
+        choices = [_choice_value(choice) for choice in variable.choices]
+        return lambda rng: rng.choice(choices)
+    low, high = float(variable.min), float(variable.max)
+    if variable.kind == "int":
+        start, stop, step = math.ceil(low), math.floor(high) + 1, max(1, int(variable.step or 1))
+        if start >= stop:
+            raise TemplateError(f"Variable {variable.name!r} has no integer in its range")
+        return lambda rng: rng.randrange(start, stop, step)
+    step = variable.step or 0.1
+    places = max(0, -math.floor(math.log10(step))) if step < 1 else 0
+    steps = int((high - low) / step + 1e-9)
+    return lambda rng: round(low + step * rng.randint(0, steps), places)
+
+
+def _choice_value(choice: Any) -> Any:
+    """Numeric choices as numbers (the model sends all choices as strings), others unchanged."""
+    if not isinstance(choice, str):
+        return choice
+    for parse in (int, float):
+        try:
+            return parse(choice)
+        except ValueError:
+            pass
+    return choice
+
+
+def _distinct_distractors(
+    answer: str,
+    wrong: list[str],
+    answer_value: Any,
+    render: Callable[[Any], str]
+) -> list[str]:
+    """Distinct wrong options, padded with nearby values when the formulas collide."""
+    options: list[str] = []
+    for option in wrong:
+        if option != answer and option not in options:
+            options.append(option)
+    if isinstance(answer_value, (int, float)) and not isinstance(answer_value, bool):
+        for offset in (1, -1, 2, -2, 10, -10):
+            if len(options) >= _SELECT_OPTIONS - 1:
+                break
+            option = render(answer_value + offset)
+            if option != answer and option not in options:
+                options.append(option)
+    return options
+
+
+def _fill(text: str, values: Mapping[str, str]) -> str:
+    """Replace known {name} placeholders, leaving any other braces untouched."""
+    return _PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), text)
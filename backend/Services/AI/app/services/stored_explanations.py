@@ -0,0 +1,66 @@
+"""
+Student explanations stored with generated questions.
+
+Questions generated with `student_explanations` carry a grade-appropriate
+explanation on each answer. Clients send a question's answers along with an
+`/explain` request; the student's choice is matched to one of them here and
+its stored explanation returned without a model call. Only free-text
+answers matching no option, or options without a stored explanation, are
+explained by the model.
+"""
+
+from typing import Optional, Sequence
+
+from app.schemas import Answer
+from app.services.chunking import question_fingerprint
+
+# Localized true/false labels students may send instead of the stored "True"/"False"
+_LABEL_ALIASES = {"đúng": "true", "sai": "false"}
+
+
+def _normalized(text: str) -> str:
+    fingerprint = question_fingerprint(text)
+    return _LABEL_ALIASES.get(fingerprint, fingerprint)
+
+
+def _matching_answer(answers: Sequence[Answer], text: str) -> Optional[Answer]:
+    """The answer whose normalized content equals `text`'s, if any."""
+    wanted = _normalized(text)
+    return next((answer for answer in answers if _normalized(answer.content) == wanted), None)
+
+
+def stored_explanation(
+    answers: Sequence[Answer],
+    student_answer: Optional[str] = None,
+    student_answer_index: Optional[int] = None,
+    correct_answer: Optional[str] = None
+) -> Optional[str]:
+    """
+    Stored student explanation for the answer a student gave.
+    
+    The student's option is `student_answer_index` if given, else the option
+    matching `student_answer`. Without a student answer, the correct
+    answer's explanation is used.
+    
+    Args:
+        answers: The question's stored answers
+        student_answer: The student's answer text
+        student_answer_index: Index in `answers` of the option the student chose
+        correct_answer: The correct answer text
+    
+    Returns:
+        The explanation, or None if the answer matches no option with one
+    """
+    if not answers:
+        return None
+    if student_answer_index is not None:
+        answer = answers[student_answer_index] if student_answer_index < len(answers) else None
+    elif student_answer:
+        answer = _matching_answer(answers, student_answer)
+    else:
+        answer = _matching_answer(answers, correct_answer) if correct_answer else None
+        answer = answer or next((candidate for candidate in answers if candidate.is_correct), None)
+    
+    if answer is None or not answer.student_explanation:
+        return None
+    return answer.student_explanation
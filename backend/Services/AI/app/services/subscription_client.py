@@ -4,13 +4,18 @@ This implements Backend Token Enrichment - fetching subscription data at runtime
 instead of relying on Cognito custom claims.
 """
 
+import asyncio
 import logging
-from typing import Any
+from typing import TYPE_CHECKING, Iterable
 
-import httpx
 from pydantic import BaseModel, Field
 
+from app.cache import CacheBackend, get_cache_backend
 from app.config import get_settings, Settings
+from app.http_client import http_client
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -35,12 +40,18 @@ class SubscriptionClient:
     directly from the Subscription service using the user's ID from the JWT.
     """
     
-    def __init__(self, settings: Settings) -> None:
+    _CACHE_PREFIX = "subscription:claims:"
+    
+    def __init__(self, settings: Settings, cache: CacheBackend | None = None) -> None:
         self._settings = settings
         self._base_url = settings.subscription_service_url
         self._timeout = 10.0
-        self._cache: dict[str, tuple[SubscriptionClaimsResponse, float]] = {}
+        self._cache = cache or get_cache_backend()
         self._cache_ttl = 300  # 5 minutes cache
+        self._batch_size = settings.subscription_batch_size
+        self._batch_concurrency = settings.subscription_batch_concurrency
+        # Flipped off once the Subscription service reports it has no batch endpoint
+        self._batch_supported = True
     
     async def get_subscription_claims(
         self, 
@@ -57,58 +68,208 @@ class SubscriptionClient:
         Returns:
             SubscriptionClaimsResponse with the user's subscription data
         """
-        import time
-        
-        # Check cache first
-        cached = self._cache.get(user_id)
+        # Check cache first (shared across instances when a distributed backend is configured)
+        cached = await self._cache.get(self._CACHE_PREFIX + user_id)
         if cached:
-            claims, timestamp = cached
-            if time.time() - timestamp < self._cache_ttl:
-                logger.debug(f"Using cached subscription claims for user {user_id}")
-                return claims
+            logger.debug("Using cached subscription claims for user %s", user_id)
+            return SubscriptionClaimsResponse.model_validate_json(cached)
+        
+        async with http_client() as client:
+            return await self._fetch_claims(client, user_id, auth_token)
+    
+    async def get_subscription_claims_batch(
+        self,
+        user_ids: Iterable[str],
+        auth_token: str | None = None
+    ) -> dict[str, SubscriptionClaimsResponse]:
+        """
+        Fetch subscription claims for many users at once.
+        
+        Cached users are resolved with a single multi-key cache read. The rest
+        are fetched in one round trip per `subscription_batch_size` users from
+        the batch endpoint; if the Subscription service has no batch endpoint,
+        they are fetched individually with at most `subscription_batch_concurrency`
+        requests in flight.
+        
+        Args:
+            user_ids: The users' IDs (duplicates are fetched once)
+            auth_token: Optional JWT token to pass for service-to-service auth
+            
+        Returns:
+            Mapping of user ID to SubscriptionClaimsResponse
+        """
+        unique_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+        results: dict[str, SubscriptionClaimsResponse] = {}
+        
+        cached_values = await self._cache.get_many([self._CACHE_PREFIX + user_id for user_id in unique_ids])
+        missing: list[str] = []
+        for user_id, cached in zip(unique_ids, cached_values):
+            if cached:
+                results[user_id] = SubscriptionClaimsResponse.model_validate_json(cached)
+            else:
+                missing.append(user_id)
+        
+        if not missing:
+            return results
+        
+        logger.info(
+            "Resolving subscription claims for %d users (%d cached, %d to fetch)",
+            len(unique_ids), len(results), len(missing)
+        )
+        
+        async with http_client() as client:
+            if self._batch_supported:
+                for start in range(0, len(missing), self._batch_size):
+                    fetched = await self._fetch_claims_batch(
+                        client, missing[start:start + self._batch_size], auth_token
+                    )
+                    if fetched is None:
+                        break
+                    results.update(fetched)
+            
+            remaining = [user_id for user_id in missing if user_id not in results]
+            if remaining:
+                semaphore = asyncio.Semaphore(self._batch_concurrency)
+                
+                async def fetch_one(user_id: str) -> SubscriptionClaimsResponse:
+                    async with semaphore:
+                        return await self._fetch_claims(client, user_id, auth_token)
+                
+                fetched_claims = await asyncio.gather(*(fetch_one(user_id) for user_id in remaining))
+                results.update(zip(remaining, fetched_claims))
+        
+        return results
+    
+    async def warm_cache(self, user_ids: Iterable[str], auth_token: str | None = None) -> int:
+        """
+        Pre-populate the claims cache, e.g. for a class ahead of a scheduled exam.
+        
+        Args:
+            user_ids: The users' IDs
+            auth_token: Optional JWT token to pass for service-to-service auth
+            
+        Returns:
+            Number of users whose claims are now cached; users whose fetch
+            failed (and got default claims) are not counted
+        """
+        results = await self.get_subscription_claims_batch(user_ids, auth_token)
+        # Default claims for failed fetches are never cached, so this counts only claims actually fetched
+        cached = await self._cache.get_many([self._CACHE_PREFIX + user_id for user_id in results])
+        warmed = sum(1 for value in cached if value is not None)
+        logger.info("Warmed subscription claims cache for %d of %d users", warmed, len(results))
+        return warmed
+    
+    def _headers(self, auth_token: str | None) -> dict[str, str]:
+        """Build request headers for the Subscription service."""
+        headers = {"Accept": "application/json"}
+        if auth_token:
+            headers["Authorization"] = f"Bearer {auth_token}"
+        return headers
+    
+    async def _cache_claims(self, user_id: str, claims: SubscriptionClaimsResponse) -> None:
+        """Store claims in the cache."""
+        await self._cache.set(
+            self._CACHE_PREFIX + user_id,
+            claims.model_dump_json(by_alias=True),
+            self._cache_ttl
+        )
+    
+    async def _fetch_claims_batch(
+        self,
+        client: "httpx.AsyncClient",
+        user_ids: list[str],
+        auth_token: str | None
+    ) -> dict[str, SubscriptionClaimsResponse] | None:
+        """
+        Fetch claims for several users from the batch endpoint.
+        
+        Returns:
+            The claims returned by the service, or None if the batch call
+            failed and the caller should fall back to single fetches
+        """
+        import httpx
+        
+        try:
+            response = await client.post(
+                f"{self._base_url}/claims/batch",
+                json={"userIds": user_ids},
+                timeout=self._timeout,
+                headers=self._headers(auth_token)
+            )
+            
+            if response.status_code in (404, 405, 501):
+                logger.info("Subscription service has no batch claims endpoint, using single fetches")
+                self._batch_supported = False
+                return None
+            if response.status_code != 200:
+                logger.warning("Batch subscription claims request failed. Status: %s", response.status_code)
+                return None
+            
+            # Map returned IDs back to the requested spelling (GUID casing may differ)
+            requested = {user_id.lower(): user_id for user_id in user_ids}
+            fetched: dict[str, SubscriptionClaimsResponse] = {}
+            for item in response.json():
+                claims = SubscriptionClaimsResponse(**item)
+                user_id = requested.get(claims.userId.lower(), claims.userId)
+                fetched[user_id] = claims
+            await self._cache.set_many(
+                {self._CACHE_PREFIX + user_id: claims.model_dump_json(by_alias=True) for user_id, claims in fetched.items()},
+                self._cache_ttl
+            )
+            return fetched
+            
+        except httpx.TimeoutException:
+            logger.warning("Timeout fetching subscription claims for %d users", len(user_ids))
+            return None
+        except Exception as e:
+            logger.error("Error fetching batch subscription claims: %s", e)
+            return None
+    
+    async def _fetch_claims(
+        self,
+        client: "httpx.AsyncClient",
+        user_id: str,
+        auth_token: str | None
+    ) -> SubscriptionClaimsResponse:
+        """Fetch claims for one user, returning default claims on failure."""
+        import httpx
         
         try:
-            logger.info(f"Fetching subscription claims for user {user_id} from {self._base_url}")
+            logger.debug("Fetching subscription claims for user %s from %s", user_id, self._base_url)
             
-            # Prepare headers
-            headers = {"Accept": "application/json"}
-            if auth_token:
-                headers["Authorization"] = f"Bearer {auth_token}"
+            response = await client.get(
+                f"{self._base_url}/claims/{user_id}",
+                timeout=self._timeout,
+                headers=self._headers(auth_token)
+            )
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self._base_url}/claims/{user_id}",
-                    timeout=self._timeout,
-                    headers=headers
+            if response.status_code == 200:
+                data = response.json()
+                claims = SubscriptionClaimsResponse(**data)
+                
+                # Cache the result
+                await self._cache_claims(user_id, claims)
+                
+                logger.debug(
+                    "Retrieved subscription for user %s: plan=%s, active=%s",
+                    user_id, claims.plan, claims.hasActiveSubscription
                 )
+                return claims
+            else:
+                logger.warning(
+                    "Failed to fetch subscription claims for user %s. Status: %s",
+                    user_id, response.status_code
+                )
+                return self._default_claims(user_id)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    claims = SubscriptionClaimsResponse(**data)
-                    
-                    # Cache the result
-                    self._cache[user_id] = (claims, time.time())
-                    
-                    logger.info(
-                        f"Retrieved subscription for user {user_id}: "
-                        f"plan={claims.plan}, active={claims.hasActiveSubscription}"
-                    )
-                    return claims
-                else:
-                    logger.warning(
-                        f"Failed to fetch subscription claims for user {user_id}. "
-                        f"Status: {response.status_code}"
-                    )
-                    return self._default_claims(user_id)
-                    
         except httpx.TimeoutException:
-            logger.warning(f"Timeout fetching subscription claims for user {user_id}")
+            logger.warning("Timeout fetching subscription claims for user %s", user_id)
             return self._default_claims(user_id)
         except httpx.RequestError as e:
-            logger.error(f"HTTP error fetching subscription claims: {e}")
+            logger.error("HTTP error fetching subscription claims: %s", e)
             return self._default_claims(user_id)
         except Exception as e:
-            logger.error(f"Unexpected error fetching subscription claims: {e}")
+            logger.error("Unexpected error fetching subscription claims: %s", e)
             return self._default_claims(user_id)
     
     def _default_claims(self, user_id: str) -> SubscriptionClaimsResponse:
@@ -120,7 +281,7 @@ class SubscriptionClient:
             hasActiveSubscription=False
         )
     
-    def clear_cache(self, user_id: str | None = None) -> None:
+    async def clear_cache(self, user_id: str | None = None) -> None:
         """
         Clear the subscription cache.
         
@@ -129,9 +290,9 @@ class SubscriptionClient:
                      If None, clear entire cache.
         """
         if user_id:
-            self._cache.pop(user_id, None)
+            await self._cache.delete(self._CACHE_PREFIX + user_id)
         else:
-            self._cache.clear()
+            await self._cache.clear(self._CACHE_PREFIX)
 
 
 # Global singleton instance
@@ -0,0 +1,165 @@
+"""
+Compact wire format for generated questions.
+
+Output tokens dominate generation latency, so the model is asked for a
+per-question-type shape with one-letter keys that leaves out everything the
+server already knows: the question type (for typed topics), the cognitive
+level, topic ID and point values come from the request, and fixed parts
+such as the "True"/"False" answers are filled in here. `expand_question`
+turns a compact item back into the public `Question` shape before the
+usual type-rule repair and validation.
+
+Keys:
+    q  question content          o  answer options [{c: content, e: explanation}]
+    k  correct option index (select), indices (multiple_choice) or truth value (true_false)
+    e  explanation (true_false) or grading guidance (essay)
+    r  expected-answer rubric (essay)
+    t  question type, only for mixed-type topics, whose options carry their own k
+    s  student-facing explanation, only when requested: per option, or per question (true_false)
+"""
+
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from app.models.enums import CognitiveLevel, QuestionType
+
+_OPTION_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "c": {"type": "STRING"},
+        "e": {"type": "STRING"},
+        "s": {"type": "STRING"},
+    },
+    "required": ["c"],
+}
+
+
+def _items_schema(properties: dict[str, Any], required: list[str]) -> dict[str, Any]:
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "questions": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {"q": {"type": "STRING"}, **properties},
+                    "required": ["q", *required],
+                },
+            }
+        },
+        "required": ["questions"],
+    }
+
+
+# Compact question schema per requested type; None is a mixed ("random") topic
+COMPACT_QUESTION_SCHEMAS: Mapping[Optional[QuestionType], dict[str, Any]] = MappingProxyType({
+    None: _items_schema(
+        {
+            "t": {"type": "STRING", "enum": [qt.value for qt in QuestionType]},
+            "o": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "c": {"type": "STRING"},
+                        "k": {"type": "BOOLEAN"},
+                        "e": {"type": "STRING"},
+                        "s": {"type": "STRING"},
+                    },
+                    "required": ["c", "k"],
+                },
+            },
+        },
+        ["t", "o"],
+    ),
+    QuestionType.SELECT: _items_schema(
+        {"o": {"type": "ARRAY", "items": _OPTION_SCHEMA}, "k": {"type": "INTEGER"}},
+        ["o", "k"],
+    ),
+    QuestionType.MULTIPLE_CHOICE: _items_schema(
+        {"o": {"type": "ARRAY", "items": _OPTION_SCHEMA}, "k": {"type": "ARRAY", "items": {"type": "INTEGER"}}},
+        ["o", "k"],
+    ),
+    QuestionType.TRUE_FALSE: _items_schema(
+        {"k": {"type": "BOOLEAN"}, "e": {"type": "STRING"}, "s": {"type": "STRING"}},
+        ["k"],
+    ),
+    QuestionType.ESSAY: _items_schema(
+        {"r": {"type": "STRING"}, "e": {"type": "STRING"}},
+        ["r"],
+    ),
+    QuestionType.FILL_IN_BLANK: _items_schema(
+        {"o": {"type": "ARRAY", "items": _OPTION_SCHEMA}},
+        ["o"],
+    ),
+})
+
+
+def _answer(content: Any, is_correct: bool, explanation: Any, student_explanation: Any = None) -> dict[str, Any]:
+    """One answer in the public shape; the student explanation is only set when the model wrote one."""
+    answer = {"content": content, "is_correct": is_correct, "explanation": explanation}
+    if student_explanation:
+        answer["student_explanation"] = student_explanation
+    return answer
+
+
+def _options(item: dict[str, Any], correct: set[int] | None = None) -> list[dict[str, Any]]:
+    """Expand `o` options; `correct` holds correct indices, or None if every option is correct."""
+    return [
+        _answer(option.get("c", ""), correct is None or index in correct, option.get("e"), option.get("s"))
+        for index, option in enumerate(item.get("o") or [])
+        if isinstance(option, dict)
+    ]
+
+
+def _indices(value: Any) -> set[int]:
+    values = value if isinstance(value, list) else [value]
+    return {v for v in values if isinstance(v, int) and not isinstance(v, bool)}
+
+
+def expand_question(
+    item: dict[str, Any],
+    question_type: Optional[QuestionType],
+    cognitive_level: CognitiveLevel,
+) -> dict[str, Any]:
+    """
+    Expand a compact model-output item into the public question shape.
+    
+    Args:
+        item: One entry of the compact `questions` array
+        question_type: The requested type, or None for a mixed-type topic
+        cognitive_level: The requested cognitive level (not echoed by the model)
+    
+    Returns:
+        A question dict ready for type-rule repair and validation
+    """
+    type_value = question_type.value if question_type else item.get("t", QuestionType.SELECT.value)
+    
+    if type_value == QuestionType.TRUE_FALSE.value and "o" not in item:
+        is_true = bool(item.get("k", False))
+        explanation = item.get("e")
+        # One student explanation of the statement serves either choice
+        answers = [
+            _answer("True", is_true, explanation if is_true else None, item.get("s")),
+            _answer("False", not is_true, None if is_true else explanation, item.get("s")),
+        ]
+    elif type_value == QuestionType.ESSAY.value and "o" not in item:
+        answers = [{"content": item.get("r", ""), "is_correct": True, "explanation": item.get("e")}]
+    elif question_type is None:
+        # Mixed-type topics carry correctness on each option
+        answers = [
+            _answer(option.get("c", ""), bool(option.get("k", False)), option.get("e"), option.get("s"))
+            for option in item.get("o") or []
+            if isinstance(option, dict)
+        ]
+    elif type_value == QuestionType.FILL_IN_BLANK.value:
+        answers = _options(item)
+    else:
+        answers = _options(item, _indices(item.get("k")))
+    
+    return {
+        "content": item.get("q", ""),
+        "question_type": type_value,
+        "cognitive_level": cognitive_level.value,
+        "answers": answers,
+    }
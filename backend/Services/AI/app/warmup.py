@@ -0,0 +1,117 @@
+"""
+Init-phase pre-warming and warm-up event handling.
+
+Work that would otherwise land on the first request in a new container -
+creating the Gemini client, fetching the Cognito JWKS, constructing public
+keys, importing python-jose and building request configs - is done here
+during the Lambda init phase or at ASGI startup. Every step is best-effort:
+failures are logged and the lazy code paths take over on first use.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Event sources used by scheduled warm-up pings
+_WARMUP_SOURCES = {"aws.events", "serverless-plugin-warmup"}
+
+
+def is_warmup_event(event: Any) -> bool:
+    """Check whether a Lambda event is a scheduled warm-up ping rather than an HTTP request."""
+    if not isinstance(event, dict) or "requestContext" in event:
+        return False
+    return event.get("source") in _WARMUP_SOURCES or event.get("warmup") is True
+
+
+async def _warm_jwks(settings: Settings) -> None:
+    from app.auth import get_jwks_cache
+    
+    if not settings.cognito_user_pool_id:
+        return
+    key_count = await get_jwks_cache().prefetch(settings.cognito_jwks_url)
+    logger.info(f"Pre-warmed {key_count} JWKS public keys")
+
+
+async def _warm_gemini() -> None:
+    from app.services import get_shared_gemini_service
+    
+    # Client construction and SDK import are CPU-bound; keep them off the event loop
+    await asyncio.to_thread(get_shared_gemini_service().warm_up)
+    logger.info("Pre-warmed Gemini client")
+
+
+async def _warm_crypto() -> None:
+    # Importing jose loads its crypto backend; enrichment tokens use it as well
+    from jose import jwt  # noqa: F401
+    from app.enrichment import get_enrichment_signer
+    
+    get_enrichment_signer()
+
+
+async def prewarm(settings: Settings) -> None:
+    """
+    Run all pre-warm steps concurrently, bounded by `prewarm_timeout_seconds`.
+    
+    Never raises: a failed or timed-out step only means that work happens on
+    the first request instead.
+    """
+    start = time.perf_counter()
+    steps = {
+        "jwks": _warm_jwks(settings),
+        "gemini": _warm_gemini(),
+        "crypto": _warm_crypto(),
+    }
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*steps.values(), return_exceptions=True),
+            timeout=settings.prewarm_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Pre-warm timed out after {settings.prewarm_timeout_seconds}s")
+        return
+    
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Pre-warm step '{name}' failed: {result}")
+    logger.info(f"Pre-warm finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def preload_modules() -> None:
+    """
+    Import the lazily loaded SDKs eagerly.
+    
+    Used in server mode before forking workers, so the modules are loaded
+    once in the master process and shared copy-on-write by every worker.
+    """
+    import httpx  # noqa: F401
+    from google import genai  # noqa: F401
+    from google.genai import types  # noqa: F401
+    from jose import jwt, jwk  # noqa: F401
+
+
+def prewarm_sync(settings: Settings) -> None:
+    """
+    Run `prewarm` from synchronous code (the Lambda init phase).
+    
+    The pre-warm runs on a new event loop that stays installed as the
+    thread's current loop: Mangum runs every invocation on
+    `asyncio.get_event_loop()`, which fails once `asyncio.run()` has
+    cleared the loop. Connections opened by the shared cache backend are
+    released afterwards and reopened on first use.
+    """
+    from app.cache import get_cache_backend
+    
+    async def run() -> None:
+        try:
+            await prewarm(settings)
+        finally:
+            await get_cache_backend().close()
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(run())
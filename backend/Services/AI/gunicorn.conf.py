@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for running the AI service as a long-lived server.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The same `main:app` used by the Lambda handler is served by uvicorn workers.
+The app is preloaded in the master so prompts, schemas, pydantic models and
+the SDKs are imported once and shared copy-on-write by all workers; each
+worker then runs the FastAPI lifespan to open its own connection pool,
+cache connections and Gemini client.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = int(os.environ.get("KEEPALIVE_SECONDS", 75))
+timeout = int(os.environ.get("WORKER_TIMEOUT_SECONDS", 120))
+graceful_timeout = 30
+accesslog = None
+
+
+def when_ready(server):
+    """Load the lazily imported SDKs in the master and freeze the heap before forking."""
+    from app.warmup import preload_modules
+
+    preload_modules()
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # workers do not touch (and copy) the shared pages
+    gc.freeze()
+    server.log.info("Preloaded SDKs and froze GC heap for copy-on-write sharing")
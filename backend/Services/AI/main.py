@@ -1,25 +1,58 @@
 import logging
-import sys
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import RedirectResponse, JSONResponse
-from mangum import Mangum
 
 from app.api import router
+from app.cache import get_cache_backend
 from app.config import get_settings
+from app.health import get_health_monitor
+from app.http_client import close_shared_client, open_shared_client
+from app.logging_config import configure_logging, flush_logs
+from app.middleware import PathNormalizeMiddleware, RequestLoggingMiddleware
+from app.pool_refiller import get_pool_refiller
+from app.serialization import FastJSONResponse
+from app.enrichment import ENRICHMENT_TOKEN_HEADER
+from app.warmup import is_warmup_event, prewarm, prewarm_sync
 
-# Configure logging for Lambda
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    stream=sys.stdout,
-    force=True
-)
+# Configure structured, queue-backed logging
+settings = get_settings()
+configure_logging(settings)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Server mode lifespan: open shared resources once per worker and pre-warm
+    clients and keys before serving traffic. Not used by the Lambda handler.
+    """
+    settings = get_settings()
+    await open_shared_client(settings.http_max_connections)
+    if settings.prewarm_on_init:
+        await prewarm(settings)
+    health_monitor = get_health_monitor()
+    health_monitor.start()
+    pool_refiller = get_pool_refiller()
+    if pool_refiller is not None:
+        pool_refiller.start()
+    try:
+        yield
+    finally:
+        if pool_refiller is not None:
+            await pool_refiller.stop()
+        await health_monitor.stop()
+        await close_shared_client()
+        await get_cache_backend().close()
+
+
 # Initialize FastAPI application
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     title="FrogEdu AI Service",
     description="AI-powered question generation and tutoring service",
     version="1.0.0",
@@ -30,56 +63,42 @@ app = FastAPI(
 )
 
 # Configure CORS
-settings = get_settings()
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ENRICHMENT_TOKEN_HEADER],
 )
 
+# Compress large responses (e.g. full question sets) for clients that accept gzip
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.response_compression_min_bytes,
+    compresslevel=settings.response_compression_level,
+)
 
-@app.middleware("http")
-async def fix_path_middleware(request: Request, call_next):
-    """Fix paths that come from API Gateway without leading slashes."""
-    path = request.scope.get("path", "")
-    if not path.startswith("/"):
-        request.scope["path"] = "/" + path
-    return await call_next(request)
-
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info("=" * 80)
-    logger.info(f"📥 INCOMING REQUEST: {request.method} {request.url.path}")
-    logger.info(f"   Full URL: {request.url}")
-    logger.info(f"   Headers: {dict(request.headers)}")
-    logger.info(f"   Query params: {dict(request.query_params)}")
-    logger.info("=" * 80)
-    
-    try:
-        response = await call_next(request)
-        logger.info("=" * 80)
-        logger.info(f"📤 RESPONSE: status={response.status_code}")
-        logger.info("=" * 80)
-        return response
-    except Exception as e:
-        logger.error("=" * 80)
-        logger.error(f"❌ EXCEPTION IN REQUEST PROCESSING: {e}", exc_info=True)
-        logger.error("=" * 80)
-        raise
+# Pure-ASGI middlewares; the last added runs first (logging wraps path fixing)
+app.add_middleware(PathNormalizeMiddleware)
+app.add_middleware(
+    RequestLoggingMiddleware,
+    sample_rate=settings.log_sample_rate,
+    sample_rates=settings.log_sample_rates,
+    slow_request_ms=settings.log_slow_request_ms,
+)
 
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
-    logger.error("=" * 80)
-    logger.error(f"❌ 404 NOT FOUND: {request.method} {request.url.path}")
-    logger.error(f"   Available routes:")
-    for route in app.routes:
-        if hasattr(route, 'methods') and hasattr(route, 'path'):
-            logger.error(f"      {list(route.methods)} {route.path}") # type: ignore
-    logger.error("=" * 80)
+    logger.warning("404 Not Found: %s %s", request.method, request.url.path)
+    if logger.isEnabledFor(logging.DEBUG):
+        routes = [
+            f"{sorted(route.methods)} {route.path}"  # type: ignore
+            for route in app.routes
+            if hasattr(route, 'methods') and hasattr(route, 'path')
+        ]
+        logger.debug("Available routes: %s", routes)
     return JSONResponse(
         status_code=404,
         content={"detail": "Not Found"}
@@ -90,9 +109,29 @@ app.include_router(router)
 @app.get("/", include_in_schema=False)
 async def root():
     """Redirect root to API docs."""
-    logger.info("🏠 Root endpoint hit, redirecting to docs")
     return RedirectResponse(url="/docs")
 
 
-handler = Mangum(app, lifespan="off")
-logger.info("✅ Mangum handler created successfully")
+# Lambda init phase: pre-warm before the first invocation is timed against a user
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") and settings.prewarm_on_init:
+    prewarm_sync(settings)
+
+_mangum_handler = None
+
+
+def handler(event, context):
+    """Lambda entry point; the Mangum adapter is built on the first invocation."""
+    global _mangum_handler
+    if is_warmup_event(event):
+        # Scheduled warm-up ping: keep the container alive without FastAPI routing
+        return {"statusCode": 200, "body": "warm"}
+    
+    if _mangum_handler is None:
+        from mangum import Mangum
+        _mangum_handler = Mangum(app, lifespan="off")
+        logger.info("Mangum handler created")
+    try:
+        return _mangum_handler(event, context)
+    finally:
+        # The container may be frozen as soon as we return; write out queued logs first
+        flush_logs()
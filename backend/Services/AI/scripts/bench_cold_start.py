@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark for the Lambda entry point.
+
+Each run starts a fresh interpreter, measures the init phase (`import main`)
+and the first handler invocation on a trivial route, and the script reports
+median / p90 over all runs. Pass `--baseline` to fail (exit code 1) when the
+median init duration regresses by more than `--max-regression`; use
+`--write-baseline` to record a new baseline on the reference machine.
+
+Usage (from backend/Services/AI):
+    python scripts/bench_cold_start.py --runs 20
+    python scripts/bench_cold_start.py --write-baseline cold_start_baseline.json
+    python scripts/bench_cold_start.py --baseline cold_start_baseline.json --max-regression 0.15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+# Executed in a fresh interpreter; prints {"init_ms": ..., "first_invoke_ms": ...}
+_PROBE = r'''
+import json, time
+start = time.perf_counter()
+import main
+init_done = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "$default",
+    "rawPath": "/",
+    "rawQueryString": "",
+    "headers": {"host": "localhost"},
+    "requestContext": {
+        "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "bench"},
+        "requestId": "bench", "stage": "$default", "timeEpoch": 0,
+    },
+    "isBase64Encoded": False,
+}
+class Context:
+    aws_request_id = "bench"
+    function_name = "bench"
+    def get_remaining_time_in_millis(self):
+        return 30000
+main.handler(event, Context())
+invoke_done = time.perf_counter()
+print(json.dumps({"init_ms": (init_done - start) * 1000, "first_invoke_ms": (invoke_done - init_done) * 1000}))
+'''
+
+
+def run_once() -> dict[str, float]:
+    """Measure one cold start in a fresh interpreter."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("GEMINI_API_KEY", "bench-placeholder")
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit("Cold-start probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """Median / p90 / min / max of a series in milliseconds."""
+    ordered = sorted(values)
+    return {
+        "median": statistics.median(ordered),
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Number of cold starts to measure")
+    parser.add_argument("--baseline", type=Path, help="Baseline JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="Allowed median init regression (fraction)")
+    parser.add_argument("--write-baseline", type=Path, help="Write the results to this file")
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    results = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "init_ms": summarize([s["init_ms"] for s in samples]),
+        "first_invoke_ms": summarize([s["first_invoke_ms"] for s in samples]),
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.write_baseline:
+        args.write_baseline.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        allowed = baseline["init_ms"]["median"] * (1 + args.max_regression)
+        current = results["init_ms"]["median"]
+        if current > allowed:
+            print(f"REGRESSION: median init {current:.1f} ms > allowed {allowed:.1f} ms", file=sys.stderr)
+            raise SystemExit(1)
+        print(f"OK: median init {current:.1f} ms <= allowed {allowed:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
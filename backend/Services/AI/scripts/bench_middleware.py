@@ -0,0 +1,110 @@
+"""
+Per-request middleware overhead on a trivial endpoint.
+
+Builds the same one-route FastAPI app with different middleware stacks and
+drives it directly through the ASGI interface (no sockets), so the numbers
+isolate framework and middleware cost:
+
+- none:             no middleware
+- http-decorator:   two no-op `@app.middleware("http")` functions (old main.py style)
+- base-http:        two no-op `BaseHTTPMiddleware` subclasses (old app/middleware.py style)
+- pure-asgi:        two no-op pure-ASGI middlewares
+- production:       the service's PathNormalize + RequestLogging middlewares (logging disabled)
+
+Usage (from backend/Services/AI):
+    python scripts/bench_middleware.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.middleware import PathNormalizeMiddleware, RequestLoggingMiddleware  # noqa: E402
+
+
+class NoopBaseHTTPMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        return await call_next(request)
+
+
+class NoopASGIMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "http-decorator":
+        for _ in range(2):
+            @app.middleware("http")
+            async def noop(request: Request, call_next):
+                return await call_next(request)
+    elif stack == "base-http":
+        app.add_middleware(NoopBaseHTTPMiddleware)
+        app.add_middleware(NoopBaseHTTPMiddleware)
+    elif stack == "pure-asgi":
+        app.add_middleware(NoopASGIMiddleware)
+        app.add_middleware(NoopASGIMiddleware)
+    elif stack == "production":
+        app.add_middleware(PathNormalizeMiddleware)
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+
+async def drive(app: FastAPI, requests: int) -> float:
+    """Return mean microseconds per request."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up routing and any lazily built middleware stack
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    stacks = ["none", "http-decorator", "base-http", "pure-asgi", "production"]
+    results = {stack: asyncio.run(drive(build_app(stack), args.requests)) for stack in stacks}
+
+    baseline = results["none"]
+    print(f"{'stack':<16} {'us/request':>12} {'overhead us':>12}")
+    for stack, us in results.items():
+        print(f"{stack:<16} {us:>12.1f} {us - baseline:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost and accuracy of near-duplicate detection for generated questions.
+
+Builds N distinct synthetic questions (varied templates, names and numbers)
+and a near-duplicate of every fourth one (extra punctuation, a changed word
+or reordered clauses), then adds them all to a NearDuplicateIndex in
+shuffled order, reporting:
+
+- microseconds per question (signature + comparison against the index)
+- how many near-duplicates were rejected, and how many distinct questions
+  were wrongly rejected
+
+Usage (from backend/Services/AI):
+    python scripts/bench_near_duplicates.py --questions 500 --threshold 0.85
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.near_duplicates import NearDuplicateIndex, minhash_signature  # noqa: E402
+
+_NAMES = ["An", "Bình", "Chi", "Dũng", "Hoa", "Lan", "Minh", "Nam", "Phương", "Tuấn"]
+_ITEMS = ["quả táo", "cái bút", "quyển vở", "viên bi", "bông hoa", "con tem", "chiếc kẹo"]
+_TEMPLATES = [
+    "Bạn {name} có {a} {item}, mẹ cho thêm {b} {item}. Hỏi bạn {name} có tất cả bao nhiêu {item}?",
+    "Lớp học có {a} học sinh, mỗi học sinh mang {b} {item}. Cả lớp mang bao nhiêu {item}?",
+    "Một cửa hàng bán được {a} {item} vào buổi sáng và {b} {item} vào buổi chiều. Tính tổng số {item} đã bán.",
+    "{name} chia đều {a} {item} cho {b} bạn. Mỗi bạn nhận được bao nhiêu {item} và còn dư bao nhiêu?",
+    "Which fraction is larger, {a}/{b} or {b}/{a}? Explain using a number line drawn by {name}.",
+    "A train travels {a} km in {b} hours. What is its average speed, and how far does it go in {a} hours?",
+]
+
+
+def near_duplicate(text: str, rng: random.Random) -> str:
+    """A light rewrite of `text`: punctuation, one changed word, or clause order."""
+    choice = rng.randrange(3)
+    if choice == 0:
+        return text.replace("?", " ?").replace(",", " ,") + " "
+    if choice == 1:
+        words = text.split()
+        words[rng.randrange(len(words))] = rng.choice(["nhé", "please", "bạn", "the"])
+        return " ".join(words)
+    head, _, tail = text.partition(", ")
+    return f"{tail.rstrip('?.')}, {head.lower()}?" if tail else text + "!"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    distinct: list[str] = []
+    seen: set[str] = set()
+    while len(distinct) < args.questions:
+        text = rng.choice(_TEMPLATES).format(
+            name=rng.choice(_NAMES), item=rng.choice(_ITEMS), a=rng.randint(2, 999), b=rng.randint(2, 999)
+        )
+        if text not in seen:
+            seen.add(text)
+            distinct.append(text)
+    duplicates = [near_duplicate(text, rng) for text in distinct[::4]]
+
+    # Originals first so every rewrite has something to match, then the rest shuffled
+    originals = distinct[::4]
+    rest = [(text, False) for text in distinct if text not in set(originals)] + [(text, True) for text in duplicates]
+    rng.shuffle(rest)
+    stream = [(text, False) for text in originals] + rest
+
+    minhash_signature(stream[0][0])  # exclude one-off NumPy setup from the timings
+    index = NearDuplicateIndex(args.threshold)
+    wrongly_rejected = caught = 0
+    start = time.perf_counter()
+    for text, is_duplicate in stream:
+        added = index.add(text)
+        if is_duplicate and not added:
+            caught += 1
+        elif not is_duplicate and not added:
+            wrongly_rejected += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(stream)} questions ({len(duplicates)} near-duplicates), threshold {args.threshold}")
+    print(f"us/question          {elapsed * 1e6 / len(stream):>8.1f}")
+    print(f"near-duplicates caught {caught:>6} / {len(duplicates)}")
+    print(f"distinct rejected      {wrongly_rejected:>6} / {len(distinct)}")
+
+
+if __name__ == "__main__":
+    main()
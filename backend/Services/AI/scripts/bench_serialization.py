@@ -0,0 +1,108 @@
+"""
+Serialization cost and payload size for a large GenerateQuestionsResponse.
+
+Encodes a synthetic N-question response (default 200, four answers each)
+with each strategy and reports mean time and body size, plus gzip size at
+the level the service uses:
+
+- fastapi-default:  jsonable_encoder + json.dumps (what a returned model went through)
+- orjson-encoder:   jsonable_encoder + orjson (FastJSONResponse on unconverted routes)
+- model-json:       model_dump_json (model_response, JSON)
+- msgpack:          model_dump + msgpack (model_response, Accept: application/msgpack)
+
+Also compares parsing the raw model output with json.loads and orjson.
+
+Usage (from backend/Services/AI):
+    python scripts/bench_serialization.py --questions 200 --iterations 500
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import msgpack  # noqa: E402
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.schemas import Answer, GenerateQuestionsResponse, Question  # noqa: E402
+from app.models.enums import CognitiveLevel, QuestionType  # noqa: E402
+
+
+def build_response(count: int) -> GenerateQuestionsResponse:
+    questions = [
+        Question(
+            content=f"Câu {i + 1}: Một cửa hàng có {i + 12} quả táo, bán đi {i % 7 + 3} quả. Hỏi còn lại bao nhiêu quả táo?",
+            question_type=QuestionType.SELECT,
+            cognitive_level=CognitiveLevel.APPLY,
+            point=1.0,
+            topic_id="3fa85f64-5717-4562-b3fc-2c963f66afa6",
+            answers=[
+                Answer(
+                    content=f"{i + 9 - j} quả",
+                    is_correct=j == 0,
+                    explanation="Lấy số táo ban đầu trừ đi số táo đã bán." if j == 0 else "Chưa đúng, hãy thử lại phép trừ.",
+                    point=1.0 if j == 0 else 0.0,
+                )
+                for j in range(4)
+            ],
+        )
+        for i in range(count)
+    ]
+    return GenerateQuestionsResponse(questions=questions, total_count=count)
+
+
+def timeit(fn: Callable[[], Any], iterations: int) -> float:
+    """Return mean microseconds per call."""
+    for _ in range(min(20, iterations)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    level = get_settings().response_compression_level
+    model = build_response(args.questions)
+
+    encoders: dict[str, Callable[[], bytes]] = {
+        "fastapi-default": lambda: json.dumps(
+            jsonable_encoder(model), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8"),
+        "orjson-encoder": lambda: orjson.dumps(jsonable_encoder(model)),
+        "model-json": lambda: model.model_dump_json().encode("utf-8"),
+        "msgpack": lambda: msgpack.packb(model.model_dump(mode="json"), use_bin_type=True),
+    }
+
+    print(f"{args.questions} questions, gzip level {level}")
+    print(f"{'encoder':<16} {'us/encode':>10} {'bytes':>9} {'gzip bytes':>11} {'us/gzip':>9}")
+    for name, encode in encoders.items():
+        body = encode()
+        compressed = gzip.compress(body, compresslevel=level)
+        print(
+            f"{name:<16} {timeit(encode, args.iterations):>10.0f} {len(body):>9} "
+            f"{len(compressed):>11} {timeit(lambda: gzip.compress(body, compresslevel=level), args.iterations):>9.0f}"
+        )
+
+    # Model output as Gemini returns it: {"questions": [...]} without topic_id
+    raw = json.dumps({"questions": [q.model_dump(mode="json", exclude={"topic_id"}) for q in model.questions]})
+    print()
+    print(f"{'parser':<16} {'us/parse':>10}")
+    print(f"{'json.loads':<16} {timeit(lambda: json.loads(raw), args.iterations):>10.0f}")
+    print(f"{'orjson.loads':<16} {timeit(lambda: orjson.loads(raw), args.iterations):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cost of turning repaired model output into Question models.
+
+Builds N synthetic question dicts (the shape `apply_rules` returns)
+and times each strategy over the whole batch:
+
+- per-item:   Question(**q) in a Python loop (previous generate_questions)
+- adapter:    one TypeAdapter(list[Question]).validate_python call
+- construct:  Question.model_construct / Answer.model_construct with no validation
+
+`construct` is the would-be "trusted" path that skips validation for model
+output already constrained by the response schema. It is kept here to show
+that it is slower than pydantic-core validating the batch, which is why
+generate_questions has no unvalidated fast path.
+
+Each round gets a fresh deep copy of the input so no strategy benefits from
+objects built by another.
+
+Usage (from backend/Services/AI):
+    python scripts/bench_validation.py --questions 5000 --rounds 5
+"""
+
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.schemas import Answer, Question  # noqa: E402
+from app.models.enums import CognitiveLevel, QuestionType  # noqa: E402
+from app.services.gemini_service import _question_list_adapter, build_questions  # noqa: E402
+
+
+def synthetic_questions(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "content": f"Question {i}: what is {i} + {i % 9}?",
+            "question_type": "select",
+            "cognitive_level": ["remember", "understand", "apply", "analyze"][i % 4],
+            "point": 1.0,
+            "topic_id": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+            "answers": [
+                {
+                    "content": str(i + i % 9 + j),
+                    "is_correct": j == 0,
+                    "explanation": "Add the two numbers." if j == 0 else "Check the sum again.",
+                    "point": 1.0 if j == 0 else 0.0,
+                }
+                for j in range(4)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def construct(batch: list[dict[str, Any]]) -> list[Question]:
+    return [
+        Question.model_construct(**{
+            **q,
+            "question_type": QuestionType(q["question_type"]),
+            "cognitive_level": CognitiveLevel(q["cognitive_level"]),
+            "answers": [Answer.model_construct(**a) for a in q["answers"]],
+        })
+        for q in batch
+    ]
+
+
+def run(strategy: Callable[[list[dict[str, Any]]], list[Question]], data: list[dict[str, Any]], rounds: int) -> float:
+    """Return mean milliseconds per batch."""
+    total = 0.0
+    for _ in range(rounds):
+        batch = copy.deepcopy(data)
+        start = time.perf_counter()
+        strategy(batch)
+        total += time.perf_counter() - start
+    return total / rounds * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    data = synthetic_questions(args.questions)
+    _question_list_adapter()  # exclude one-off schema compilation from the timings
+
+    strategies: dict[str, Callable[[list[dict[str, Any]]], list[Question]]] = {
+        "per-item": lambda batch: [Question(**q) for q in batch],
+        "adapter": lambda batch: build_questions(batch),
+        "construct": construct,
+    }
+
+    # All strategies must agree on the result
+    expected = strategies["per-item"](copy.deepcopy(data))
+    for name, strategy in strategies.items():
+        assert strategy(copy.deepcopy(data)) == expected, f"{name} produced different questions"
+
+    baseline = None
+    print(f"{args.questions} questions, {args.rounds} rounds")
+    print(f"{'strategy':<10} {'ms/batch':>10} {'us/question':>12} {'speedup':>8}")
+    for name, strategy in strategies.items():
+        ms = run(strategy, data, args.rounds)
+        baseline = baseline or ms
+        print(f"{name:<10} {ms:>10.1f} {ms * 1000 / args.questions:>12.2f} {baseline / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Load test comparing the Lambda (Mangum) and server (gunicorn + uvicorn) runtimes.
+
+Server mode drives a running server over HTTP with N concurrent clients:
+
+    gunicorn -c gunicorn.conf.py main:app &
+    python scripts/load_test.py server --url http://localhost:8000/ --concurrency 32 --duration 20
+
+Lambda mode invokes `main.handler` in-process with API Gateway v2 events,
+one request at a time, which is how a single Lambda container serves traffic:
+
+    python scripts/load_test.py lambda --path / --requests 500
+
+Both modes print the same JSON summary (throughput and latency percentiles)
+so the results can be compared directly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+
+def summarize(mode: str, latencies_ms: list[float], errors: int, elapsed_s: float) -> dict:
+    """Throughput and latency percentiles for one run."""
+    ordered = sorted(latencies_ms) or [0.0]
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    return {
+        "mode": mode,
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "elapsed_s": round(elapsed_s, 3),
+        "throughput_rps": round(len(latencies_ms) / elapsed_s, 1) if elapsed_s else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered), 2),
+            "p50": round(percentile(0.50), 2),
+            "p90": round(percentile(0.90), 2),
+            "p99": round(percentile(0.99), 2),
+            "max": round(ordered[-1], 2),
+        },
+    }
+
+
+async def run_server(url: str, concurrency: int, duration: float, headers: dict[str, str]) -> dict:
+    """Hammer a running server with `concurrency` clients for `duration` seconds."""
+    import httpx
+
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, follow_redirects=False, timeout=30.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize("server", latencies, errors, elapsed)
+
+
+def run_lambda(path: str, requests: int, headers: dict[str, str]) -> dict:
+    """Invoke the Lambda handler in-process, sequentially, like one warm container."""
+    sys.path.insert(0, str(SERVICE_ROOT))
+    os.chdir(SERVICE_ROOT)
+    os.environ.setdefault("GEMINI_API_KEY", "load-test-placeholder")
+    import main
+
+    class Context:
+        aws_request_id = "load-test"
+        function_name = "load-test"
+
+        def get_remaining_time_in_millis(self) -> int:
+            return 30000
+
+    def event() -> dict:
+        return {
+            "version": "2.0",
+            "routeKey": "$default",
+            "rawPath": path,
+            "rawQueryString": "",
+            "headers": {"host": "localhost", **{k.lower(): v for k, v in headers.items()}},
+            "requestContext": {
+                "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "load-test"},
+                "requestId": "load-test", "stage": "$default", "timeEpoch": 0,
+            },
+            "isBase64Encoded": False,
+        }
+
+    latencies: list[float] = []
+    errors = 0
+    context = Context()
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        response = main.handler(event(), context)
+        if response.get("statusCode", 500) >= 500:
+            errors += 1
+        latencies.append((time.perf_counter() - request_start) * 1000)
+    return summarize("lambda", latencies, errors, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["server", "lambda"])
+    parser.add_argument("--url", default="http://localhost:8000/", help="Server mode: URL to request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Server mode: concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Server mode: seconds to run")
+    parser.add_argument("--path", default="/", help="Lambda mode: request path")
+    parser.add_argument("--requests", type=int, default=200, help="Lambda mode: number of invocations")
+    parser.add_argument("--header", action="append", default=[], help="Extra header as Name:Value")
+    args = parser.parse_args()
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    if args.mode == "server":
+        result = asyncio.run(run_server(args.url, args.concurrency, args.duration, headers))
+    else:
+        result = run_lambda(args.path, args.requests, headers)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Per-module import-time breakdown for the Lambda entry point.
+
+Runs a fresh interpreter with `python -X importtime -c "import main"` and
+reports the slowest modules (self and cumulative time) plus a rollup per
+top-level package, so heavy SDKs that leak onto the cold-start path are
+easy to spot.
+
+Usage (from backend/Services/AI):
+    python scripts/profile_imports.py
+    python scripts/profile_imports.py --module app.api --top 30 --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_importtime(module: str) -> list[tuple[str, int, int]]:
+    """Import `module` in a fresh interpreter and return (name, self_us, cumulative_us) rows."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("GEMINI_API_KEY", "profile-placeholder")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    rows: list[tuple[str, int, int]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules to list")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable JSON")
+    args = parser.parse_args()
+
+    rows = run_importtime(args.module)
+    total_us = next((cumulative for name, _, cumulative in reversed(rows) if name == args.module), 0)
+
+    by_package: dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    by_self = sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]
+    by_cumulative = sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "total_ms": total_us / 1000,
+            "modules_imported": len(rows),
+            "packages_ms": {name: us / 1000 for name, us in packages},
+            "top_self_ms": {name: us / 1000 for name, us, _ in by_self},
+            "top_cumulative_ms": {name: us / 1000 for name, _, us in by_cumulative},
+        }, indent=2))
+        return
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms across {len(rows)} modules\n")
+    print(f"{'package':<40} {'self ms':>10}")
+    for name, us in packages:
+        print(f"{name:<40} {us / 1000:>10.1f}")
+    print(f"\n{'module (cumulative)':<60} {'ms':>10}")
+    for name, _, us in by_cumulative:
+        print(f"{name:<60} {us / 1000:>10.1f}")
+    print(f"\n{'module (self)':<60} {'ms':>10}")
+    for name, us, _ in by_self:
+        print(f"{name:<60} {us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Output tokens and latency saved per question type by the compact wire format.
+
+For each question type the example question from the verbose prompt
+instructions is rendered both as the verbose model output (the public
+Question keys) and in the compact wire format, and the output tokens of each
+are compared. Compact true_false output explains only the correct answer,
+so a same-content column also compares against the verbose output without
+the explanations the compact format drops.
+Latency saved is estimated as tokens saved x per-token decode time.
+
+Token counts:
+- estimate (default, offline): ~4 UTF-8 bytes per token
+- api: Gemini count_tokens (needs GEMINI_API_KEY)
+
+With --live N, each type is also generated N times in both formats against
+the real API, reporting mean candidate tokens and wall-clock latency.
+
+Usage (from backend/Services/AI):
+    python scripts/report_wire_format.py
+    python scripts/report_wire_format.py --tokens api --live 3
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import get_settings  # noqa: E402
+from app.models.enums import CognitiveLevel, QuestionType  # noqa: E402
+from app.services.prompts import QUESTION_TYPE_INSTRUCTIONS  # noqa: E402
+from app.services.wire_format import expand_question  # noqa: E402
+
+
+def compact_item(verbose: dict, question_type: QuestionType) -> dict:
+    """The compact wire-format item for a verbose model-output item (see app/services/wire_format.py)."""
+    answers = verbose["answers"]
+    if question_type == QuestionType.TRUE_FALSE:
+        correct = next(answer for answer in answers if answer["is_correct"])
+        return {"q": verbose["content"], "k": correct["content"] == "True", "e": correct["explanation"]}
+    if question_type == QuestionType.ESSAY:
+        return {"q": verbose["content"], "r": answers[0]["content"], "e": answers[0]["explanation"]}
+    item = {"q": verbose["content"], "o": [{"c": answer["content"], "e": answer["explanation"]} for answer in answers]}
+    correct_indices = [index for index, answer in enumerate(answers) if answer["is_correct"]]
+    if question_type == QuestionType.SELECT:
+        item["k"] = correct_indices[0]
+    elif question_type == QuestionType.MULTIPLE_CHOICE:
+        item["k"] = correct_indices
+    return item
+
+
+def example_items(question_type: QuestionType) -> tuple[dict, dict, dict]:
+    """
+    Return (verbose, same-content verbose, compact) model-output items for the verbose prompt's example.
+    
+    The verbose item is the example as the verbose prompt shows it, plus the
+    cognitive level its schema requires; the compact item carries the same
+    question. The compact format drops content for true_false (only the
+    correct answer is explained), so the same-content item is the compact
+    item expanded back into the verbose keys, for a like-for-like comparison.
+    """
+    instruction = QUESTION_TYPE_INSTRUCTIONS[question_type]
+    example = json.loads(re.search(r"Example output:\n(\{.*\})", instruction, re.DOTALL).group(1))
+    verbose = {**example, "cognitive_level": CognitiveLevel.UNDERSTAND.value}
+    compact = compact_item(example, question_type)
+    expanded = expand_question(dict(compact), question_type, CognitiveLevel.UNDERSTAND)
+    same_content = {
+        **{key: expanded[key] for key in example if key != "answers"},
+        "answers": [
+            {key: value for key, value in answer.items() if value is not None}
+            for answer in expanded["answers"]
+        ],
+        "cognitive_level": expanded["cognitive_level"],
+    }
+    return verbose, same_content, compact
+
+
+def token_counter(mode: str) -> Callable[[str], int]:
+    if mode == "estimate":
+        return lambda text: max(1, round(len(text.encode("utf-8")) / 4))
+
+    from app.services import get_shared_gemini_service
+
+    service = get_shared_gemini_service()
+    return lambda text: service.client.models.count_tokens(model=service.model_name, contents=text).total_tokens
+
+
+def live_run(question_type: QuestionType, compact: bool, runs: int) -> tuple[float, float]:
+    """Return (mean candidate tokens per question, mean latency ms per call)."""
+    from app.schemas import GenerateSingleQuestionRequest
+    from app.services import GeminiService
+    from app.services.generation_registry import get_generation_registry
+    from app.services.prompts import build_single_question_prompt
+
+    service = GeminiService(get_settings())
+    request = GenerateSingleQuestionRequest(
+        subject="Mathematics",
+        grade=4,
+        topic_name="Fractions",
+        cognitive_level=CognitiveLevel.UNDERSTAND,
+        question_type=question_type,
+        language="vi",
+    )
+    prompt = build_single_question_prompt(request, compact=compact)
+    config = get_generation_registry().question_config(question_type, compact)
+
+    tokens, latencies = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = service.client.models.generate_content(model=service.model_name, contents=prompt, config=config)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens.append(response.usage_metadata.candidates_token_count or 0)
+    return statistics.mean(tokens), statistics.mean(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", choices=["estimate", "api"], default="estimate")
+    parser.add_argument("--ms-per-token", type=float, default=4.0, help="decode time per output token")
+    parser.add_argument("--live", type=int, default=0, metavar="N", help="also generate N questions per type and format")
+    args = parser.parse_args()
+
+    count = token_counter(args.tokens)
+    print(f"Output tokens per question ({args.tokens}), latency at {args.ms_per_token} ms/token")
+    print("(same content: the verbose output limited to what the compact output carries)")
+    print(
+        f"{'type':<16} {'verbose':>8} {'compact':>8} {'saved':>6} {'saved %':>8} {'~ms saved':>10} "
+        f"{'same content':>13} {'saved %':>8}"
+    )
+    for question_type in QuestionType:
+        verbose, same_content, compact = example_items(question_type)
+        verbose_tokens = count(json.dumps(verbose, ensure_ascii=False))
+        same_tokens = count(json.dumps(same_content, ensure_ascii=False))
+        compact_tokens = count(json.dumps(compact, ensure_ascii=False))
+        saved = verbose_tokens - compact_tokens
+        print(
+            f"{question_type.value:<16} {verbose_tokens:>8} {compact_tokens:>8} {saved:>6} "
+            f"{saved / verbose_tokens:>8.0%} {saved * args.ms_per_token:>10.0f} "
+            f"{same_tokens:>13} {(same_tokens - compact_tokens) / same_tokens:>8.0%}"
+        )
+
+    if args.live:
+        print()
+        print(f"Live generation, {args.live} runs per type and format (single-question endpoint)")
+        print(f"{'type':<16} {'tok verbose':>11} {'tok compact':>11} {'ms verbose':>11} {'ms compact':>11}")
+        for question_type in QuestionType:
+            verbose_tokens, verbose_ms = live_run(question_type, False, args.live)
+            compact_tokens, compact_ms = live_run(question_type, True, args.live)
+            print(
+                f"{question_type.value:<16} {verbose_tokens:>11.0f} {compact_tokens:>11.0f} "
+                f"{verbose_ms:>11.0f} {compact_ms:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Shared test setup.
+
+Tests import the service from its root (like `main.py` does) with settings
+that need no external services: a dummy Gemini key and no question pool.
+
+Run from backend/Services/AI:
+    pip install -r requirement.txt -r requirement-dev.txt
+    python -m pytest -q
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("QUESTION_POOL_ENABLED", "false")
@@ -0,0 +1,59 @@
+"""
+Fake Gemini client shared by the service tests.
+
+`make_service` returns a GeminiService whose async client replies with
+queued response texts and whose blocking client fails the test if used.
+"""
+
+from types import SimpleNamespace
+
+from app.config import Settings
+from app.services.gemini_service import GeminiService
+
+
+class FakeModels:
+    """Async stand-in for `client.aio.models`, replying with queued texts."""
+    
+    def __init__(self, *replies: str) -> None:
+        self.replies = list(replies)
+        self.prompts: list[str] = []
+    
+    async def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        return SimpleNamespace(text=self.replies.pop(0))
+
+
+def blocking_call(*args, **kwargs):
+    raise AssertionError("the blocking client must not be used from async code")
+
+
+def make_service(*replies: str, **settings) -> tuple[GeminiService, FakeModels]:
+    service = GeminiService(Settings(**{
+        "gemini_api_key": "test-key",
+        "question_pool_enabled": False,
+        "compact_output_schema": False,
+        **settings,
+    }))
+    models = FakeModels(*replies)
+    service._client = SimpleNamespace(
+        aio=SimpleNamespace(models=models),
+        models=SimpleNamespace(generate_content=blocking_call)
+    )
+    return service, models
+
+
+def select_question(content: str, student_explanations: bool = False) -> dict:
+    """A verbose `select` question dict whose correct answer is "4"."""
+    return {
+        "content": content,
+        "question_type": "select",
+        "cognitive_level": "remember",
+        "answers": [
+            {
+                "content": text,
+                "is_correct": text == "4",
+                "student_explanation": f"Em chọn {text}" if student_explanations else None,
+            }
+            for text in ("4", "5")
+        ],
+    }
@@ -0,0 +1,172 @@
+import time
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.auth import TokenUser, requires
+from app.config import Settings
+from app.enrichment import ENRICHMENT_TOKEN_HEADER, EnrichmentTokenSigner
+from app.services.subscription_client import SubscriptionClaimsResponse
+
+PRO_CLAIMS = {"plan": "pro", "expires_at": 4_000_000_000, "has_active_subscription": True}
+
+
+def make_signer(**settings) -> EnrichmentTokenSigner:
+    values = {"enrichment_token_keys": {"k1": "secret-1", "k2": "secret-2"}, "enrichment_token_active_kid": "k1"}
+    return EnrichmentTokenSigner(Settings(gemini_api_key="test-key", **{**values, **settings}))
+
+
+def test_enrichment_token_round_trip():
+    signer = make_signer()
+    token = signer.issue("user-1", {**PRO_CLAIMS, "extra": "dropped"})
+    assert signer.verify(token, "user-1") == PRO_CLAIMS
+
+
+def test_enrichment_token_is_bound_to_its_subject():
+    signer = make_signer()
+    assert signer.verify(signer.issue("user-1", PRO_CLAIMS), "user-2") is None
+
+
+def test_expired_enrichment_token(monkeypatch):
+    signer = make_signer(enrichment_token_ttl_seconds=60)
+    issued_at = time.time() - 120
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: issued_at)
+        token = signer.issue("user-1", PRO_CLAIMS)
+    assert signer.verify(token, "user-1") is None
+
+
+def test_tampered_or_malformed_enrichment_token():
+    signer = make_signer()
+    header, payload, signature = signer.issue("user-1", PRO_CLAIMS).split(".")
+    flipped = signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")
+    assert signer.verify(f"{header}.{payload}.{flipped}", "user-1") is None
+    forged = make_signer(enrichment_token_keys={"k1": "guessed"}).issue("user-1", PRO_CLAIMS)
+    assert signer.verify(forged, "user-1") is None
+    for token in ("", "garbage", "a.b.c", "é.é.é"):
+        assert signer.verify(token, "user-1") is None
+
+
+def test_enrichment_key_rotation():
+    old = make_signer()
+    rotated = make_signer(enrichment_token_active_kid="k2")
+    token = old.issue("user-1", PRO_CLAIMS)
+    assert rotated.verify(token, "user-1") == PRO_CLAIMS
+    retired = make_signer(enrichment_token_keys={"k2": "secret-2"}, enrichment_token_active_kid="k2")
+    assert retired.verify(token, "user-1") is None
+
+
+def test_signer_disabled_without_usable_key():
+    assert not make_signer(enrichment_token_keys={}, enrichment_token_active_kid="").enabled
+    assert not make_signer(enrichment_token_keys={}).enabled
+    assert not make_signer(enrichment_token_active_kid="missing").enabled
+    assert not make_signer(enrichment_token_ttl_seconds=0).enabled
+    assert make_signer(enrichment_token_keys={}).issue("user-1", PRO_CLAIMS) is None
+
+
+class FakeSubscriptionClient:
+    """Counts Subscription service lookups."""
+    
+    def __init__(self, plan: str = "pro") -> None:
+        self.calls = 0
+        self.plan = plan
+    
+    async def get_subscription_claims(self, user_id: str, auth_token: str | None = None) -> SubscriptionClaimsResponse:
+        self.calls += 1
+        return SubscriptionClaimsResponse(
+            userId=user_id, plan=self.plan, expiresAt=PRO_CLAIMS["expires_at"], hasActiveSubscription=True
+        )
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """requires() with JWT validation stubbed: the bearer token is '<sub>:<role>'."""
+    signer = make_signer()
+    subscriptions = FakeSubscriptionClient()
+    
+    async def authenticate_token(token: str, settings: Settings) -> TokenUser:
+        if ":" not in token:
+            raise auth.HTTPException(status_code=401, detail="Invalid token")
+        sub, role = token.split(":")
+        return TokenUser(sub=sub, user_id=sub, role=role or None)
+    
+    monkeypatch.setattr(auth, "authenticate_token", authenticate_token)
+    monkeypatch.setattr(auth, "get_enrichment_signer", lambda: signer)
+    monkeypatch.setattr(auth, "get_subscription_client", lambda: subscriptions)
+    
+    app = FastAPI()
+    
+    @app.get("/teacher")
+    async def teacher(user: Annotated[TokenUser, Depends(requires(roles=["Teacher"]))]):
+        return {"sub": user.sub, "plan": user.subscription.plan}
+    
+    @app.get("/pro")
+    async def pro(user: Annotated[TokenUser, Depends(requires(roles=["teacher"], subscription=True))]):
+        return {"sub": user.sub, "plan": user.subscription.plan}
+    
+    return TestClient(app), signer, subscriptions
+
+
+def bearer(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_requires_authentication(env):
+    client, _, _ = env
+    assert client.get("/teacher").status_code == 401
+    assert client.get("/teacher", headers=bearer("bad")).status_code == 401
+
+
+def test_role_is_checked_before_subscription_lookup(env):
+    client, _, subscriptions = env
+    assert client.get("/pro", headers=bearer("u1:student")).status_code == 403
+    assert subscriptions.calls == 0
+    # Role-only routes never contact the Subscription service
+    assert client.get("/teacher", headers=bearer("u1:TEACHER")).json() == {"sub": "u1", "plan": "free"}
+    assert subscriptions.calls == 0
+
+
+def test_subscription_lookup_issues_enrichment_token(env):
+    client, signer, subscriptions = env
+    response = client.get("/pro", headers=bearer("u1:teacher"))
+    assert response.json() == {"sub": "u1", "plan": "pro"}
+    assert subscriptions.calls == 1
+    assert signer.verify(response.headers[ENRICHMENT_TOKEN_HEADER], "u1")["plan"] == "pro"
+
+
+def test_valid_enrichment_token_skips_subscription_lookup(env):
+    client, signer, subscriptions = env
+    token = signer.issue("u1", PRO_CLAIMS)
+    response = client.get("/pro", headers={**bearer("u1:teacher"), ENRICHMENT_TOKEN_HEADER: token})
+    assert response.json() == {"sub": "u1", "plan": "pro"}
+    assert subscriptions.calls == 0
+    assert ENRICHMENT_TOKEN_HEADER not in response.headers
+
+
+@pytest.mark.parametrize("token", ["garbage", "other-user"])
+def test_invalid_enrichment_token_falls_back_to_lookup(env, token):
+    client, signer, subscriptions = env
+    if token == "other-user":
+        token = signer.issue("u2", PRO_CLAIMS)
+    response = client.get("/pro", headers={**bearer("u1:teacher"), ENRICHMENT_TOKEN_HEADER: token})
+    assert response.status_code == 200
+    assert subscriptions.calls == 1
+
+
+def test_free_plan_is_rejected(env):
+    client, _, subscriptions = env
+    subscriptions.plan = "free"
+    assert client.get("/pro", headers=bearer("u1:teacher")).status_code == 403
+    free = make_signer().issue("u1", {**PRO_CLAIMS, "plan": "free"})
+    response = client.get("/pro", headers={**bearer("u1:teacher"), ENRICHMENT_TOKEN_HEADER: free})
+    assert response.status_code == 403
+    assert subscriptions.calls == 1
+
+
+def test_requirements_are_exposed():
+    dependency = requires(roles=["Teacher", "ADMIN"], subscription=True)
+    assert dependency.requirements.roles == frozenset({"teacher", "admin"})
+    assert dependency.requirements.subscription
@@ -0,0 +1,189 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app import cache
+from app.cache import CacheBackend, InMemoryCacheBackend, RedisCacheBackend, create_cache_backend
+from app.config import Settings
+
+
+class FakeClock:
+    """Replaces time.monotonic in app.cache so in-memory TTLs expire without sleeping."""
+    
+    def __init__(self) -> None:
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", fake.monotonic)
+    return fake
+
+
+@pytest.fixture
+def redis_server() -> fakeredis.FakeServer:
+    return fakeredis.FakeServer()
+
+
+def make_redis(server: fakeredis.FakeServer, key_prefix: str = "ai:") -> RedisCacheBackend:
+    backend = RedisCacheBackend("redis://localhost:6379/0", key_prefix=key_prefix)
+    backend._client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return backend
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, redis_server) -> CacheBackend:
+    if request.param == "memory":
+        return InMemoryCacheBackend()
+    return make_redis(redis_server)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_get_and_set(backend):
+    async def scenario():
+        assert await backend.get("a") is None
+        await backend.set("a", "1", 60)
+        await backend.set("b", "2", 60)
+        await backend.set("a", "3", 60)
+        return await backend.get("a"), await backend.get("b")
+    
+    assert run(scenario()) == ("3", "2")
+
+
+def test_delete(backend):
+    async def scenario():
+        await backend.set("a", "1", 60)
+        await backend.delete("a")
+        await backend.delete("missing")
+        return await backend.get("a")
+    
+    assert run(scenario()) is None
+
+
+def test_get_many_and_set_many(backend):
+    async def scenario():
+        assert await backend.get_many([]) == []
+        await backend.set_many({}, 60)
+        await backend.set_many({"a": "1", "c": "3"}, 60)
+        return await backend.get_many(["a", "b", "c", "a"])
+    
+    assert run(scenario()) == ["1", None, "3", "1"]
+
+
+def test_json_round_trip(backend):
+    async def scenario():
+        await backend.set_json("doc", {"plan": "pro", "ids": [1, 2]}, 60)
+        await backend.set("broken", "{not json", 60)
+        return await backend.get_json("doc"), await backend.get_json("broken"), await backend.get_json("missing")
+    
+    assert run(scenario()) == ({"plan": "pro", "ids": [1, 2]}, None, None)
+
+
+def test_clear_by_prefix(backend):
+    async def scenario():
+        await backend.set_many({"sub:1": "a", "sub:2": "b", "jwks:1": "c"}, 60)
+        await backend.clear("sub:")
+        after_prefix = await backend.get_many(["sub:1", "sub:2", "jwks:1"])
+        await backend.clear()
+        return after_prefix, await backend.get("jwks:1")
+    
+    assert run(scenario()) == ([None, None, "c"], None)
+
+
+def test_in_memory_ttl_expiry(clock):
+    backend = InMemoryCacheBackend()
+    
+    async def scenario():
+        await backend.set("short", "1", 10)
+        await backend.set_many({"long": "2"}, 100)
+        clock.now += 10
+        return await backend.get("short"), await backend.get_many(["short", "long"])
+    
+    assert run(scenario()) == (None, [None, "2"])
+
+
+def test_in_memory_evicts_expired_then_oldest(clock):
+    backend = InMemoryCacheBackend(max_entries=2)
+    
+    async def scenario():
+        await backend.set("expiring", "1", 1)
+        await backend.set("kept", "2", 100)
+        clock.now += 5
+        await backend.set("new", "3", 100)
+        first = await backend.get_many(["expiring", "kept", "new"])
+        await backend.set("newest", "4", 100)
+        return first, await backend.get_many(["kept", "new", "newest"])
+    
+    assert run(scenario()) == ([None, "2", "3"], [None, "3", "4"])
+
+
+def test_redis_ttl_expiry(redis_server):
+    backend = make_redis(redis_server)
+    
+    async def scenario():
+        await backend.set("short", "1", 0.05)
+        await backend.set_many({"batch": "2"}, 0.05)
+        await backend.set("long", "3", 60)
+        before = await backend.get_many(["short", "batch", "long"])
+        await asyncio.sleep(0.2)
+        return before, await backend.get_many(["short", "batch", "long"])
+    
+    assert run(scenario()) == (["1", "2", "3"], [None, None, "3"])
+
+
+def test_redis_keys_are_prefixed_and_isolated(redis_server):
+    first = make_redis(redis_server, key_prefix="one:")
+    second = make_redis(redis_server, key_prefix="two:")
+    
+    async def scenario():
+        await first.set("key", "1", 60)
+        await second.set("key", "2", 60)
+        await first.clear()
+        raw = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+        return await first.get("key"), await second.get("key"), sorted(await raw.keys("*"))
+    
+    assert run(scenario()) == (None, "2", ["two:key"])
+
+
+def test_redis_errors_are_misses(redis_server, caplog):
+    backend = make_redis(redis_server)
+    
+    async def scenario():
+        await backend.set("a", "1", 60)
+        redis_server.connected = False
+        results = (
+            await backend.get("a"),
+            await backend.get_many(["a", "b"]),
+            await backend.get_json("a"),
+            await backend.ping(),
+        )
+        await backend.set("b", "2", 60)
+        await backend.set_many({"c": "3"}, 60)
+        await backend.delete("a")
+        await backend.clear()
+        redis_server.connected = True
+        return results, await backend.get_many(["a", "b", "c"]), await backend.ping()
+    
+    assert run(scenario()) == ((None, [None, None], None, False), ["1", None, None], True)
+    assert "Cache get failed" in caplog.text
+
+
+def test_create_cache_backend():
+    def settings(**values) -> Settings:
+        return Settings(gemini_api_key="test-key", **values)
+    
+    assert isinstance(create_cache_backend(settings(cache_backend="memory")), InMemoryCacheBackend)
+    assert isinstance(create_cache_backend(settings(cache_backend="unknown")), InMemoryCacheBackend)
+    assert isinstance(create_cache_backend(settings(cache_backend="redis", cache_redis_url="")), InMemoryCacheBackend)
+    assert isinstance(
+        create_cache_backend(settings(cache_backend="Redis", cache_redis_url="redis://localhost:6379/0")),
+        RedisCacheBackend
+    )
@@ -0,0 +1,111 @@
+import pytest
+
+from app.models.enums import CognitiveLevel, QuestionType
+from app.schemas import MatrixTopicConfig
+from app.services.chunking import (
+    plan_generation,
+    question_fingerprint,
+    questions_per_call,
+    split_quantity,
+    tokens_per_question,
+)
+
+
+def topic(name: str, quantity: int, question_type: QuestionType | None = QuestionType.SELECT) -> MatrixTopicConfig:
+    return MatrixTopicConfig(
+        topic_id=name,
+        topic_name=name,
+        cognitive_level=CognitiveLevel.REMEMBER,
+        quantity=quantity,
+        question_type=question_type
+    )
+
+
+def planned_quantities(calls) -> dict[str, int]:
+    totals: dict[str, int] = {}
+    for call in calls:
+        for row in call.rows:
+            totals[row.topic.topic_id] = totals.get(row.topic.topic_id, 0) + row.topic.quantity
+    return totals
+
+
+@pytest.mark.parametrize("quantity, limit, expected", [
+    (40, 15, [14, 13, 13]),
+    (30, 15, [15, 15]),
+    (7, 10, [7]),
+    (1, 1, [1]),
+    (5, 1, [1, 1, 1, 1, 1]),
+    (0, 10, []),
+    (-3, 10, []),
+])
+def test_split_quantity(quantity, limit, expected):
+    assert split_quantity(quantity, limit) == expected
+
+
+@pytest.mark.parametrize("quantity, limit", [(101, 7), (64, 8), (13, 5), (1000, 33)])
+def test_split_quantity_is_fewest_balanced_chunks(quantity, limit):
+    chunks = split_quantity(quantity, limit)
+    assert sum(chunks) == quantity
+    assert max(chunks) <= limit
+    assert max(chunks) - min(chunks) <= 1
+    assert len(chunks) == -(-quantity // limit)
+
+
+def test_questions_per_call_fits_budget():
+    per_question = tokens_per_question(QuestionType.SELECT, compact=True)
+    count = questions_per_call(QuestionType.SELECT, True, 3000)
+    assert count * per_question <= 3000 < (count + 1) * per_question + 10
+    assert questions_per_call(QuestionType.SELECT, False, 3000) < count
+    assert questions_per_call(QuestionType.ESSAY, True, 50) == 1
+
+
+def test_large_row_is_split_into_balanced_calls_within_budget():
+    calls = plan_generation([topic("a", 60)], compact=True, token_budget=3000, max_concurrency=4, min_call_tokens=800)
+    assert len(calls) > 1
+    assert all(call.expected_tokens <= 3000 for call in calls)
+    sizes = [call.rows[0].topic.quantity for call in calls]
+    assert sum(sizes) == 60 and max(sizes) - min(sizes) <= 1
+    assert [(row.part, row.parts) for call in calls for row in call.rows] == [
+        (part, len(calls)) for part in range(1, len(calls) + 1)
+    ]
+
+
+def test_small_rows_of_one_type_share_a_call():
+    topics = [topic(f"t{index}", 1) for index in range(20)]
+    calls = plan_generation(topics, compact=True, token_budget=3000, max_concurrency=4, min_call_tokens=800)
+    # 20 x 130 tokens: 2600 tokens of output, worth 3 calls of at least 800
+    assert len(calls) == 3
+    assert all(call.packed for call in calls)
+    assert planned_quantities(calls) == {f"t{index}": 1 for index in range(20)}
+    loads = [call.expected_tokens for call in calls]
+    assert max(loads) - min(loads) <= tokens_per_question(QuestionType.SELECT, True) + 10
+
+
+def test_rows_of_different_types_are_not_packed_together():
+    topics = [topic("select", 2), topic("tf", 2, QuestionType.TRUE_FALSE), topic("mixed", 2, None), topic("select2", 2)]
+    calls = plan_generation(topics, compact=True, token_budget=3000, max_concurrency=4, min_call_tokens=800)
+    assert [call.question_type for call in calls] == [QuestionType.SELECT, QuestionType.TRUE_FALSE, None]
+    assert [row.topic.topic_id for row in calls[0].rows] == ["select", "select2"]
+    assert all(len({row.topic.question_type for row in call.rows}) == 1 for call in calls)
+
+
+def test_concurrency_caps_calls_added_for_parallelism():
+    topics = [topic(f"t{index}", 4) for index in range(10)]
+    calls = plan_generation(topics, compact=True, token_budget=100_000, max_concurrency=2, min_call_tokens=100)
+    assert len(calls) == 2
+    assert planned_quantities(calls) == {f"t{index}": 4 for index in range(10)}
+
+
+def test_bins_never_exceed_budget():
+    topics = [topic(f"t{index}", quantity) for index, quantity in enumerate([9, 1, 7, 3, 5, 2, 8, 4, 6, 10])]
+    calls = plan_generation(topics, compact=False, token_budget=2500, max_concurrency=8, min_call_tokens=400)
+    assert all(call.expected_tokens <= 2500 for call in calls)
+    assert planned_quantities(calls) == {f"t{index}": q for index, q in enumerate([9, 1, 7, 3, 5, 2, 8, 4, 6, 10])}
+    assert [(call.rows[0].index, call.rows[0].part) for call in calls] == sorted(
+        (call.rows[0].index, call.rows[0].part) for call in calls
+    )
+
+
+def test_question_fingerprint_ignores_case_and_punctuation():
+    assert question_fingerprint("  What is 2+2?  ") == question_fingerprint("what is 2 + 2")
+    assert question_fingerprint("Đúng!") == "đúng"
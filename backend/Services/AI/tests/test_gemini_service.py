@@ -0,0 +1,201 @@
+import asyncio
+import json
+
+import pytest
+
+from app.models.enums import CognitiveLevel, QuestionType
+from app.schemas import (
+    GenerateQuestionsRequest,
+    GenerateSingleQuestionRequest,
+    GradeEssayRequest,
+    MatrixTopicConfig,
+    Question,
+    RegenerateQuestionRequest,
+)
+from app.services import gemini_service
+from app.services.question_pool import PoolKey, QuestionPool
+from app.services.question_rules import get_repair_metrics
+from tests.fakes import make_service, select_question
+
+
+def test_grade_essay_uses_async_client():
+    service, models = make_service(json.dumps({"score": 12, "feedback": "Tốt"}))
+    request = GradeEssayRequest(
+        question_content="Tả con mèo",
+        grading_rubric="Đủ ý",
+        student_answer="Con mèo nhà em...",
+        max_points=10,
+        grade=3,
+        subject="Tiếng Việt"
+    )
+    result = asyncio.run(service.grade_essay(request))
+    assert (result.score, result.score_percentage, result.feedback) == (10, 100, "Tốt")
+    assert len(models.prompts) == 1
+
+
+def test_explain_question_uses_async_client():
+    service, models = make_service("Vì 2 + 2 = 4.")
+    result = asyncio.run(service.explain_question("2 + 2 = ?", "4", grade=1, subject="Toán", student_answer="5"))
+    assert (result.explanation, result.source) == ("Vì 2 + 2 = 4.", "model")
+    assert len(models.prompts) == 1
+
+
+def test_socratic_hints_use_async_client():
+    service, _ = make_service(json.dumps({"hints": ["Em đếm lại xem?"], "teaching_note": "Đếm"}))
+    result = asyncio.run(service.generate_socratic_hints("2 + 2 = ?", "5", "4", subject="Toán", grade=1))
+    assert result == {"hints": ["Em đếm lại xem?"], "teaching_note": "Đếm"}
+
+
+def test_tutor_chat_uses_async_client():
+    service, models = make_service("Chào em!")
+    assert asyncio.run(service.tutor_chat("Xin chào", subject="Toán", grade=2)) == "Chào em!"
+    assert models.prompts == ["Student asks: Xin chào"]
+
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch) -> QuestionPool:
+    """A question pool holding one pooled question for the test topic."""
+    question_pool = QuestionPool(str(tmp_path / "pool.db"))
+    monkeypatch.setattr(gemini_service, "get_question_pool", lambda settings=None: question_pool)
+    key = PoolKey.build("Toán", 1, "vi", "t1", "Phép cộng", CognitiveLevel.REMEMBER)
+    asyncio.run(question_pool.add([(key, select_question("Pooled: 2 + 2 = ?"))]))
+    yield question_pool
+    question_pool.close()
+
+
+def generated_reply() -> str:
+    return json.dumps({"questions": [select_question("Generated: 1 + 3 = ?", student_explanations=True)]})
+
+
+@pytest.mark.parametrize("student_explanations, expected", [(False, "Pooled"), (True, "Generated")])
+def test_single_question_pool_is_bypassed_for_student_explanations(pool, student_explanations, expected):
+    service, models = make_service(generated_reply())
+    request = GenerateSingleQuestionRequest(
+        subject="Toán", grade=1, topic_name="Phép cộng", topic_id="t1",
+        cognitive_level=CognitiveLevel.REMEMBER, question_type=QuestionType.SELECT,
+        student_explanations=student_explanations
+    )
+    question = asyncio.run(service.generate_single_question(request, "teacher"))
+    assert question.content.startswith(expected)
+    assert len(models.prompts) == int(student_explanations)
+    if student_explanations:
+        assert all(answer.student_explanation for answer in question.answers)
+
+
+@pytest.mark.parametrize("student_explanations, expected", [(False, "Pooled"), (True, "Generated")])
+def test_matrix_pool_is_bypassed_for_student_explanations(pool, student_explanations, expected):
+    service, models = make_service(generated_reply())
+    request = GenerateQuestionsRequest(
+        subject="Toán", grade=1, student_explanations=student_explanations,
+        matrix_topics=[MatrixTopicConfig(
+            topic_id="t1", topic_name="Phép cộng", cognitive_level=CognitiveLevel.REMEMBER,
+            quantity=1, question_type=QuestionType.SELECT
+        )]
+    )
+    result = asyncio.run(service.generate_questions(request, "teacher"))
+    assert [question.content.split(":")[0] for question in result.questions] == [expected]
+    assert result.fulfilment[0].from_pool == int(not student_explanations)
+
+
+@pytest.mark.parametrize("student_explanations, expected", [(False, "Pooled"), (True, "Generated")])
+def test_regenerate_pool_is_bypassed_for_student_explanations(pool, student_explanations, expected):
+    service, models = make_service(generated_reply())
+    request = RegenerateQuestionRequest(
+        subject="Toán", grade=1, topic_name="Phép cộng", topic_id="t1",
+        rejected=Question(**select_question("Rejected: 3 + 1 = ?")),
+        student_explanations=student_explanations
+    )
+    question = asyncio.run(service.regenerate_question(request, "teacher"))
+    assert question.content.startswith(expected)
+    assert len(models.prompts) == int(student_explanations)
+
+
+class BrokenPool:
+    """A question pool whose storage fails on every call."""
+    
+    async def take(self, requests, teacher_id=None):
+        raise OSError("database is locked")
+    
+    async def add(self, entries, teacher_id=None):
+        raise OSError("database is locked")
+    
+    def note_demand(self, demand) -> None:
+        pass
+
+
+def test_single_question_survives_pool_failures(monkeypatch, caplog):
+    monkeypatch.setattr(gemini_service, "get_question_pool", lambda settings=None: BrokenPool())
+    service, models = make_service(generated_reply())
+    request = GenerateSingleQuestionRequest(
+        subject="Toán", grade=1, topic_name="Phép cộng", topic_id="t1",
+        cognitive_level=CognitiveLevel.REMEMBER, question_type=QuestionType.SELECT
+    )
+    question = asyncio.run(service.generate_single_question(request, "teacher"))
+    assert question.content.startswith("Generated")
+    assert len(models.prompts) == 1
+    assert "Question pool lookup failed" in caplog.text
+    assert "Adding the question to the question pool failed" in caplog.text
+
+
+@pytest.fixture
+def repair_metrics():
+    get_repair_metrics.cache_clear()
+    yield get_repair_metrics()
+    get_repair_metrics.cache_clear()
+
+
+def question_reply(content: str, valid: bool = True) -> str:
+    question = select_question(content)
+    if not valid:
+        for answer in question["answers"]:
+            answer["is_correct"] = False
+    return json.dumps({"questions": [question]})
+
+
+def repair_counts(metrics) -> tuple[int, int, int]:
+    (stats,) = metrics.snapshot()
+    return stats.needs_repair, stats.repaired, stats.repair_failed
+
+
+def single_request() -> GenerateSingleQuestionRequest:
+    return GenerateSingleQuestionRequest(
+        subject="Toán", grade=1, topic_name="Phép cộng",
+        cognitive_level=CognitiveLevel.REMEMBER, question_type=QuestionType.SELECT
+    )
+
+
+def test_single_question_repair_counts_one_outcome_per_question(repair_metrics):
+    service, models = make_service(
+        question_reply("a", valid=False), question_reply("b", valid=False), question_reply("c"),
+        question_repair_attempts=3
+    )
+    assert asyncio.run(service.generate_single_question(single_request())).content == "c"
+    assert repair_counts(repair_metrics) == (1, 1, 0)
+
+
+def test_single_question_repair_failure_counts_once(repair_metrics):
+    service, _ = make_service(*(question_reply(str(index), valid=False) for index in range(3)), question_repair_attempts=2)
+    with pytest.raises(ValueError):
+        asyncio.run(service.generate_single_question(single_request()))
+    assert repair_counts(repair_metrics) == (1, 0, 1)
+
+
+@pytest.mark.parametrize("replies, expected", [
+    ([False, False, True], (1, 1, 0)),
+    ([False, False, False], (1, 0, 1)),
+])
+def test_matrix_repair_counts_one_outcome_per_question(repair_metrics, replies, expected):
+    service, _ = make_service(
+        *(question_reply(f"q{index}", valid) for index, valid in enumerate(replies)),
+        question_repair_attempts=2, generation_topup_rounds=0
+    )
+    request = GenerateQuestionsRequest(
+        subject="Toán", grade=1,
+        matrix_topics=[MatrixTopicConfig(
+            topic_id="t1", topic_name="Phép cộng", cognitive_level=CognitiveLevel.REMEMBER,
+            quantity=1, question_type=QuestionType.SELECT
+        )]
+    )
+    asyncio.run(service.generate_questions(request))
+    assert repair_counts(repair_metrics) == expected
@@ -0,0 +1,108 @@
+import time
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.internal_auth import (
+    INTERNAL_CREDENTIAL_HEADER,
+    InternalCaller,
+    get_internal_caller,
+    sign_internal_credential,
+    verify_internal_credential,
+)
+
+SETTINGS = Settings(
+    gemini_api_key="test-key",
+    internal_service_keys={"class-service": ["old-secret", "new-secret"], "exam-service": ["exam-secret"]},
+    internal_credential_max_age_seconds=300,
+)
+
+
+def rejected(credential: str) -> str:
+    with pytest.raises(HTTPException) as error:
+        verify_internal_credential(credential, SETTINGS)
+    assert error.value.status_code == 401
+    return error.value.detail
+
+
+@pytest.mark.parametrize("secret", ["old-secret", "new-secret"])
+def test_valid_credential_with_any_rotated_secret(secret):
+    now = int(time.time())
+    caller = verify_internal_credential(sign_internal_credential("class-service", secret, now), SETTINGS)
+    assert caller == InternalCaller(name="class-service", issued_at=now)
+
+
+@pytest.mark.parametrize("age", [301, -301])
+def test_expired_or_future_credential(age):
+    credential = sign_internal_credential("class-service", "new-secret", int(time.time()) - age)
+    assert rejected(credential) == "Internal credential expired"
+
+
+def test_tampered_credential():
+    credential = sign_internal_credential("class-service", "new-secret")
+    version, caller, timestamp, signature = credential.split(".")
+    flipped = signature[:-1] + ("0" if signature[-1] != "0" else "1")
+    assert rejected(".".join((version, caller, timestamp, flipped))) == "Invalid internal credential"
+    # Re-dating a signed credential breaks its signature
+    assert rejected(".".join((version, caller, str(int(timestamp) - 1), signature))) == "Invalid internal credential"
+
+
+def test_wrong_caller():
+    # Signed with another caller's secret
+    credential = sign_internal_credential("class-service", "exam-secret")
+    assert rejected(credential) == "Invalid internal credential"
+    # A valid signature moved to another caller name
+    signature = sign_internal_credential("exam-service", "exam-secret").rsplit(".", 1)[1]
+    assert rejected(f"v1.class-service.{int(time.time())}.{signature}") == "Invalid internal credential"
+    assert rejected(sign_internal_credential("unknown-service", "exam-secret")) == "Unknown internal caller"
+
+
+@pytest.mark.parametrize("credential", [
+    "",
+    "garbage",
+    "v1.class-service.123",
+    "v2.class-service.123.abc",
+    "v1.class-service.123.abc.def",
+])
+def test_malformed_credential(credential):
+    assert rejected(credential) == "Malformed internal credential"
+
+
+@pytest.mark.parametrize("timestamp", ["-5", "12a", "", "²³", "١٢٣"])
+def test_non_numeric_timestamp(timestamp):
+    assert rejected(f"v1.class-service.{timestamp}.abc") == "Unknown internal caller"
+
+
+@pytest.mark.parametrize("signature", ["é" * 64, "ÿ", "\udcff", "", "zz"])
+def test_non_hex_signature(signature):
+    assert rejected(f"v1.class-service.{int(time.time())}.{signature}") == "Invalid internal credential"
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.dependency_overrides[get_settings] = lambda: SETTINGS
+    
+    @app.get("/internal")
+    async def internal(caller: Annotated[InternalCaller, Depends(get_internal_caller)]):
+        return {"caller": caller.name}
+    
+    return TestClient(app)
+
+
+def test_dependency_accepts_valid_credential():
+    response = make_client().get(
+        "/internal", headers={INTERNAL_CREDENTIAL_HEADER: sign_internal_credential("class-service", "new-secret")}
+    )
+    assert response.json() == {"caller": "class-service"}
+
+
+@pytest.mark.parametrize("header", [None, b"v1.class-service.1.abc", b"v1.class-service.%d.\xe9\xff\xfe"])
+def test_dependency_rejects_missing_or_bad_bytes_with_401(header):
+    headers = {}
+    if header is not None:
+        headers[INTERNAL_CREDENTIAL_HEADER] = header.replace(b"%d", str(int(time.time())).encode())
+    response = make_client().get("/internal", headers=headers)
+    assert response.status_code == 401
@@ -0,0 +1,73 @@
+"""
+Lambda entry point, run in a fresh interpreter so `main` goes through the
+Lambda init phase (pre-warm included) exactly as in a new container.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+
+_SCRIPT = """
+import json
+import sys
+
+import main
+
+for event in json.loads(sys.argv[1]):
+    response = main.handler(event, None)
+    print(json.dumps({"status": response["statusCode"], "body": response["body"]}))
+"""
+
+
+def api_gateway_event(path: str) -> dict:
+    """An API Gateway HTTP API (payload v2) GET request."""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"host": "example.execute-api.amazonaws.com"},
+        "requestContext": {
+            "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1", "sourceIp": "203.0.113.1"},
+            "stage": "$default",
+        },
+        "isBase64Encoded": False,
+    }
+
+
+def run_lambda(events: list[dict]) -> list[dict]:
+    env = {
+        **os.environ,
+        "AWS_LAMBDA_FUNCTION_NAME": "ai-service-test",
+        "PREWARM_ON_INIT": "true",
+        "PREWARM_TIMEOUT_SECONDS": "2",
+        "GEMINI_API_KEY": "test-key",
+        "QUESTION_POOL_ENABLED": "false",
+        "COGNITO_USER_POOL_ID": "",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-c", _SCRIPT, json.dumps(events)],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return [json.loads(line) for line in completed.stdout.splitlines() if line.startswith('{"status"')]
+
+
+def test_invocations_after_init_prewarm():
+    event = api_gateway_event("/health/live")
+    responses = run_lambda([event, event])
+    assert [response["status"] for response in responses] == [200, 200]
+
+
+def test_warmup_ping_skips_routing():
+    responses = run_lambda([{"source": "aws.events"}, api_gateway_event("/health/live")])
+    assert responses[0] == {"status": 200, "body": "warm"}
+    assert responses[1]["status"] == 200
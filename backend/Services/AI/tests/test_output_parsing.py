@@ -0,0 +1,72 @@
+import asyncio
+import json
+import re
+
+from app.models.enums import CognitiveLevel, QuestionType
+from app.schemas import GenerateQuestionsRequest, MatrixTopicConfig
+from app.services.output_parsing import parse_questions
+from tests.fakes import make_service, select_question
+
+
+def questions_json(*contents: str) -> str:
+    return json.dumps({"questions": [{"q": content, "o": [{"c": "{a}"}, {"c": "b]"}], "k": 0} for content in contents]})
+
+
+def test_complete_response():
+    items, complete = parse_questions(questions_json("one", "two"))
+    assert complete
+    assert [item["q"] for item in items] == ["one", "two"]
+
+
+def test_non_object_items_are_dropped():
+    items, complete = parse_questions('{"questions": [{"q": "one"}, "two", 3, null]}')
+    assert (items, complete) == ([{"q": "one"}], True)
+
+
+def test_unexpected_shapes_give_no_items():
+    assert parse_questions('[{"q": "one"}]') == ([], True)
+    assert parse_questions('{"items": [{"q": "one"}]}') == ([], True)
+
+
+def test_truncated_response_keeps_complete_items():
+    text = questions_json("one", "two", "three")
+    cut = text.index('"three"') + 3
+    items, complete = parse_questions(text[:cut])
+    assert not complete
+    assert [item["q"] for item in items] == ["one", "two"]
+    # Braces and brackets inside strings do not end an item early
+    assert items[0]["o"] == [{"c": "{a}"}, {"c": "b]"}]
+
+
+def test_truncated_at_every_position_never_raises():
+    text = questions_json("one", "two")
+    for cut in range(len(text)):
+        items, complete = parse_questions(text[:cut])
+        assert not complete
+        assert len(items) <= 2
+
+
+def test_truncated_before_the_array_gives_no_items():
+    assert parse_questions('{"questi') == ([], False)
+    assert parse_questions('{"questions": [') == ([], False)
+    assert parse_questions('{"questions": [{"q": "on') == ([], False)
+
+
+def test_top_up_asks_only_for_questions_lost_to_truncation():
+    full = json.dumps({"questions": [select_question(f"Câu {index}: 2 + {index} = ?") for index in range(3)]}, ensure_ascii=False)
+    truncated = full[:full.index("Câu 2")]
+    top_up = json.dumps({"questions": [select_question("Câu 3: 2 + 3 = ?")]})
+    service, models = make_service(truncated, top_up)
+    request = GenerateQuestionsRequest(
+        subject="Toán", grade=1,
+        matrix_topics=[MatrixTopicConfig(
+            topic_id="t1", topic_name="Phép cộng", cognitive_level=CognitiveLevel.REMEMBER,
+            quantity=3, question_type=QuestionType.SELECT
+        )]
+    )
+    result = asyncio.run(service.generate_questions(request))
+    assert [question.content for question in result.questions] == [
+        "Câu 0: 2 + 0 = ?", "Câu 1: 2 + 1 = ?", "Câu 3: 2 + 3 = ?"
+    ]
+    assert result.fulfilment[0].fulfilled
+    assert [re.findall(r"Quantity: (\d+)", prompt) for prompt in models.prompts] == [["3"], ["1"]]
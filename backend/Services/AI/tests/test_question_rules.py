@@ -0,0 +1,72 @@
+import pytest
+
+from app.models.enums import QuestionType
+from app.services.question_rules import apply_rules
+
+
+def true_false(*answers: tuple[str, bool]) -> dict:
+    return {
+        "content": "Nước sôi ở 100°C.",
+        "question_type": "true_false",
+        "answers": [
+            {"content": content, "is_correct": correct, "explanation": f"vì {content}", "student_explanation": f"em {content}"}
+            for content, correct in answers
+        ],
+    }
+
+
+def contents(question: dict) -> list[tuple[str, bool]]:
+    return [(answer["content"], answer["is_correct"]) for answer in question["answers"]]
+
+
+def test_true_false_pair_passes_unchanged():
+    result = apply_rules(true_false(("True", False), ("False", True)), QuestionType.TRUE_FALSE)
+    assert (result.fixed, result.violations) == ((), ())
+    assert contents(result.question) == [("True", False), ("False", True)]
+
+
+@pytest.mark.parametrize("labels", [("Đúng", "Sai"), ("đúng.", "SAI"), ("true", "false")])
+def test_localized_pair_is_relabelled_keeping_answer_fields(labels):
+    result = apply_rules(true_false((labels[0], False), (labels[1], True)), QuestionType.TRUE_FALSE)
+    assert (result.fixed, result.violations) == (("true_false_answers",), ())
+    assert contents(result.question) == [("True", False), ("False", True)]
+    assert [answer["explanation"] for answer in result.question["answers"]] == [f"vì {labels[0]}", f"vì {labels[1]}"]
+    assert [answer["student_explanation"] for answer in result.question["answers"]] == [
+        f"em {labels[0]}", f"em {labels[1]}"
+    ]
+
+
+@pytest.mark.parametrize("answers", [
+    (("Sai", True), ("Đúng", False)),
+    (("False", True), ("True", False)),
+    (("Có", True), ("Không", False)),
+    (("Đúng", True), ("Đúng", False)),
+    (("Đúng", True), ("Sai", False), ("Không biết", False)),
+    (("Có lẽ", True),),
+])
+def test_reversed_or_unrecognised_answers_need_repair(answers):
+    question = true_false(*answers)
+    original = contents(question)
+    result = apply_rules(question, QuestionType.TRUE_FALSE)
+    assert "true_false_answers" in result.violations
+    assert result.needs_repair
+    assert contents(result.question) == original
+
+
+@pytest.mark.parametrize("answer, expected", [
+    (("Đúng", True), [("True", True), ("False", False)]),
+    (("Sai", True), [("True", False), ("False", True)]),
+    (("False", False), [("True", True), ("False", False)]),
+])
+def test_lone_answer_is_completed_by_its_label(answer, expected):
+    result = apply_rules(true_false(answer), QuestionType.TRUE_FALSE)
+    assert (result.fixed, result.violations) == (("true_false_answers",), ())
+    assert contents(result.question) == expected
+    kept = next(a for a in result.question["answers"] if a.get("explanation"))
+    assert kept["student_explanation"] == f"em {answer[0]}"
+
+
+def test_relabelled_pair_still_needs_one_correct_answer():
+    result = apply_rules(true_false(("Đúng", True), ("Sai", True)), QuestionType.TRUE_FALSE)
+    assert result.fixed == ("true_false_answers",)
+    assert result.violations == ("exactly_one_correct",)
@@ -0,0 +1,195 @@
+import random
+import time
+
+import pytest
+
+from app.schemas import QuestionTemplate
+from app.services.question_templates import (
+    MAX_MAGNITUDE,
+    CompiledTemplate,
+    TemplateError,
+    compile_expression,
+)
+
+NAMES = frozenset({"a", "b"})
+
+
+def make_template(**overrides) -> QuestionTemplate:
+    fields = {
+        "content": "Lan có {a} quả táo, cho bạn {b} quả. Lan còn lại bao nhiêu quả?",
+        "question_type": "select",
+        "cognitive_level": "apply",
+        "variables": [{"name": "a", "min": 10, "max": 99}, {"name": "b", "min": 1, "max": 50}],
+        "constraints": ["a > b"],
+        "answer": "a - b",
+        "distractors": ["a + b", "a - b + 10", "b"],
+        "explanation": "{a} - {b} = {answer}",
+    }
+    return QuestionTemplate(**{**fields, **overrides})
+
+
+@pytest.mark.parametrize("source, env, expected", [
+    ("a * b - 3", {"a": 4, "b": 5}, 17),
+    ("a // b + a % b", {"a": 17, "b": 5}, 5),
+    ("-a ** 2", {"a": 3, "b": 0}, -9),
+    ("a if a > b else b", {"a": 2, "b": 7}, 7),
+    ("1 < a <= b", {"a": 2, "b": 2}, True),
+    ("not (a == b) and (a > 0 or b > 0)", {"a": 1, "b": 2}, True),
+    ("gcd(a, b) + abs(-a) + max(a, b) + min(a, b)", {"a": 12, "b": 18}, 48),
+    ("round(sqrt(a), 1)", {"a": 2, "b": 0}, 1.4),
+])
+def test_allowed_expressions(source, env, expected):
+    assert compile_expression(source, NAMES)(env) == expected
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os')",
+    "a.real",
+    "(lambda: 1)()",
+    "[1] * 10",
+    "'x' * 9",
+    "c + 1",
+    "print(a)",
+    "round(a, ndigits=2)",
+    "a[0]",
+    "{a: b}",
+    "a if",
+    "a" + " + a" * 100,
+    "(((((((((((a + 1) + 1) + 1) + 1) + 1) + 1) + 1) + 1) + 1) + 1) + 1)",
+    "12345678901234567890 + a",
+])
+def test_rejected_expressions(source):
+    with pytest.raises(TemplateError):
+        compile_expression(source, NAMES)
+
+
+@pytest.mark.parametrize("source, env", [
+    ("a ** 13", {"a": 2, "b": 0}),
+    ("((a ** 12) ** 12) ** 12", {"a": 2, "b": 0}),
+    ("a * a * a * a * a * a * a * a", {"a": 10**3, "b": 0}),
+    ("a / b", {"a": 1, "b": 0}),
+    ("a / b", {"a": 1.0, "b": 1e-300}),
+    ("(-a) ** 0.5", {"a": 8, "b": 0}),
+    ("a * b", {"a": "An", "b": 10**6}),
+    ("-a", {"a": "An", "b": 0}),
+    ("sqrt(a)", {"a": -1, "b": 0}),
+])
+def test_out_of_range_results_fail_the_sample(source, env):
+    with pytest.raises((ArithmeticError, TypeError, ValueError)):
+        compile_expression(source, NAMES)(env)
+
+
+def test_results_up_to_the_limit_are_allowed():
+    assert compile_expression("a * b", NAMES)({"a": MAX_MAGNITUDE, "b": 1}) == MAX_MAGNITUDE
+
+
+def test_nested_powers_terminate_quickly():
+    template = make_template(
+        question_type="fill_in_blank",
+        distractors=[],
+        constraints=[],
+        variables=[{"name": "a", "min": 2, "max": 9}, {"name": "b", "min": 2, "max": 9}],
+        answer="(((((a ** 12) ** 12) ** 12) ** 12) ** 12) ** b",
+    )
+    start = time.perf_counter()
+    with pytest.raises(TemplateError):
+        CompiledTemplate(template).instantiate(5000)
+    assert time.perf_counter() - start < 2
+
+
+def test_unsatisfiable_template_is_bounded():
+    variables = [{"name": name, "min": 0, "max": 10**9} for name in "abcdefgh"]
+    formula = "((a + b) * (c + d)) - ((e + f) * (g + h))"
+    template = make_template(
+        content=" ".join(f"{{{name}}}" for name in "abcdefgh"),
+        variables=variables,
+        constraints=[f"{formula} >= 0"] * 9 + ["a < 0"],
+        answer=formula,
+        distractors=[formula] * 6,
+    )
+    start = time.perf_counter()
+    with pytest.raises(TemplateError):
+        CompiledTemplate(template).instantiate(5000)
+    assert time.perf_counter() - start < 5
+
+
+def test_variable_range_is_limited():
+    with pytest.raises(TemplateError):
+        CompiledTemplate(make_template(variables=[
+            {"name": "a", "min": 0, "max": 1e300}, {"name": "b", "min": 1, "max": 2},
+        ]))
+
+
+def test_instantiates_distinct_select_variants():
+    variants = CompiledTemplate(make_template()).instantiate(200, seed=1)
+    assert len(variants) == 200
+    assert len({variant["content"] for variant in variants}) == 200
+    for variant in variants:
+        answers = variant["answers"]
+        assert len(answers) == 4
+        assert len({answer["content"] for answer in answers}) == 4
+        (correct,) = [answer for answer in answers if answer["is_correct"]]
+        assert correct["explanation"].endswith(f"= {correct['content']}")
+
+
+def test_instantiation_is_reproducible_with_a_seed():
+    template = CompiledTemplate(make_template())
+    assert template.instantiate(20, seed=7) == template.instantiate(20, seed=7)
+
+
+def test_small_value_space_returns_fewer_variants():
+    template = make_template(
+        question_type="fill_in_blank",
+        variables=[{"name": "a", "min": 1, "max": 3}, {"name": "b", "kind": "choice", "choices": ["1", "2"]}],
+        constraints=[],
+        distractors=[],
+        answer="a / b",
+    )
+    variants = CompiledTemplate(template).instantiate(100, seed=1)
+    assert len(variants) == 6
+    assert {answer["content"] for variant in variants for answer in variant["answers"]} == {
+        "1", "2", "3", "0,5", "1,5",
+    }
+
+
+def test_template_checks():
+    with pytest.raises(TemplateError):
+        CompiledTemplate(make_template(question_type="essay"))
+    with pytest.raises(TemplateError):
+        CompiledTemplate(make_template(content="Lan có {a} quả táo."))
+    with pytest.raises(TemplateError):
+        CompiledTemplate(make_template(constraints=["a > 100"])).instantiate(5)
+
+
+@pytest.mark.parametrize("choice", ["inf", "-inf", "nan", "1e300", 1e300, -(10**16)])
+def test_choice_values_are_limited(choice):
+    template = make_template(
+        question_type="fill_in_blank",
+        variables=[{"name": "a", "kind": "choice", "choices": ["2", choice]}, {"name": "b", "min": 1, "max": 2}],
+        constraints=[],
+        distractors=[],
+        answer="1",
+    )
+    with pytest.raises(TemplateError):
+        CompiledTemplate(template)
+
+
+def test_text_choices_and_limit_values_are_allowed():
+    template = make_template(
+        question_type="fill_in_blank",
+        content="{a} có {b} quả táo.",
+        variables=[{"name": "a", "kind": "choice", "choices": ["Lan", "Infinity cat"]},
+                   {"name": "b", "kind": "choice", "choices": [str(MAX_MAGNITUDE), "-3"]}],
+        constraints=[],
+        distractors=[],
+        answer="b",
+        explanation=None,
+    )
+    variants = CompiledTemplate(template).instantiate(10, seed=1)
+    assert len(variants) == 4
+
+
+def test_unformattable_values_discard_the_sample():
+    template = CompiledTemplate(make_template(question_type="fill_in_blank", constraints=[], distractors=[], answer="1"))
+    assert template._build({"a": float("inf"), "b": 1}, random.Random(1)) is None
+    assert template._build({"a": 3, "b": 1}, random.Random(1)) is not None
@@ -0,0 +1,90 @@
+from typing import Annotated
+
+import msgpack
+import pytest
+from fastapi import BackgroundTasks, Depends, FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.enrichment import ENRICHMENT_TOKEN_HEADER
+from app.schemas import ExplainQuestionResponse
+from app.serialization import MSGPACK_MEDIA_TYPE, model_response, wants_msgpack
+
+completed: list[str] = []
+
+
+async def issue_token(response: Response) -> str:
+    """Stands in for the auth dependency, which sets the enrichment token on the injected Response."""
+    response.headers[ENRICHMENT_TOKEN_HEADER] = "token"
+    return "user"
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    
+    @app.post("/with-response", status_code=201)
+    async def with_response(
+        http_request: Request,
+        response: Response,
+        background: BackgroundTasks,
+        user: Annotated[str, Depends(issue_token)]
+    ):
+        background.add_task(completed.append, user)
+        return model_response(http_request, ExplainQuestionResponse(explanation="x"), status_code=201, response=response)
+    
+    @app.post("/without-response")
+    async def without_response(http_request: Request, user: Annotated[str, Depends(issue_token)]):
+        return model_response(http_request, ExplainQuestionResponse(explanation="x"))
+    
+    return TestClient(app)
+
+
+def test_headers_from_dependencies_are_kept():
+    completed.clear()
+    response = make_client().post("/with-response")
+    assert response.status_code == 201
+    assert response.headers[ENRICHMENT_TOKEN_HEADER] == "token"
+    assert response.json() == {"explanation": "x", "source": "model"}
+    assert completed == ["user"]
+
+
+def test_headers_are_kept_for_msgpack():
+    response = make_client().post("/with-response", headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert response.headers[ENRICHMENT_TOKEN_HEADER] == "token"
+    assert msgpack.unpackb(response.content) == {"explanation": "x", "source": "model"}
+
+
+def test_content_headers_describe_the_model_body():
+    response = make_client().post("/with-response")
+    assert response.headers["content-type"] == "application/json"
+    assert int(response.headers["content-length"]) == len(response.content)
+
+
+def test_without_response_only_the_body_is_sent():
+    response = make_client().post("/without-response")
+    assert ENRICHMENT_TOKEN_HEADER not in response.headers
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("Application/MsgPack", True),
+    ("application/msgpack, application/json", True),
+    ("application/json, application/msgpack;q=0.9, */*;q=0.1", False),
+    ("application/msgpack;q=0.9, application/json;q=0.5", True),
+    ("application/msgpack;q=0, application/json", False),
+    ("application/msgpack; q=0.0", False),
+    ("application/msgpack;q=0", False),
+    ("application/msgpack;q=0.5, */*", False),
+    ("application/msgpack, */*", True),
+    ("application/msgpack;q=0.5, application/*;q=0.8, */*", False),
+    ("application/msgpack;q=oops", True),
+    ("application/msgpack;q=nan", True),
+    ("application/json", False),
+    ("*/*", False),
+    ("", False),
+    ("text/application/msgpack-ish", False),
+])
+def test_wants_msgpack_honours_quality(accept, expected):
+    request = Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+    assert wants_msgpack(request) is expected
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import httpx
+
+from app import http_client
+from app.cache import InMemoryCacheBackend
+from app.config import Settings
+from app.services.subscription_client import SubscriptionClaimsResponse, SubscriptionClient
+
+
+def claims(user_id: str, plan: str = "pro") -> dict:
+    return {"userId": user_id, "plan": plan, "expiresAt": 1, "hasActiveSubscription": True}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    """Subscription service knowing u1 and u2; the batch endpoint leaves u2 out and u2's single fetch fails."""
+    if request.url.path.endswith("/claims/batch"):
+        return httpx.Response(200, json=[claims("u1")])
+    if request.url.path.endswith("/claims/u2"):
+        return httpx.Response(500)
+    return httpx.Response(404)
+
+
+def test_warm_cache_counts_only_cached_claims(monkeypatch):
+    cache = InMemoryCacheBackend()
+    client = SubscriptionClient(Settings(gemini_api_key="test-key"), cache)
+    
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as shared:
+            monkeypatch.setattr(http_client, "_shared_client", shared)
+            await cache.set(
+                SubscriptionClient._CACHE_PREFIX + "u3",
+                SubscriptionClaimsResponse(**claims("u3", "plus")).model_dump_json(by_alias=True),
+                60
+            )
+            warmed = await client.warm_cache(["u1", "u2", "u3", "u1", "u4"])
+            resolved = await client.get_subscription_claims_batch(["u1", "u2", "u3"])
+        return warmed, {user_id: value.plan for user_id, value in resolved.items()}
+    
+    warmed, plans = asyncio.run(scenario())
+    assert warmed == 2
+    assert plans == {"u1": "pro", "u2": "free", "u3": "plus"}
+
+
+class CountingCache(InMemoryCacheBackend):
+    """In-memory cache counting writes, each a Redis round trip in production."""
+    
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes: list[int] = []
+    
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self.writes.append(1)
+        await super().set(key, value, ttl_seconds)
+    
+    async def set_many(self, items: dict[str, str], ttl_seconds: float) -> None:
+        self.writes.append(len(items))
+        for key, value in items.items():
+            await super().set(key, value, ttl_seconds)
+
+
+def test_batch_responses_are_cached_in_one_write_per_batch(monkeypatch):
+    def batch_handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=[claims(user_id) for user_id in json.loads(request.content)["userIds"]])
+    
+    cache = CountingCache()
+    client = SubscriptionClient(Settings(gemini_api_key="test-key", subscription_batch_size=100), cache)
+    user_ids = [f"u{index}" for index in range(250)]
+    
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(batch_handler)) as shared:
+            monkeypatch.setattr(http_client, "_shared_client", shared)
+            return await client.warm_cache(user_ids)
+    
+    assert asyncio.run(scenario()) == 250
+    assert cache.writes == [100, 100, 50]
@@ -0,0 +1,114 @@
+import json
+import re
+
+import pytest
+
+from app.models.enums import CognitiveLevel, QuestionType
+from app.schemas import Question
+from app.services.gemini_service import GeminiService
+from app.services.prompts import COMPACT_QUESTION_TYPE_INSTRUCTIONS
+from app.services.question_rules import apply_rules
+from app.services.wire_format import COMPACT_QUESTION_SCHEMAS, expand_question
+
+
+def answers(question: dict) -> list[tuple]:
+    return [(answer["content"], answer["is_correct"], answer["explanation"]) for answer in question["answers"]]
+
+
+def test_select():
+    item = {"q": "Thủ đô của Pháp?", "o": [{"c": "London", "e": "Anh"}, {"c": "Paris", "e": "Pháp"}], "k": 1}
+    question = expand_question(item, QuestionType.SELECT, CognitiveLevel.REMEMBER)
+    assert question == {
+        "content": "Thủ đô của Pháp?",
+        "question_type": "select",
+        "cognitive_level": "remember",
+        "answers": [
+            {"content": "London", "is_correct": False, "explanation": "Anh"},
+            {"content": "Paris", "is_correct": True, "explanation": "Pháp"},
+        ],
+    }
+
+
+def test_multiple_choice():
+    item = {"q": "Số nguyên tố?", "o": [{"c": "2"}, {"c": "4"}, {"c": "7"}], "k": [0, 2]}
+    question = expand_question(item, QuestionType.MULTIPLE_CHOICE, CognitiveLevel.UNDERSTAND)
+    assert answers(question) == [("2", True, None), ("4", False, None), ("7", True, None)]
+
+
+@pytest.mark.parametrize("truth, expected", [
+    (True, [("True", True, "Đúng vì..."), ("False", False, None)]),
+    (False, [("True", False, None), ("False", True, "Đúng vì...")]),
+])
+def test_true_false(truth, expected):
+    item = {"q": "Nước sôi ở 100°C.", "k": truth, "e": "Đúng vì...", "s": "Em nhớ nhé"}
+    question = expand_question(item, QuestionType.TRUE_FALSE, CognitiveLevel.REMEMBER)
+    assert answers(question) == expected
+    assert [answer["student_explanation"] for answer in question["answers"]] == ["Em nhớ nhé", "Em nhớ nhé"]
+
+
+def test_essay():
+    item = {"q": "Tả con mèo.", "r": "Đủ ba phần", "e": "Nội dung 60%"}
+    question = expand_question(item, QuestionType.ESSAY, CognitiveLevel.APPLY)
+    assert answers(question) == [("Đủ ba phần", True, "Nội dung 60%")]
+
+
+def test_fill_in_blank_marks_every_option_correct():
+    item = {"q": "Công thức của nước là _____.", "o": [{"c": "H2O", "s": "Em nhớ H2O"}, {"c": "H₂O"}]}
+    question = expand_question(item, QuestionType.FILL_IN_BLANK, CognitiveLevel.REMEMBER)
+    assert answers(question) == [("H2O", True, None), ("H₂O", True, None)]
+    assert question["answers"][0]["student_explanation"] == "Em nhớ H2O"
+    assert "student_explanation" not in question["answers"][1]
+
+
+def test_mixed_topic_uses_item_type_and_option_flags():
+    item = {"q": "Chọn số chẵn", "t": "multiple_choice", "o": [{"c": "2", "k": True}, {"c": "3", "k": False}, {"c": "4", "k": True}]}
+    question = expand_question(item, None, CognitiveLevel.REMEMBER)
+    assert question["question_type"] == "multiple_choice"
+    assert answers(question) == [("2", True, None), ("3", False, None), ("4", True, None)]
+
+
+def test_mixed_topic_true_false_and_missing_type():
+    true_false = expand_question({"q": "1 > 2", "t": "true_false", "k": False}, None, CognitiveLevel.REMEMBER)
+    assert answers(true_false) == [("True", False, None), ("False", True, None)]
+    untyped = expand_question({"q": "?", "o": [{"c": "a", "k": True}]}, None, CognitiveLevel.REMEMBER)
+    assert untyped["question_type"] == "select"
+
+
+@pytest.mark.parametrize("key", [7, -1, True, "1", None, [5, 9]])
+def test_out_of_range_or_invalid_select_index_marks_nothing_correct(key):
+    item = {"q": "Thủ đô của Pháp?", "o": [{"c": "London"}, {"c": "Paris"}], "k": key}
+    question = expand_question(item, QuestionType.SELECT, CognitiveLevel.REMEMBER)
+    assert [answer["is_correct"] for answer in question["answers"]] == [False, False]
+    result = apply_rules(question, QuestionType.SELECT)
+    assert result.violations == ("exactly_one_correct",)
+
+
+def test_out_of_range_multiple_choice_indices_are_ignored():
+    item = {"q": "?", "o": [{"c": "a"}, {"c": "b"}], "k": [1, 2, 99, False]}
+    question = expand_question(item, QuestionType.MULTIPLE_CHOICE, CognitiveLevel.REMEMBER)
+    assert [answer["is_correct"] for answer in question["answers"]] == [False, True]
+
+
+def test_malformed_options_are_skipped():
+    item = {"q": "?", "o": ["a", {"c": "b"}, None], "k": 0}
+    question = expand_question(item, QuestionType.SELECT, CognitiveLevel.REMEMBER)
+    assert answers(question) == [("b", False, None)]
+
+
+@pytest.mark.parametrize("question_type", list(QuestionType))
+def test_prompt_examples_expand_to_valid_questions(question_type):
+    """Every compact prompt example expands to a question that passes its type's rules."""
+    instruction = COMPACT_QUESTION_TYPE_INSTRUCTIONS[question_type]
+    item = json.loads(re.search(r"Example output:\n(\{.*\})", instruction).group(1))
+    required = COMPACT_QUESTION_SCHEMAS[question_type]["properties"]["questions"]["items"]["required"]
+    assert set(required) <= set(item)
+    result = apply_rules(expand_question(item, question_type, CognitiveLevel.UNDERSTAND), question_type)
+    assert (result.fixed, result.violations) == ((), ())
+    Question(**result.question)
+
+
+@pytest.mark.parametrize("row, expected", [(2, 1), (1, 0), (3, 2), (0, 1), (4, 1), (True, 1), ("2", 1), (None, 1)])
+def test_packed_row_index_out_of_range_falls_back_to_a_short_row(row, expected):
+    question = {"q": "?", "i": row}
+    assert GeminiService._row_for_question(question, [0, 3, 1]) == expected
+    assert "i" not in question
@@ -1,4 +1,5 @@
 using System.Net.Http.Json;
+using System.Security.Cryptography;
 using System.Text;
 using System.Text.Json;
 using System.Text.Json.Serialization;
@@ -13,6 +14,10 @@ public sealed class AIServiceClient : IAIServiceClient
     private readonly HttpClient _httpClient;
     private readonly ILogger<AIServiceClient> _logger;
     private readonly string _aiServiceUrl;
+    private readonly string? _internalKey;
+
+    private const string CallerName = "class-service";
+    private const string InternalCredentialHeader = "X-Internal-Credential";
 
     public AIServiceClient(
         HttpClient httpClient,
@@ -27,6 +32,10 @@ public sealed class AIServiceClient : IAIServiceClient
             configuration["Services:AIService:Url"]
             ?? Environment.GetEnvironmentVariable("AI_SERVICE_URL")
             ?? "http://localhost:8000/api/ai";
+
+        _internalKey =
+            configuration["Services:AIService:InternalKey"]
+            ?? Environment.GetEnvironmentVariable("AI_SERVICE_INTERNAL_KEY");
     }
 
     public async Task<EssayGradingResult?> GradeEssayAsync(
@@ -56,11 +65,16 @@ public sealed class AIServiceClient : IAIServiceClient
             var json = JsonSerializer.Serialize(payload);
             var content = new StringContent(json, Encoding.UTF8, "application/json");
 
-            var response = await _httpClient.PostAsync(
-                $"{_aiServiceUrl}/essay/grade",
-                content,
-                cancellationToken
-            );
+            using var request = new HttpRequestMessage(HttpMethod.Post, BuildGradeEssayUrl())
+            {
+                Content = content,
+            };
+            if (!string.IsNullOrEmpty(_internalKey))
+            {
+                request.Headers.Add(InternalCredentialHeader, SignInternalCredential(_internalKey));
+            }
+
+            var response = await _httpClient.SendAsync(request, cancellationToken);
 
             if (!response.IsSuccessStatusCode)
             {
@@ -87,6 +101,22 @@ public sealed class AIServiceClient : IAIServiceClient
         }
     }
 
+    private string BuildGradeEssayUrl() =>
+        string.IsNullOrEmpty(_internalKey)
+            ? $"{_aiServiceUrl}/essay/grade"
+            : $"{_aiServiceUrl}/internal/essay/grade";
+
+    private static string SignInternalCredential(string key)
+    {
+        var timestamp = DateTimeOffset.UtcNow.ToUnixTimeSeconds();
+        var message = $"{CallerName}.{timestamp}";
+        var signature = HMACSHA256.HashData(
+            Encoding.UTF8.GetBytes(key),
+            Encoding.UTF8.GetBytes(message)
+        );
+        return $"v1.{message}.{Convert.ToHexStringLower(signature)}";
+    }
+
     private sealed record GradeEssayApiResponse(
         [property: JsonPropertyName("score")] double Score,
         [property: JsonPropertyName("feedback")] string Feedback,